@@ -0,0 +1,3 @@
+"""
+Benchmark e test di carico del server FastAPI + MCP
+"""
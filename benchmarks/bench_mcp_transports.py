@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Benchmark: latenza di una chiamata a un tool su ogni trasporto.
+
+Chiama ripetutamente lo stesso tool (default get_todo_by_id) con:
+- dispatch diretto: mcp_server.handle in-process, il costo del solo server MCP;
+- REST: l'endpoint /mcp/tools/<tool> dell'app FastAPI;
+- MCP HTTP (JSON): POST /mcp con risposta application/json;
+- MCP HTTP (SSE): POST /mcp con risposta text/event-stream;
+- stdio: mcp_server_todo_list.py in un sottoprocesso, un messaggio per riga.
+
+Poi confronta un passo di un agente con più tool (--batch chiamate): una
+POST /mcp per tool contro un unico batch JSON-RPC.
+
+I trasporti HTTP passano dall'app in-process (httpx ASGITransport, nessuna
+rete) e usano lo stesso store; il sottoprocesso stdio ha il proprio.
+Riporta chiamate al secondo e latenze p50/p99.
+
+Uso:
+    python benchmarks/bench_mcp_transports.py --calls 5000 --batch 5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import httpx
+
+from main import app
+from mcp import mcp_server, todo_manager
+
+TODO_ID = "1"
+
+
+def percentile(samples: list, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def tool_call(request_id: int) -> dict:
+    return {
+        "jsonrpc": "2.0",
+        "id": request_id,
+        "method": "tools/call",
+        "params": {"name": "get_todo_by_id", "arguments": {"todo_id": TODO_ID}}
+    }
+
+
+async def measure(call, calls: int) -> dict:
+    """Chiamate sequenziali: `call(i)` deve restituire il risultato del tool"""
+    for i in range(min(100, calls)):
+        await call(i)  # riscaldamento
+    latencies = []
+    start = time.perf_counter()
+    for i in range(calls):
+        request_start = time.perf_counter()
+        result = await call(i)
+        latencies.append(time.perf_counter() - request_start)
+        assert result["id"] == TODO_ID, result
+    elapsed = time.perf_counter() - start
+    return {
+        "rps": calls / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+
+def structured(response: dict) -> dict:
+    if "error" in response or response["result"]["isError"]:
+        raise RuntimeError(f"Chiamata fallita: {response}")
+    return response["result"]["structuredContent"]
+
+
+async def measure_step(client: httpx.AsyncClient, batch: int, steps: int):
+    """Passo con `batch` tool: richieste separate contro un batch JSON-RPC"""
+    calls = [tool_call(i) for i in range(batch)]
+
+    async def separate(i):
+        for call in calls:
+            structured((await client.post("/mcp", json=call)).json())
+        return {"id": TODO_ID}
+
+    async def batched(i):
+        responses = (await client.post("/mcp", json=calls)).json()
+        assert [response["id"] for response in responses] == list(range(batch)), responses
+        for response in responses:
+            structured(response)
+        return {"id": TODO_ID}
+
+    print(f"\n--- Passo con {batch} tool ---")
+    results = {}
+    for label, step in (("richieste separate", separate), ("batch JSON-RPC", batched)):
+        results[label] = result = await measure(step, steps)
+        print(f"{label:<18} {result['rps']:>9.1f} passi/s     p50 {result['p50_ms']:>7.3f} ms   "
+              f"p99 {result['p99_ms']:>7.3f} ms")
+    print(f"Speedup batch: {results['richieste separate']['p50_ms'] / results['batch JSON-RPC']['p50_ms']:.1f}x p50")
+
+
+async def run(calls: int, batch: int):
+    transports = {}
+
+    async def direct(i):
+        return structured(await mcp_server.handle(tool_call(i), todo_manager))
+    transports["dispatch diretto"] = direct
+
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+
+    async def rest(i):
+        response = await client.post("/mcp/tools/get_todo_by_id", params={"todo_id": TODO_ID})
+        return response.json()
+    transports["REST"] = rest
+
+    async def mcp_json(i):
+        response = await client.post("/mcp", json=tool_call(i),
+                                     headers={"Accept": "application/json, text/event-stream"})
+        return structured(response.json())
+    transports["MCP HTTP (JSON)"] = mcp_json
+
+    async def mcp_sse(i):
+        response = await client.post("/mcp", json=tool_call(i), headers={"Accept": "text/event-stream"})
+        data = next(line for line in response.text.splitlines() if line.startswith("data: "))
+        return structured(json.loads(data[len("data: "):]))
+    transports["MCP HTTP (SSE)"] = mcp_sse
+
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "mcp_server_todo_list.py")],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, cwd=ROOT, text=True, bufsize=1,
+        env={**os.environ, "TODO_STORAGE": "memory"}
+    )
+
+    async def stdio(i):
+        process.stdin.write(json.dumps(tool_call(i)) + "\n")
+        process.stdin.flush()
+        return structured(json.loads(process.stdout.readline()))
+    transports["stdio"] = stdio
+
+    try:
+        results = {}
+        for label, call in transports.items():
+            results[label] = result = await measure(call, calls)
+            print(f"{label:<18} {result['rps']:>9.1f} chiamate/s   p50 {result['p50_ms']:>7.3f} ms   "
+                  f"p99 {result['p99_ms']:>7.3f} ms")
+        baseline = results["REST"]["p50_ms"]
+        print(f"\nMCP HTTP (JSON) rispetto a REST: {results['MCP HTTP (JSON)']['p50_ms'] / baseline:.2f}x p50")
+        if batch > 1:
+            await measure_step(client, batch, max(1, calls // batch))
+    finally:
+        await client.aclose()
+        process.stdin.close()
+        process.wait(timeout=10)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=5000, help="Chiamate per trasporto")
+    parser.add_argument("--batch", type=int, default=5, help="Tool per passo nel confronto batch (0 per saltarlo)")
+    args = parser.parse_args()
+
+    print("=== BENCHMARK LATENZA TOOL MCP PER TRASPORTO ===")
+    print(f"Tool: get_todo_by_id, {args.calls} chiamate sequenziali per trasporto\n")
+    asyncio.run(run(args.calls, args.batch))
+
+
+if __name__ == "__main__":
+    main_cli()
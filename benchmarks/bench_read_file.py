@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Benchmark: lettura in streaming di un file grande con read_file.
+
+Crea un file (sparso, quindi istantaneo) di --size-mb MB e lo scarica con
+GET /mcp/resources/read_file?raw=true chiamando l'app ASGI direttamente:
+i blocchi del corpo vengono contati e scartati, quindi la memoria
+misurata è quella del server. Intanto un ticker misura il ritardo
+dell'event loop. Confronta con la lettura precedente (open().read() nel
+loop, tutto il file in memoria) su una porzione di --legacy-mb MB.
+
+Infine rilegge in JSON lo stesso file di testo (--repeat volte), come un
+agente che riapre i file di configurazione, con e senza la cache dei
+contenuti.
+
+Uso:
+    python benchmarks/bench_read_file.py --size-mb 2048 --legacy-mb 256 --repeat 2000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from urllib.parse import urlencode
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from main import app
+from mcp import file_content_cache
+
+
+async def loop_lag(stop: asyncio.Event, interval: float = 0.005) -> float:
+    """Ritardo massimo (ms) di un asyncio.sleep(interval) finché `stop` non scatta"""
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - start - interval)
+    return worst * 1000
+
+
+async def stream_file(path: str) -> dict:
+    """Una GET raw sull'app ASGI; restituisce stato e byte ricevuti"""
+    query = urlencode({"file_path": path, "raw": "true"}).encode()
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/mcp/resources/read_file", "raw_path": b"/mcp/resources/read_file",
+        "query_string": query, "headers": [(b"host", b"bench")], "client": ("bench", 0),
+        "server": ("bench", 80), "root_path": "",
+    }
+    result = {"status": None, "bytes": 0}
+    requested = asyncio.Event()
+
+    async def receive():
+        if requested.is_set():
+            # Il client resta connesso: StreamingResponse attende qui la disconnessione
+            await asyncio.Event().wait()
+        requested.set()
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            result["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            result["bytes"] += len(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return result
+
+
+async def measure(label: str, work) -> None:
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(loop_lag(stop))
+    await asyncio.sleep(0.05)
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = await work()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    stop.set()
+    lag = await ticker
+    mb = size / 1024 / 1024
+    print(f"{label:<28} {mb:>8.0f} MB   {mb / elapsed:>8.1f} MB/s   picco memoria {peak / 1024 / 1024:>8.1f} MB   "
+          f"ritardo max loop {lag:>8.1f} ms")
+
+
+async def measure_repeat(path: str, repeat: int):
+    """Letture JSON ripetute dello stesso file, con la cache attiva e disattivata"""
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+    budget = file_content_cache.max_bytes
+    print(f"\n--- {repeat} letture JSON dello stesso file ({os.path.getsize(path) // 1024} KB) ---")
+    try:
+        for label, max_bytes in (("senza cache", 0), ("con cache", budget)):
+            file_content_cache.clear()
+            file_content_cache.max_bytes = max_bytes
+            hits = file_content_cache.hits
+            start = time.perf_counter()
+            for _ in range(repeat):
+                response = await client.get("/mcp/resources/read_file", params={"file_path": path})
+                assert response.status_code == 200, response.text
+            elapsed = time.perf_counter() - start
+            hit_rate = (file_content_cache.hits - hits) / repeat
+            print(f"{label:<12} {repeat / elapsed:>9.1f} letture/s   hit rate {hit_rate:.2f}")
+    finally:
+        file_content_cache.max_bytes = budget
+        await client.aclose()
+
+
+async def run(size_mb: int, legacy_mb: int, repeat: int):
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "big.log")
+    legacy_path = os.path.join(directory, "legacy.log")
+    for target, megabytes in ((path, size_mb), (legacy_path, legacy_mb)):
+        with open(target, "wb") as f:
+            f.truncate(megabytes * 1024 * 1024)
+    try:
+        async def streamed():
+            result = await stream_file(path)
+            assert result["status"] == 200 and result["bytes"] == size_mb * 1024 * 1024, result
+            return result["bytes"]
+
+        async def legacy():
+            # Come il vecchio endpoint: lettura sincrona dell'intero file nel loop
+            with open(legacy_path, "r") as f:
+                return len(f.read())
+
+        await measure("raw in streaming", streamed)
+        if legacy_mb:
+            await measure("open().read() nel loop", legacy)
+        if repeat:
+            text_path = os.path.join(directory, "config.py")
+            with open(text_path, "w") as f:
+                f.write("VALORE = 'configurazione'\n" * 8000)
+            await measure_repeat(text_path, repeat)
+            os.remove(text_path)
+    finally:
+        os.remove(path)
+        os.remove(legacy_path)
+        os.rmdir(directory)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=2048, help="Dimensione del file in streaming (MB)")
+    parser.add_argument("--legacy-mb", type=int, default=256, help="Dimensione per la lettura precedente (0 per saltarla)")
+    parser.add_argument("--repeat", type=int, default=2000, help="Letture JSON ripetute dello stesso file (0 per saltarle)")
+    args = parser.parse_args()
+
+    print("=== BENCHMARK READ_FILE IN STREAMING ===\n")
+    asyncio.run(run(args.size_mb, args.legacy_mb, args.repeat))
+
+
+if __name__ == "__main__":
+    main_cli()
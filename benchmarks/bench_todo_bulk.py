@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark: import di N todo con chiamate singole contro un'unica chiamata bulk.
+
+Le richieste passano per l'intero stack FastAPI (routing, validazione
+pydantic, serializzazione) tramite un trasporto ASGI in-process, con lo
+store in memoria e con il log append-only (fsync "always" e "batch").
+
+Uso:
+    python benchmarks/bench_todo_bulk.py --items 10000
+"""
+
+import argparse
+import asyncio
+import itertools
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+import main
+from mcp.storage import LogStorage, TodoStorage
+from mcp.todo import MAX_BULK_ITEMS, MCPTodoManager
+
+
+async def import_single(client: httpx.AsyncClient, items: list) -> float:
+    start = time.perf_counter()
+    for item in items:
+        response = await client.post("/mcp/tools/create_todo", json=item)
+        response.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def import_bulk(client: httpx.AsyncClient, items: list) -> float:
+    start = time.perf_counter()
+    for offset in range(0, len(items), MAX_BULK_ITEMS):
+        response = await client.post("/mcp/tools/bulk_create_todos",
+                                     json={"items": items[offset:offset + MAX_BULK_ITEMS]})
+        response.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def run(storage_factory, items: list) -> tuple:
+    """Tempi (singole, bulk) con un gestore nuovo per ciascuna modalità"""
+    timings = []
+    for importer in (import_single, import_bulk):
+        manager = MCPTodoManager(storage=storage_factory())
+        main.todo_manager = manager
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            timings.append(await importer(client, items))
+        manager.close()
+    return tuple(timings)
+
+
+def log_storage_factory(directory: str, policy: str):
+    """Ogni gestore riceve una directory di log nuova"""
+    counter = itertools.count()
+    return lambda: LogStorage(os.path.join(directory, f"{policy}-{next(counter)}"), fsync_policy=policy)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=10000)
+    args = parser.parse_args()
+
+    items = [{"title": f"Importato {i}", "description": "backlog"} for i in range(args.items)]
+    print(f"=== BENCHMARK IMPORT DI {args.items} TODO: SINGOLE vs BULK ===")
+    print(f"{'storage':<14} | {'singole (s)':>11} | {'bulk (s)':>9} | {'speedup':>8}")
+    print("-" * 52)
+
+    directory = tempfile.mkdtemp(prefix="todo-bulk-")
+    scenarios = [
+        ("memoria", TodoStorage),
+        ("log batch", log_storage_factory(directory, "batch")),
+        ("log always", log_storage_factory(directory, "always")),
+    ]
+    try:
+        for label, factory in scenarios:
+            single, bulk = asyncio.run(run(factory, items))
+            print(f"{label:<14} | {single:>11.2f} | {bulk:>9.3f} | {single / bulk:>7.1f}x")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main_cli()
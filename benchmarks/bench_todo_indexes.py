@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark: scansione completa contro indici secondari in MCPTodoManager.
+
+Per ogni dimensione (10^3 .. 10^6 di default) popola un gestore, completa
+un todo su dieci e misura statistiche, lista dei completati e lista dei
+todo in sospeso con il vecchio percorso a scansione e con quello indicizzato.
+
+Uso:
+    python benchmarks/bench_todo_indexes.py --min-exp 3 --max-exp 6
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mcp.todo import MCPTodoManager
+
+
+def scan_stats(manager: MCPTodoManager) -> dict:
+    """Statistiche calcolate come prima degli indici"""
+    total = len(manager.todos)
+    completed = sum(1 for todo in manager.todos.values() if todo.completed)
+    return {"total_todos": total, "completed_todos": completed, "pending_todos": total - completed}
+
+
+def scan_completed(manager: MCPTodoManager) -> list:
+    return [todo.to_dict() for todo in manager.todos.values() if todo.completed]
+
+
+def scan_pending(manager: MCPTodoManager) -> list:
+    return [todo.to_dict() for todo in manager.todos.values() if not todo.completed]
+
+
+def build_manager(size: int) -> MCPTodoManager:
+    """Gestore vuoto popolato con `size` todo, uno su dieci completato"""
+    manager = MCPTodoManager()
+    for todo_id in list(manager.todos):
+        manager.mcp_delete_todo(todo_id)
+    for i in range(size):
+        todo = manager.mcp_create_todo(f"Todo {i}", "benchmark")
+        if i % 10 == 0:
+            manager.mcp_update_todo(todo["id"], {"completed": True})
+    return manager
+
+
+def timed(fn, repeat: int) -> float:
+    """Tempo medio di una chiamata in millisecondi"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--min-exp", type=int, default=3)
+    parser.add_argument("--max-exp", type=int, default=6)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print("=== BENCHMARK INDICI TODO: SCANSIONE vs INDICIZZATO (ms per chiamata) ===")
+    print(f"{'todo':>9} | {'operazione':<18} | {'scansione':>10} | {'indicizzato':>11} | {'speedup':>8}")
+    print("-" * 70)
+
+    for exp in range(args.min_exp, args.max_exp + 1):
+        size = 10 ** exp
+        manager = build_manager(size)
+        cases = [
+            ("stats", lambda: scan_stats(manager), manager.mcp_get_stats),
+            ("completed", lambda: scan_completed(manager), manager.mcp_get_completed_todos),
+            ("pending", lambda: scan_pending(manager), manager.mcp_get_pending_todos),
+        ]
+        for name, scan_fn, indexed_fn in cases:
+            scan_ms = timed(scan_fn, args.repeat)
+            indexed_ms = timed(indexed_fn, args.repeat)
+            speedup = scan_ms / indexed_ms if indexed_ms > 0 else float("inf")
+            print(f"{size:>9} | {name:<18} | {scan_ms:>10.3f} | {indexed_ms:>11.4f} | {speedup:>7.1f}x")
+        del manager
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark: memoria dei todo come dizionari contro i TodoRecord compatti.
+
+Costruisce `--size` todo (1 milione di default) con il vecchio layout
+(un dict per todo, timestamp come stringhe ISO) e con TodoRecord (__slots__,
+timestamp interi), misurando con tracemalloc i byte allocati per la sola
+mappa id -> todo. Un todo su due ha anche updated_at, uno su dieci è completato.
+
+Uso:
+    python benchmarks/bench_todo_memory.py --size 1000000
+"""
+
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mcp.records import TodoRecord, now_micros
+
+
+def build_dicts(size: int) -> dict:
+    """Layout precedente: un dizionario per todo"""
+    todos = {}
+    for i in range(size):
+        todo_id = str(i + 1)
+        todo = {
+            "id": todo_id,
+            "title": f"Todo {i}",
+            "description": "",
+            "completed": False,
+            "created_at": datetime.now().isoformat()
+        }
+        if i % 2 == 0:
+            todo["updated_at"] = datetime.now().isoformat()
+        if i % 10 == 0:
+            todo["completed"] = True
+            todo["completed_at"] = datetime.now().isoformat()
+        todos[todo_id] = todo
+    return todos
+
+
+def build_records(size: int) -> dict:
+    """Layout compatto: TodoRecord con __slots__ e timestamp interi"""
+    todos = {}
+    for i in range(size):
+        todo_id = str(i + 1)
+        todo = TodoRecord(todo_id, f"Todo {i}", "")
+        if i % 2 == 0:
+            todo.updated_at = now_micros()
+        if i % 10 == 0:
+            todo.completed = True
+            todo.completed_at = now_micros()
+        todos[todo_id] = todo
+    return todos
+
+
+def measure(build, size: int) -> tuple:
+    """Byte allocati dalla struttura costruita e tempo di costruzione"""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    todos = build(size)
+    elapsed = time.perf_counter() - start
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del todos
+    gc.collect()
+    return allocated, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    print(f"=== BENCHMARK MEMORIA TODO ({args.size} todo) ===")
+    print(f"{'layout':<12} | {'MB totali':>10} | {'byte/todo':>10} | {'costruzione s':>13}")
+    print("-" * 54)
+
+    results = {}
+    for name, build in (("dict", build_dicts), ("TodoRecord", build_records)):
+        allocated, elapsed = measure(build, args.size)
+        results[name] = allocated
+        print(f"{name:<12} | {allocated / 2 ** 20:>10.1f} | {allocated / args.size:>10.0f} | {elapsed:>13.2f}")
+
+    print(f"\nRiduzione: {results['dict'] / results['TodoRecord']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
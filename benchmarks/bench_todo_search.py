@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Benchmark: ricerca dei todo con l'indice invertito contro la scansione lineare.
+
+Popola un gestore con `--size` todo (1 milione di default) con titoli e
+descrizioni generati da un vocabolario sintetico a distribuzione Zipf, poi
+misura p50/p99 della latenza di search_todos per termini rari, frequenti,
+query a più termini e prefissi. La scansione lineare (sottostringa su
+titolo e descrizione) viene misurata su poche ripetizioni come riferimento.
+
+Uso:
+    python benchmarks/bench_todo_search.py --size 1000000 --queries 200
+"""
+
+import argparse
+import itertools
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mcp.todo import MCPTodoManager
+
+SYLLABLES = ["ca", "pro", "get", "to", "ser", "ver", "do", "cu", "men", "ta", "re", "li", "sta", "bo", "rin"]
+
+
+def build_vocabulary(size: int) -> list:
+    """Parole sintetiche distinte di 2-4 sillabe"""
+    words = []
+    for length in (2, 3, 4):
+        for combo in itertools.product(SYLLABLES, repeat=length):
+            words.append("".join(combo))
+    words = list(dict.fromkeys(words))
+    random.shuffle(words)
+    return words[:size]
+
+
+def build_manager(size: int, vocabulary: list) -> MCPTodoManager:
+    """Gestore vuoto popolato con `size` todo generati"""
+    # Pesi cumulativi calcolati una volta sola: random.choices li ricalcolerebbe a ogni chiamata
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(vocabulary))))
+    manager = MCPTodoManager()
+    for todo_id in list(manager.todos):
+        manager.mcp_delete_todo(todo_id)
+    for _ in range(size):
+        words = random.choices(vocabulary, cum_weights=cum_weights, k=10)
+        manager.mcp_create_todo(" ".join(words[:3]), " ".join(words[3:]))
+    return manager
+
+
+def scan_search(manager: MCPTodoManager, query: str, limit: int) -> list:
+    """Ricerca per sottostringa come farebbe un client senza indice"""
+    terms = query.lower().split()
+    matches = [
+        todo for todo in manager.todos.values()
+        if all(term in todo.title.lower() or term in todo.description.lower() for term in terms)
+    ]
+    return matches[:limit]
+
+
+def percentiles(samples: list) -> tuple:
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    return statistics.median(samples), p99
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=1_000_000)
+    parser.add_argument("--vocabulary", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200, help="Query per scenario")
+    parser.add_argument("--scan-repeat", type=int, default=3)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    vocabulary = build_vocabulary(args.vocabulary)
+    print(f"Costruzione di {args.size} todo (vocabolario {len(vocabulary)} parole)...")
+    start = time.perf_counter()
+    manager = build_manager(args.size, vocabulary)
+    print(f"Costruiti in {time.perf_counter() - start:.1f}s")
+
+    common = vocabulary[:50]
+    rare = vocabulary[-5000:]
+    scenarios = [
+        ("termine raro", lambda: random.choice(rare), True),
+        ("termine frequente", lambda: random.choice(common), False),
+        ("due termini", lambda: f"{random.choice(common)} {random.choice(vocabulary[:2000])}", False),
+        ("prefisso 3 lettere", lambda: random.choice(vocabulary[:2000])[:3], True),
+        ("prefisso 5 lettere", lambda: random.choice(rare)[:5], True),
+    ]
+
+    print("\n=== BENCHMARK RICERCA TODO (ms per query) ===")
+    print(f"{'scenario':<20} | {'risultati':>9} | {'p50':>8} | {'p99':>8} | {'scansione':>10}")
+    print("-" * 68)
+
+    for name, make_query, prefix in scenarios:
+        samples = []
+        matches = []
+        for _ in range(args.queries):
+            query = make_query()
+            start = time.perf_counter()
+            result = manager.mcp_search_todos(query, limit=args.limit, prefix=prefix)
+            samples.append((time.perf_counter() - start) * 1000)
+            matches.append(result["total_matches"])
+        p50, p99 = percentiles(samples)
+
+        start = time.perf_counter()
+        for _ in range(args.scan_repeat):
+            scan_search(manager, make_query(), args.limit)
+        scan_ms = (time.perf_counter() - start) / args.scan_repeat * 1000
+
+        print(f"{name:<20} | {statistics.median(matches):>9.0f} | {p50:>8.3f} | {p99:>8.3f} | {scan_ms:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
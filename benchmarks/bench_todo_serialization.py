@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark: serializzazione delle liste di todo con e senza TODO_FAST_JSON.
+
+Per ogni dimensione (default 1k e 100k todo) chiama ripetutamente
+GET /mcp/tools/get_all_todos sull'app FastAPI in-process (httpx
+ASGITransport, nessuna rete) prima con response_model (validazione
+pydantic + serializzazione) e poi con il percorso veloce (JSON diretto
+dei dati del gestore), riportando richieste al secondo e latenze p50/p99.
+Verifica anche che i due percorsi producano gli stessi byte.
+
+Uso:
+    python benchmarks/bench_todo_serialization.py --sizes 1000 100000 --duration 5
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+import main
+from main import app
+from mcp import todo_manager
+from mcp.serialization import orjson
+
+PATH = "/mcp/tools/get_all_todos"
+BULK_CHUNK = 10000
+
+
+def fill_store(size: int):
+    """Porta lo store a `size` todo; uno su tre completato, come in un uso reale"""
+    missing = size - len(todo_manager.todos)
+    while missing > 0:
+        chunk = min(missing, BULK_CHUNK)
+        result = todo_manager.mcp_bulk_create_todos([
+            {"title": f"Todo di prova {i}", "description": "Descrizione abbastanza lunga per un todo reale"}
+            for i in range(chunk)
+        ])
+        todo_manager.mcp_bulk_update_todos([
+            {"id": item["id"], "completed": True}
+            for item in result["results"][::3]
+        ])
+        missing -= chunk
+
+
+def percentile(samples: list, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def measure(client: httpx.AsyncClient, fast: bool, duration: float, min_requests: int) -> dict:
+    """Richieste sequenziali per `duration` secondi (almeno `min_requests`)"""
+    main.FAST_JSON = fast
+    await client.get(PATH)  # riscaldamento
+    latencies = []
+    body = b""
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration or len(latencies) < min_requests:
+        request_start = time.perf_counter()
+        response = await client.get(PATH)
+        latencies.append(time.perf_counter() - request_start)
+        body = response.content
+    elapsed = time.perf_counter() - start
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "requests": len(latencies),
+        "body": body,
+    }
+
+
+async def run(sizes: list, duration: float, min_requests: int):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for size in sizes:
+            fill_store(size)
+            print(f"\n--- {len(todo_manager.todos)} todo ---")
+            results = {}
+            for label, fast in (("response_model", False), ("fast json", True)):
+                results[label] = result = await measure(client, fast, duration, min_requests)
+                print(f"{label:<16} {result['rps']:>9.1f} req/s   p50 {result['p50_ms']:>9.2f} ms   "
+                      f"p99 {result['p99_ms']:>9.2f} ms   ({result['requests']} richieste)")
+            baseline, fast = results["response_model"], results["fast json"]
+            same = "✅ stessi byte" if baseline["body"] == fast["body"] else "❌ corpi diversi"
+            print(f"Speedup: {fast['rps'] / baseline['rps']:.1f}x req/s, "
+                  f"{baseline['p99_ms'] / fast['p99_ms']:.1f}x p99 - {same}")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000])
+    parser.add_argument("--duration", type=float, default=5.0, help="Secondi per scenario")
+    parser.add_argument("--min-requests", type=int, default=20)
+    args = parser.parse_args()
+
+    print("=== BENCHMARK SERIALIZZAZIONE LISTE TODO ===")
+    print(f"Encoder veloce: {'orjson' if orjson is not None else 'pydantic-core'}")
+    asyncio.run(run(sorted(args.sizes), args.duration, args.min_requests))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Benchmark: richieste miste al secondo servite da un worker mentre
+le chiamate meteo upstream sono lente.
+
+Confronta il client asincrono condiviso con una chiamata bloccante
+(equivalente al vecchio requests.get) simulando OpenWeatherMap con
+un trasporto httpx che risponde dopo un ritardo configurabile.
+
+Uso:
+    python benchmarks/bench_weather_concurrency.py --delay 1.0 --duration 5
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from main import app
+from tools import weather
+from tools.resilience import CircuitBreaker, TokenBucket
+from tools.weather import weather_client
+
+MIXED_PATHS = ["/mcp/todos", "/capabilities/discovery", "/mcp/stats", "/mcp/tools"]
+
+FAKE_PAYLOAD = {
+    "main": {"temp": 21.5, "humidity": 40},
+    "weather": [{"description": "cielo sereno"}],
+}
+
+
+def slow_upstream(delay: float) -> httpx.MockTransport:
+    """Trasporto che simula un OpenWeatherMap lento"""
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(delay)
+        return httpx.Response(200, json=FAKE_PAYLOAD)
+    return httpx.MockTransport(handler)
+
+
+async def run_scenario(blocking: bool, delay: float, duration: float,
+                       weather_callers: int, mixed_callers: int) -> dict:
+    """Esegue uno scenario e restituisce i contatori"""
+    await weather_client.close()
+    weather_client.transport = slow_upstream(delay)
+    # Il benchmark misura l'event loop, non le protezioni upstream
+    weather.weather_rate_limiter = TokenBucket(per_minute=10 ** 9)
+    weather.weather_breaker = CircuitBreaker(failure_threshold=10 ** 9, slow_call_threshold=delay * 10,
+                                             reset_timeout=0)
+    original_fetch = weather_client.fetch
+
+    if blocking:
+        async def blocking_fetch(location: str):
+            time.sleep(delay)  # blocca l'event loop come requests.get
+            return {"temperature": 21.5, "conditions": "cielo sereno",
+                    "humidity": 40, "location": location}
+        weather_client.fetch = blocking_fetch
+
+    counters = {"mixed": 0, "weather": 0}
+    deadline = time.perf_counter() + duration
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def weather_loop(i: int):
+            n = 0
+            while time.perf_counter() < deadline:
+                # Località sempre diverse: ogni chiamata va upstream (nessun hit di cache)
+                await client.post("/mcp/tools/get_weather_dynamic", params={"location": f"City{i}-{n}"})
+                counters["weather"] += 1
+                n += 1
+
+        async def mixed_loop(i: int):
+            n = i
+            while time.perf_counter() < deadline:
+                await client.get(MIXED_PATHS[n % len(MIXED_PATHS)])
+                counters["mixed"] += 1
+                n += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(weather_loop(i) for i in range(weather_callers)),
+            *(mixed_loop(i) for i in range(mixed_callers)),
+        )
+        elapsed = time.perf_counter() - start
+
+    weather_client.fetch = original_fetch
+    await weather_client.close()
+    counters["elapsed"] = elapsed
+    return counters
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--delay", type=float, default=1.0, help="Latenza upstream simulata (s)")
+    parser.add_argument("--duration", type=float, default=5.0, help="Durata di ogni scenario (s)")
+    parser.add_argument("--weather-callers", type=int, default=4)
+    parser.add_argument("--mixed-callers", type=int, default=16)
+    args = parser.parse_args()
+
+    print("=== BENCHMARK METEO: EVENT LOOP CON UPSTREAM LENTO ===")
+    print(f"Latenza upstream: {args.delay}s, durata: {args.duration}s, "
+          f"chiamanti meteo: {args.weather_callers}, chiamanti misti: {args.mixed_callers}")
+    print()
+
+    for label, blocking in (("bloccante (requests.get)", True), ("asincrono (pool httpx)", False)):
+        result = asyncio.run(run_scenario(
+            blocking, args.delay, args.duration, args.weather_callers, args.mixed_callers
+        ))
+        mixed_rps = result["mixed"] / result["elapsed"]
+        weather_rps = result["weather"] / result["elapsed"]
+        print(f"{label:28s} misti: {mixed_rps:9.1f} req/s   meteo: {weather_rps:6.1f} req/s")
+
+
+if __name__ == "__main__":
+    main()
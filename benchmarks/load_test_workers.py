@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Test di carico multi-worker: consistenza e scalabilità dello store condiviso.
+
+Avvia gunicorn con la configurazione del progetto e N worker, poi esegue
+in concorrenza create seguite da letture dello stesso todo (che il kernel
+smista su worker diversi). Alla fine verifica che ogni todo creato sia
+leggibile e che le statistiche coincidano con le create eseguite.
+
+Con --backend memory mostra il problema originale (404 e conteggi divergenti),
+con --backend sqlite (default) la consistenza tra i worker.
+
+Uso:
+    python benchmarks/load_test_workers.py --workers 1 2 4 --operations 2000
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def start_server(workers: int, port: int, backend: str, data_dir: str) -> subprocess.Popen:
+    """Avvia gunicorn e attende che risponda"""
+    env = dict(os.environ)
+    env.update({
+        "TODO_STORAGE": backend,
+        "TODO_DATA_DIR": data_dir,
+        "TODO_SQLITE_PATH": os.path.join(data_dir, "todos.db"),
+    })
+    process = subprocess.Popen(
+        # max_requests disattivato: il riciclo dei worker chiude connessioni in volo
+        # e falserebbe il conteggio degli errori
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--max-requests", "0",
+         "--workers", str(workers), "--bind", f"127.0.0.1:{port}", "main:app"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/", timeout=1).status_code == 200:
+                # Lascia il tempo a tutti i worker di completare l'avvio
+                time.sleep(1)
+                return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("Il server non si è avviato in tempo")
+
+
+async def run_load(base_url: str, operations: int, reads: int, concurrency: int) -> dict:
+    """Create + letture concorrenti; restituisce contatori e durata"""
+    counters = {"created": 0, "reads": 0, "not_found": 0, "errors": 0}
+    created_ids = []
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=0)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        async def one(i: int):
+            async with semaphore:
+                try:
+                    await create_and_read(i)
+                except httpx.TransportError:
+                    counters["errors"] += 1
+
+        async def create_and_read(i: int):
+            response = await client.post("/mcp/todos", json={"title": f"Carico {i}"})
+            if response.status_code != 200:
+                counters["errors"] += 1
+                return
+            todo_id = response.json()["id"]
+            counters["created"] += 1
+            created_ids.append(todo_id)
+            for _ in range(reads):
+                # Connessioni non persistenti: ogni lettura può finire su un altro worker
+                response = await client.get(f"/mcp/todos/{todo_id}")
+                counters["reads"] += 1
+                if response.status_code == 404:
+                    counters["not_found"] += 1
+                elif response.status_code != 200:
+                    counters["errors"] += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(operations)))
+        counters["elapsed"] = time.perf_counter() - start
+
+        stats = (await client.get("/mcp/stats")).json()
+        counters["stats_total"] = stats["total_todos"]
+        counters["unique_ids"] = len(set(created_ids))
+    return counters
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--backend", choices=["sqlite", "memory"], default="sqlite")
+    parser.add_argument("--operations", type=int, default=2000, help="Todo creati per run")
+    parser.add_argument("--reads", type=int, default=3, help="Letture per todo creato")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--port", type=int, default=3199)
+    args = parser.parse_args()
+
+    print(f"=== TEST DI CARICO MULTI-WORKER (backend {args.backend}) ===")
+    print(f"{'worker':>6} | {'req/s':>9} | {'create':>6} | {'id unici':>8} | {'404':>5} | {'errori':>6} | {'stats':>6} | esito")
+    print("-" * 78)
+
+    for workers in args.workers:
+        data_dir = tempfile.mkdtemp(prefix="todo-load-")
+        process = start_server(workers, args.port, args.backend, data_dir)
+        try:
+            result = asyncio.run(run_load(f"http://127.0.0.1:{args.port}", args.operations,
+                                          args.reads, args.concurrency))
+        finally:
+            process.terminate()
+            process.wait()
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+        requests_done = result["created"] + result["reads"]
+        consistent = (
+            result["not_found"] == 0
+            and result["errors"] == 0
+            and result["unique_ids"] == result["created"]
+            and result["stats_total"] == result["created"] + 3  # 3 todo di esempio
+        )
+        print(f"{workers:>6} | {requests_done / result['elapsed']:>9.0f} | {result['created']:>6} | "
+              f"{result['unique_ids']:>8} | {result['not_found']:>5} | {result['errors']:>6} | "
+              f"{result['stats_total']:>6} | {'✅ consistente' if consistent else '❌ divergente'}")
+
+
+if __name__ == "__main__":
+    main()
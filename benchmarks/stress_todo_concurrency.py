@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Stress test di concorrenza per MCPTodoManager.
+
+Esegue da più thread migliaia di operazioni miste (create, update, delete,
+bulk, clear_completed, letture paginate, ricerche, statistiche) con un
+intervallo di switch del GIL molto basso per far emergere le race. Alla fine
+verifica gli invarianti:
+
+- ogni create ha ricevuto un id diverso;
+- dizionario principale, indici completati/in sospeso, elenco ordinato e
+  indice di ricerca contengono esattamente gli stessi todo;
+- il numero di todo coincide con create - delete riusciti;
+- nessuna lettura ha sollevato eccezioni;
+- applicando le modifiche di get_changes_since allo stato iniziale si
+  ottiene lo stato finale;
+- con --storage log, ricaricando dal disco si ottiene lo stesso stato.
+
+Uso:
+    python benchmarks/stress_todo_concurrency.py --threads 32 --operations 20000 --storage log
+"""
+
+import argparse
+import random
+import shutil
+import sys
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mcp.storage import LogStorage, TodoStorage
+from mcp.todo import MCPTodoManager, SAMPLE_TODOS
+
+
+class Tally:
+    """Contatori condivisi tra i thread"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = Counter()
+        self.created_ids = []
+        self.errors = []
+
+    def add(self, key: str, amount: int = 1):
+        with self._lock:
+            self.counts[key] += amount
+
+    def created(self, ids):
+        with self._lock:
+            self.created_ids.extend(ids)
+
+    def error(self, operation: str, exc: BaseException):
+        with self._lock:
+            self.errors.append(f"{operation}: {type(exc).__name__}: {exc}")
+
+
+def random_id(manager: MCPTodoManager) -> str:
+    return str(random.randint(1, max(manager.next_id - 1, 1)))
+
+
+def run_operation(manager: MCPTodoManager, tally: Tally, seed: int):
+    rng = random.Random(seed)
+    roll = rng.random()
+    operation = "?"
+    try:
+        if roll < 0.30:
+            operation = "create"
+            todo = manager.mcp_create_todo(f"Stress {seed}", rng.choice(["", "alpha beta", "gamma"]))
+            tally.created([todo["id"]])
+        elif roll < 0.50:
+            operation = "update"
+            updates = rng.choice([{"completed": True}, {"completed": False}, {"title": f"Titolo {seed}"}])
+            manager.mcp_update_todo(random_id(manager), updates)
+        elif roll < 0.60:
+            operation = "delete"
+            if manager.mcp_delete_todo(random_id(manager)) is not None:
+                tally.add("deleted")
+        elif roll < 0.63:
+            operation = "bulk_create"
+            result = manager.mcp_bulk_create_todos([{"title": f"Bulk {seed}-{i}"} for i in range(5)])
+            tally.created([item["id"] for item in result["results"]])
+        elif roll < 0.65:
+            operation = "bulk_delete"
+            result = manager.mcp_bulk_delete_todos([random_id(manager) for _ in range(3)])
+            tally.add("deleted", result["succeeded"])
+        elif roll < 0.66:
+            operation = "clear_completed"
+            tally.add("deleted", manager.mcp_clear_completed_todos()["deleted_count"])
+        elif roll < 0.75:
+            operation = "list"
+            cursor = None
+            previous = 0
+            for _ in range(3):
+                page = manager.mcp_list_todos(cursor=cursor, limit=50)
+                ids = [int(item["id"]) for item in page["items"]]
+                if ids != sorted(ids) or (ids and ids[0] <= previous):
+                    raise AssertionError(f"pagina non ordinata: {ids[:5]}...")
+                previous = ids[-1] if ids else previous
+                cursor = page["next_cursor"]
+                if cursor is None:
+                    break
+        elif roll < 0.85:
+            operation = "search"
+            manager.mcp_search_todos(rng.choice(["stress", "bulk", "alph", "titolo gamma"]))
+        elif roll < 0.92:
+            operation = "read_all"
+            manager.mcp_get_all_todos()
+            manager.mcp_get_pending_todos()
+        else:
+            operation = "stats"
+            manager.mcp_get_stats()
+        tally.add(operation)
+    except Exception as exc:  # noqa: BLE001 - ogni eccezione è un fallimento del test
+        tally.error(operation, exc)
+
+
+def replay_changes(manager: MCPTodoManager, initial: dict, sync_token: str) -> dict:
+    """Stato iniziale + sincronizzazione incrementale, a pagine"""
+    state = dict(initial)
+    while True:
+        delta = manager.mcp_get_changes_since(since=sync_token, limit=500)
+        if delta["reset"]:
+            raise AssertionError("la sincronizzazione incrementale ha richiesto un reset")
+        state.update((todo["id"], todo) for todo in delta["todos"])
+        for todo_id in delta["deleted"]:
+            state.pop(todo_id, None)
+        sync_token = delta["sync_token"]
+        if not delta["has_more"]:
+            return state
+
+
+def check_invariants(manager: MCPTodoManager, tally: Tally) -> list:
+    """Elenco delle violazioni (vuoto se lo stato è coerente)"""
+    problems = []
+    ids = set(manager.todos)
+
+    duplicates = [todo_id for todo_id, count in Counter(tally.created_ids).items() if count > 1]
+    if duplicates:
+        problems.append(f"id assegnati più volte: {duplicates[:10]}")
+
+    expected = len(SAMPLE_TODOS) + len(tally.created_ids) - tally.counts["deleted"]
+    if len(ids) != expected:
+        problems.append(f"todo presenti {len(ids)}, attesi {expected}")
+
+    completed = set(manager._completed_index)
+    pending = set(manager._pending_index)
+    if completed & pending:
+        problems.append(f"todo in entrambi gli indici: {sorted(completed & pending)[:10]}")
+    if completed | pending != ids:
+        problems.append("indici secondari diversi dal dizionario principale")
+    wrong_state = [todo_id for todo_id in completed if not manager.todos[todo_id].completed]
+    wrong_state += [todo_id for todo_id in pending if manager.todos[todo_id].completed]
+    if wrong_state:
+        problems.append(f"todo nell'indice sbagliato: {wrong_state[:10]}")
+    stale = [todo_id for todo_id in ids
+             if manager._index_for(manager.todos[todo_id].completed).get(todo_id) is not manager.todos[todo_id]]
+    if stale:
+        problems.append(f"indici con una versione superata del record: {stale[:10]}")
+
+    order = manager._order
+    if order != sorted(order, key=int):
+        problems.append("elenco degli id non ordinato")
+    if ids - set(order):
+        problems.append(f"id mancanti dall'elenco ordinato: {sorted(ids - set(order))[:10]}")
+
+    if set(manager._search_index._doc_terms) != ids:
+        problems.append("indice di ricerca diverso dal dizionario principale")
+
+    stats = manager.mcp_get_stats()
+    if stats["total_todos"] != len(ids) or stats["completed_todos"] + stats["pending_todos"] != len(ids):
+        problems.append(f"statistiche incoerenti: {stats}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--operations", type=int, default=20000)
+    parser.add_argument("--storage", choices=["memory", "log"], default="memory")
+    parser.add_argument("--snapshot-every", type=int, default=500,
+                        help="Mutazioni tra due snapshot (solo --storage log)")
+    parser.add_argument("--switch-interval", type=float, default=1e-6,
+                        help="sys.setswitchinterval durante il test")
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix="todo-stress-") if args.storage == "log" else None
+    storage = (LogStorage(data_dir, snapshot_every=args.snapshot_every)
+               if data_dir else TodoStorage())
+    manager = MCPTodoManager(storage)
+    tally = Tally()
+    sync_token = manager.mcp_get_changes_since()["sync_token"]
+    initial = {todo["id"]: todo for todo in manager.mcp_get_all_todos()}
+
+    print(f"=== STRESS TEST CONCORRENZA ({args.threads} thread, {args.operations} operazioni, "
+          f"storage {args.storage}) ===")
+    previous_interval = sys.getswitchinterval()
+    sys.setswitchinterval(args.switch_interval)
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            for seed in range(args.operations):
+                pool.submit(run_operation, manager, tally, seed)
+    finally:
+        sys.setswitchinterval(previous_interval)
+    elapsed = time.perf_counter() - start
+
+    print(f"Completato in {elapsed:.2f}s ({args.operations / elapsed:.0f} op/s)")
+    for operation, count in sorted(tally.counts.items()):
+        print(f"  {operation:<16} {count:>7}")
+
+    problems = [f"eccezione in {error}" for error in tally.errors[:10]]
+    problems += check_invariants(manager, tally)
+    final = {todo["id"]: todo for todo in manager.mcp_get_all_todos()}
+    if replay_changes(manager, initial, sync_token) != final:
+        problems.append("la sincronizzazione incrementale non ricostruisce lo stato finale")
+
+    if data_dir:
+        storage.wait_for_snapshot()
+        before = {todo["id"]: todo for todo in manager.mcp_get_all_todos()}
+        manager.close()
+        reloaded = MCPTodoManager(LogStorage(data_dir))
+        after = {todo["id"]: todo for todo in reloaded.mcp_get_all_todos()}
+        reloaded.close()
+        shutil.rmtree(data_dir, ignore_errors=True)
+        if before != after:
+            missing = set(before) ^ set(after)
+            changed = [todo_id for todo_id in set(before) & set(after) if before[todo_id] != after[todo_id]]
+            problems.append(f"stato ricaricato diverso: {len(missing)} id diversi, {len(changed)} todo diversi")
+
+    if problems:
+        print("\n❌ Invarianti violati:")
+        for problem in problems:
+            print(f"  - {problem}")
+        sys.exit(1)
+    print("\n✅ Tutti gli invarianti rispettati")
+
+
+if __name__ == "__main__":
+    main()
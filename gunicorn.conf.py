@@ -1,5 +1,6 @@
 # Gunicorn configuration file
 import multiprocessing
+import os
 
 max_requests = 1000
 max_requests_jitter = 50
@@ -9,4 +10,7 @@ log_file = "-"
 bind = "0.0.0.0:3100"
 
 worker_class = "uvicorn.workers.UvicornWorker"
-workers = (multiprocessing.cpu_count() * 2) + 1
\ No newline at end of file
+# Con TODO_STORAGE=log i todo sopravvivono al riciclo dei worker (max_requests),
+# ma la directory del log appartiene a un solo processo: impostare WEB_CONCURRENCY=1.
+# Con TODO_STORAGE=sqlite tutti i worker condividono lo stesso database.
+workers = int(os.getenv("WEB_CONCURRENCY", (multiprocessing.cpu_count() * 2) + 1))
\ No newline at end of file
@@ -1,320 +1,741 @@
-from fastapi import FastAPI, HTTPException
-from typing import List, Dict, Optional
+import asyncio
+import json
+import mimetypes
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
+from pydantic import TypeAdapter
+from typing import Any, AsyncIterator, Callable, Hashable, List, Dict, Optional, Union
 import uvicorn
 
 # Importa i moduli MCP
-from mcp import todo_manager, TodoCreate, TodoUpdate, Todo, TodoStats
+from mcp import (
+    todo_manager, todo_registry, TenantCapacityError, MCPTodoManager, TodoCreate, TodoUpdate, Todo, TodoStats, TodoPage,
+    TodoBulkCreate, TodoBulkUpdate, TodoBulkDelete, TodoSearchResult, TodoChanges,
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT,
+    DEFAULT_CHANGES_LIMIT, MAX_CHANGES_LIMIT,
+    VersionedResponseCache, etag_matches, FAST_JSON, dump_json, dump_todos_json,
+    IdempotencyKeyInProgress, IdempotencyKeyReused, MAX_IDEMPOTENCY_KEY_LENGTH, request_fingerprint,
+    mcp_server, capabilities, JSONRPCError, PARSE_ERROR, error_response,
+    READ_FILE_MAX_BYTES, READ_FILE_MAX_STREAM_BYTES, FileRangeNotSatisfiable, FileShrunkError, open_file_slice,
+    file_content_cache
+)
 
 # Importa i tool
-from tools import get_weather, get_weather_dynamic
+from tools import (
+    get_weather, get_weather_dynamic, get_weather_batch, WeatherBatchRequest, weather_client,
+    get_weather_cache_stats, get_weather_flight_stats, get_weather_upstream_stats
+)
 
 # Importa il modulo di sampling
 from sampling import code_review, request_sampling, CodeReviewRequest, SamplingRequest
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Apre e chiude le risorse condivise del processo"""
+    await weather_client.start()
+    yield
+    await weather_client.close()
+    todo_registry.close()
+    todo_manager.close()
+
 app = FastAPI(
     title="FastAPI + MCP Server",
     description="Server FastAPI che integra funzionalità MCP per meteo e todo list",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # === ENDPOINT METEO ===
 
-@app.post("/mcp/tools/get_weather", response_model=Dict)
+@capabilities.route("get_weather", "POST", "/mcp/tools/get_weather", response_model=Dict)
 async def weather_endpoint(location: str):
     """Endpoint per ottenere il meteo simulato"""
     return await get_weather(location)
 
-@app.post("/mcp/tools/get_weather_dynamic", response_model=Dict)
+@capabilities.route("get_weather_dynamic", "POST", "/mcp/tools/get_weather_dynamic", response_model=Dict)
 async def weather_dynamic_endpoint(location: str):
     """Endpoint per ottenere il meteo reale da OpenWeatherMap"""
     return await get_weather_dynamic(location)
 
+@capabilities.route("get_weather_batch", "POST", "/mcp/tools/get_weather_batch", response_model=Dict)
+async def weather_batch_endpoint(request: WeatherBatchRequest):
+    """Endpoint per ottenere il meteo reale di più località in una chiamata"""
+    return await get_weather_batch(request)
+
+# === ENDPOINT DIAGNOSTICA ===
+
+@app.get("/diagnostics/weather", response_model=Dict, tags=["diagnostics"])
+async def weather_diagnostics():
+    """Stato della cache meteo, delle richieste in volo e delle protezioni upstream"""
+    return {
+        "cache": get_weather_cache_stats(),
+        "single_flight": get_weather_flight_stats(),
+        **get_weather_upstream_stats()
+    }
+
+async def request_tenant(x_tenant_id: Optional[str] = Header(None),
+                         mcp_session_id: Optional[str] = Header(None)) -> Optional[str]:
+    """Tenant della richiesta: X-Tenant-ID o, in sua assenza, la sessione MCP (Mcp-Session-Id)"""
+    return x_tenant_id or mcp_session_id
+
+async def acquire_todo_manager(tenant: Optional[str]) -> MCPTodoManager:
+    """
+    Prende in uso lo shard del tenant (da restituire con todo_registry.release);
+    con un backend bloccante (SQLite) l'apertura di uno shard va nel threadpool.
+    """
+    if tenant and todo_registry.default.blocking_io:
+        return await run_in_threadpool(todo_registry.acquire, tenant)
+    return todo_registry.acquire(tenant)
+
+async def tenant_todo_manager(tenant: Optional[str] = Depends(request_tenant)) -> AsyncIterator[MCPTodoManager]:
+    """
+    Store dei todo della richiesta: uno shard per tenant o sessione MCP;
+    senza header lo store globale. Lo shard resta in uso (non viene chiuso)
+    fino alla fine della richiesta. Asincrona per non passare dal threadpool
+    a ogni richiesta.
+    """
+    try:
+        manager = await acquire_todo_manager(tenant)
+    except TenantCapacityError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "60"})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        yield manager
+    finally:
+        todo_registry.release(tenant)
+
+async def run_todo(manager: MCPTodoManager, function: Callable, *args, **kwargs) -> Any:
+    """
+    Esegue un'operazione del gestore dei todo.
+
+    Con I/O bloccante (manager.blocking_io, es. SQLite che attende il lock di
+    scrittura di un altro worker) va nel threadpool per non fermare l'event
+    loop; in memoria la chiamata diretta costa meno del passaggio al thread.
+    """
+    if manager.blocking_io:
+        return await run_in_threadpool(function, *args, **kwargs)
+    return function(*args, **kwargs)
+
+@app.get("/diagnostics/todos", response_model=Dict, tags=["diagnostics"])
+async def todo_diagnostics(manager: MCPTodoManager = Depends(tenant_todo_manager)):
+    """Versione dello store del tenant, cache delle risposte condizionali e shard attivi"""
+    version, etag = await run_todo(manager, lambda: (manager.current_version(), manager.etag()))
+    return {
+        "version": version,
+        "etag": etag,
+        "response_cache": todo_response_cache.stats(),
+        "change_feed": manager.changes.stats(),
+        "idempotency": manager.idempotency.stats(),
+        "mcp": mcp_server.stats(),
+        "tenants": todo_registry.stats()
+    }
+
 # === ENDPOINT SAMPLING ===
 
-@app.post("/mcp/prompts/code_review", response_model=List[Dict])
+@capabilities.route("code_review", "POST", "/mcp/prompts/code_review", response_model=List[Dict])
 async def code_review_endpoint(request: CodeReviewRequest):
     """Endpoint per la revisione del codice"""
     return await code_review(request)
 
-@app.post("/mcp/sampling/request_sampling", response_model=Dict)
+@capabilities.route("request_sampling", "POST", "/mcp/sampling/request_sampling", response_model=Dict)
 async def sampling_endpoint(request: SamplingRequest):
     """Endpoint per le richieste di sampling"""
     return await request_sampling(request)
 
 # === ENDPOINT FILE RESOURCE ===
 
-@app.get("/mcp/resources/read_file", response_model=Dict)
-async def read_file(file_path: str):
+@capabilities.route("read_file", "GET", "/mcp/resources/read_file", response_model=Dict)
+async def read_file(request: Request,
+                    file_path: str,
+                    offset: int = Query(0, ge=0),
+                    length: Optional[int] = Query(None, ge=1),
+                    raw: bool = False,
+                    range_header: Optional[str] = Header(None, alias="Range")):
     """
-    Simula un resource che legge il contenuto di un file.
+    MCP Resource: contenuto di un file, intero o un intervallo di byte.
+
+    offset/length scelgono l'intervallo; l'header Range fa lo stesso e
+    risponde 206 in streaming. Il JSON {"content": ...} è limitato a
+    READ_FILE_MAX_BYTES (413 oltre) e ha i fine riga CRLF e CR convertiti
+    in LF, come la lettura in modo testo. Con raw=true i byte arrivano
+    invariati, senza JSON, a blocchi letti nel thread pool: memoria costante
+    anche su file di molti GB, limite opzionale READ_FILE_MAX_STREAM_BYTES.
+
+    L'ETag viene da inode, mtime e dimensione (304 con If-None-Match) e le
+    risposte JSON restano in file_content_cache finché il file non cambia.
     """
     try:
-        with open(file_path, 'r') as f:
-            content = f.read()
-        return {"content": content}
-    except Exception as e:
+        file_slice = await open_file_slice(file_path, offset, length, range_header)
+    except FileRangeNotSatisfiable as e:
+        raise HTTPException(status_code=416, detail=str(e), headers={"Content-Range": f"bytes */{e.size}"})
+    except OSError as e:
         raise HTTPException(status_code=400, detail=f"Errore nella lettura del file: {str(e)}")
+    
+    headers = {"ETag": file_slice.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), file_slice.etag):
+        file_slice.close()
+        return Response(status_code=304, headers=headers)
+    
+    if raw or file_slice.partial:
+        if READ_FILE_MAX_STREAM_BYTES and file_slice.length > READ_FILE_MAX_STREAM_BYTES:
+            file_slice.close()
+            raise HTTPException(status_code=413, detail=(
+                f"Intervallo troppo grande: {file_slice.length} byte (massimo {READ_FILE_MAX_STREAM_BYTES})"))
+        headers.update({"Content-Length": str(file_slice.length), "Accept-Ranges": "bytes"})
+        if file_slice.partial:
+            headers["Content-Range"] = file_slice.content_range()
+        # chunks() chiude il file nel finally, ma solo se lo stream parte: il
+        # task in background lo chiude anche se la risposta non viene mai letta
+        return StreamingResponse(
+            file_slice.chunks(),
+            status_code=206 if file_slice.partial else 200,
+            media_type=mimetypes.guess_type(file_path)[0] or "application/octet-stream",
+            headers=headers,
+            background=BackgroundTask(file_slice.close)
+        )
+    
+    key, validator = file_slice.cache_key
+    try:
+        body = file_content_cache.get(key, validator)
+        if body is None:
+            if file_slice.length > READ_FILE_MAX_BYTES:
+                raise HTTPException(status_code=413, detail=(
+                    f"File troppo grande: {file_slice.length} byte (massimo {READ_FILE_MAX_BYTES}); "
+                    "usare offset/length o raw=true"))
+            content = await file_slice.read_text()
+            body = dump_json({"content": content, "offset": file_slice.start, "size": file_slice.size})
+            file_content_cache.set(key, validator, body)
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Il file non è testo UTF-8: usare raw=true")
+    except FileShrunkError as e:
+        raise HTTPException(status_code=409, detail=f"{str(e)}: riprovare")
+    finally:
+        file_slice.close()
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.get("/diagnostics/files", response_model=Dict, tags=["diagnostics"])
+async def file_diagnostics():
+    """Cache dei contenuti di read_file: hit rate, byte occupati e byte espulsi"""
+    return {"content_cache": file_content_cache.stats()}
 
 # === NUOVI ENDPOINT MCP TODO ===
 
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Converte il parametro `fields=a,b,c` in lista di campi"""
+    if not fields:
+        return None
+    return [field.strip() for field in fields.split(",") if field.strip()]
+
+def list_todos(manager: MCPTodoManager, limit: Optional[int], cursor: Optional[str],
+               completed: Optional[bool], fields: Optional[str]):
+    """
+    Lista completa (compatibile con i client esistenti) se non è richiesto
+    nessun parametro, altrimenti una pagina a cursore con proiezione dei campi.
+    """
+    if limit is None and cursor is None and completed is None and fields is None:
+        return manager.mcp_get_all_todos()
+    try:
+        return manager.mcp_list_todos(
+            cursor=cursor,
+            limit=limit or DEFAULT_PAGE_SIZE,
+            completed=completed,
+            fields=parse_fields(fields)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def todo_list_response(data: Union[List[Dict], Dict]):
+    """
+    Con TODO_FAST_JSON=1 i todo del gestore (dati già fidati) vanno in JSON
+    direttamente, senza la rivalidazione di response_model; altrimenti
+    FastAPI valida e serializza come di consueto.
+    """
+    if not FAST_JSON:
+        return data
+    return Response(content=dump_todos_json(data), media_type="application/json")
+
+TODO_ADAPTER = TypeAdapter(Todo)
+BULK_RESULT_ADAPTER = TypeAdapter(Dict)
+
+async def idempotency_key(idempotency_key: Optional[str] = Query(None, max_length=MAX_IDEMPOTENCY_KEY_LENGTH),
+                          idempotency_key_header: Optional[str] = Header(
+                              None, alias="Idempotency-Key", max_length=MAX_IDEMPOTENCY_KEY_LENGTH)
+                          ) -> Optional[str]:
+    """Chiave di idempotenza dall'header Idempotency-Key o dal parametro idempotency_key"""
+    return idempotency_key_header or idempotency_key
+
+async def idempotent(manager: MCPTodoManager, key: Optional[str], operation: str, payload: Any,
+                     adapter: TypeAdapter, produce: Callable[[], Any]):
+    """
+    Esegue una scrittura al massimo una volta per Idempotency-Key.
+
+    Un retry con la stessa chiave (e lo stesso corpo) riceve i byte della
+    risposta originale con l'header Idempotent-Replayed, senza toccare lo
+    store; la stessa chiave con un corpo diverso è un errore 422. Senza
+    chiave la scrittura viene eseguita normalmente.
+    """
+    if key is None:
+        return await run_todo(manager, produce)
+    try:
+        body, replayed = await run_todo(
+            manager,
+            manager.idempotency.run,
+            (operation, key),
+            request_fingerprint(payload),
+            # Stessa validazione di response_model, così replay e originale sono identici
+            lambda: adapter.dump_json(adapter.validate_python(produce()))
+        )
+    except IdempotencyKeyReused as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except IdempotencyKeyInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    headers = {"Idempotent-Replayed": "true"} if replayed else None
+    return Response(content=body, media_type="application/json", headers=headers)
+
 # Endpoint RESTful per compatibilità con i test esistenti
-@app.get("/mcp/todos", response_model=List[Todo])
-async def get_todos():
-    """Ottieni tutti i todo (endpoint RESTful)"""
-    return todo_manager.mcp_get_all_todos()
-
-@app.post("/mcp/todos", response_model=Todo)
-async def create_todo(todo: TodoCreate):
-    """Crea un nuovo todo (endpoint RESTful)"""
-    return todo_manager.mcp_create_todo(todo.title, todo.description)
-
-@app.get("/mcp/todos/status/completed", response_model=List[Todo])
-async def get_completed_todos():
+@app.get("/mcp/todos", response_model=Union[List[Todo], TodoPage], tags=["todos"])
+async def get_todos(limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+                    cursor: Optional[str] = None,
+                    completed: Optional[bool] = None,
+                    fields: Optional[str] = None,
+                    manager: MCPTodoManager = Depends(tenant_todo_manager)):
+    """Ottieni tutti i todo o una pagina di todo (endpoint RESTful)"""
+    return todo_list_response(await run_todo(manager, list_todos, manager, limit, cursor, completed, fields))
+
+@app.post("/mcp/todos", response_model=Todo, tags=["todos"])
+async def create_todo(todo: TodoCreate, manager: MCPTodoManager = Depends(tenant_todo_manager),
+                      key: Optional[str] = Depends(idempotency_key)):
+    """Crea un nuovo todo (endpoint RESTful, supporta Idempotency-Key)"""
+    return await idempotent(manager, key, "create_todo", todo.dict(), TODO_ADAPTER,
+                            lambda: manager.mcp_create_todo(todo.title, todo.description))
+
+@app.get("/mcp/todos/status/completed", response_model=List[Todo], tags=["todos"])
+async def get_completed_todos(manager: MCPTodoManager = Depends(tenant_todo_manager)):
     """Ottieni i todo completati (endpoint RESTful)"""
-    return todo_manager.mcp_get_completed_todos()
+    return todo_list_response(await run_todo(manager, manager.mcp_get_completed_todos))
 
-@app.get("/mcp/todos/{todo_id}", response_model=Todo)
-async def get_todo(todo_id: str):
+@app.get("/mcp/todos/{todo_id}", response_model=Todo, tags=["todos"])
+async def get_todo(todo_id: str, manager: MCPTodoManager = Depends(tenant_todo_manager)):
     """Ottieni un todo specifico (endpoint RESTful)"""
-    todo = todo_manager.mcp_get_todo_by_id(todo_id)
+    todo = await run_todo(manager, manager.mcp_get_todo_by_id, todo_id)
     if todo is None:
         raise HTTPException(status_code=404, detail="Todo non trovato")
     return todo
 
-@app.put("/mcp/todos/{todo_id}", response_model=Todo)
-async def update_todo(todo_id: str, todo_update: TodoUpdate):
+@app.put("/mcp/todos/{todo_id}", response_model=Todo, tags=["todos"])
+async def update_todo(todo_id: str, todo_update: TodoUpdate,
+                      manager: MCPTodoManager = Depends(tenant_todo_manager)):
     """Aggiorna un todo (endpoint RESTful)"""
     updates = todo_update.dict(exclude_unset=True)
-    updated_todo = todo_manager.mcp_update_todo(todo_id, updates)
+    updated_todo = await run_todo(manager, manager.mcp_update_todo, todo_id, updates)
     if updated_todo is None:
         raise HTTPException(status_code=404, detail="Todo non trovato")
     return updated_todo
 
-@app.delete("/mcp/todos/{todo_id}", response_model=Dict)
-async def delete_todo(todo_id: str):
+@app.delete("/mcp/todos/{todo_id}", response_model=Dict, tags=["todos"])
+async def delete_todo(todo_id: str, manager: MCPTodoManager = Depends(tenant_todo_manager)):
     """Elimina un todo (endpoint RESTful)"""
-    deleted_todo = todo_manager.mcp_delete_todo(todo_id)
+    deleted_todo = await run_todo(manager, manager.mcp_delete_todo, todo_id)
     if deleted_todo is None:
         raise HTTPException(status_code=404, detail="Todo non trovato")
     return {"message": f"Todo '{deleted_todo['title']}' eliminato con successo"}
 
-@app.get("/mcp/stats", response_model=Dict)
-async def get_stats():
+@app.get("/mcp/stats", response_model=Dict, tags=["todos"])
+async def get_stats(manager: MCPTodoManager = Depends(tenant_todo_manager)):
     """Ottieni statistiche (endpoint RESTful)"""
-    stats = todo_manager.mcp_get_stats()
+    stats = await run_todo(manager, manager.mcp_get_stats)
     return stats
 
-@app.post("/mcp/tools/create_todo", response_model=Todo)
-async def create_todo_tool(todo: TodoCreate):
+@capabilities.route("create_todo", "POST", "/mcp/tools/create_todo", response_model=Todo)
+async def create_todo_tool(todo: TodoCreate, manager: MCPTodoManager = Depends(tenant_todo_manager),
+                           key: Optional[str] = Depends(idempotency_key)):
     """
-    MCP Tool: Crea un nuovo todo item
+    MCP Tool: Crea un nuovo todo item (supporta Idempotency-Key)
     """
-    new_todo = todo_manager.mcp_create_todo(todo.title, todo.description)
-    return new_todo
-
-@app.get("/mcp/tools/get_all_todos", response_model=List[Todo])
-async def get_all_todos_tool():
+    # Stessa operazione di POST /mcp/todos: un retry può passare da uno dei due endpoint
+    return await idempotent(manager, key, "create_todo", todo.dict(), TODO_ADAPTER,
+                            lambda: manager.mcp_create_todo(todo.title, todo.description))
+
+@capabilities.route("get_all_todos", "GET", "/mcp/tools/get_all_todos", response_model=Union[List[Todo], TodoPage])
+async def get_all_todos_tool(limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+                             cursor: Optional[str] = None,
+                             completed: Optional[bool] = None,
+                             fields: Optional[str] = None,
+                             manager: MCPTodoManager = Depends(tenant_todo_manager)):
     """
-    MCP Tool: Ottiene tutti i todo items
+    MCP Tool: Ottiene tutti i todo items o una pagina alla volta
     """
-    return todo_manager.mcp_get_all_todos()
+    return todo_list_response(await run_todo(manager, list_todos, manager, limit, cursor, completed, fields))
 
-@app.post("/mcp/tools/get_todo_by_id", response_model=Todo)
-async def get_todo_by_id_tool(todo_id: str):
+@capabilities.route("get_todo_by_id", "POST", "/mcp/tools/get_todo_by_id", response_model=Todo)
+async def get_todo_by_id_tool(todo_id: str, manager: MCPTodoManager = Depends(tenant_todo_manager)):
     """
     MCP Tool: Ottiene un todo specifico per ID
     """
-    todo = todo_manager.mcp_get_todo_by_id(todo_id)
+    todo = await run_todo(manager, manager.mcp_get_todo_by_id, todo_id)
     if todo is None:
         raise HTTPException(status_code=404, detail=f"Todo con ID {todo_id} non trovato")
     return todo
 
-@app.post("/mcp/tools/update_todo", response_model=Todo)
-async def update_todo_tool(todo_id: str, todo_update: TodoUpdate):
+@capabilities.route("update_todo", "POST", "/mcp/tools/update_todo", response_model=Todo)
+async def update_todo_tool(todo_id: str, todo_update: TodoUpdate,
+                           manager: MCPTodoManager = Depends(tenant_todo_manager)):
     """
     MCP Tool: Aggiorna un todo esistente
     """
     updates = todo_update.dict(exclude_unset=True)
-    updated_todo = todo_manager.mcp_update_todo(todo_id, updates)
+    updated_todo = await run_todo(manager, manager.mcp_update_todo, todo_id, updates)
     if updated_todo is None:
         raise HTTPException(status_code=404, detail=f"Todo con ID {todo_id} non trovato")
     return updated_todo
 
-@app.post("/mcp/tools/delete_todo", response_model=Dict)
-async def delete_todo_tool(todo_id: str):
+@capabilities.route("delete_todo", "POST", "/mcp/tools/delete_todo", response_model=Dict)
+async def delete_todo_tool(todo_id: str, manager: MCPTodoManager = Depends(tenant_todo_manager)):
     """
     MCP Tool: Elimina un todo
     """
-    deleted_todo = todo_manager.mcp_delete_todo(todo_id)
+    deleted_todo = await run_todo(manager, manager.mcp_delete_todo, todo_id)
     if deleted_todo is None:
         raise HTTPException(status_code=404, detail=f"Todo con ID {todo_id} non trovato")
     return {"message": f"Todo '{deleted_todo['title']}' eliminato con successo"}
 
-@app.get("/mcp/tools/get_completed_todos", response_model=List[Todo])
-async def get_completed_todos_tool():
+@capabilities.route("get_completed_todos", "GET", "/mcp/tools/get_completed_todos", response_model=List[Todo])
+async def get_completed_todos_tool(manager: MCPTodoManager = Depends(tenant_todo_manager)):
     """
     MCP Tool: Ottiene tutti i todo completati
     """
-    return todo_manager.mcp_get_completed_todos()
+    return todo_list_response(await run_todo(manager, manager.mcp_get_completed_todos))
 
-@app.get("/mcp/tools/get_pending_todos", response_model=List[Todo])
-async def get_pending_todos_tool():
+@capabilities.route("get_pending_todos", "GET", "/mcp/tools/get_pending_todos", response_model=List[Todo])
+async def get_pending_todos_tool(manager: MCPTodoManager = Depends(tenant_todo_manager)):
     """
     MCP Tool: Ottiene tutti i todo in sospeso
     """
-    return todo_manager.mcp_get_pending_todos()
+    return todo_list_response(await run_todo(manager, manager.mcp_get_pending_todos))
+
+@capabilities.route("search_todos", "GET", "/mcp/tools/search_todos", response_model=TodoSearchResult)
+async def search_todos_tool(query: str = Query(..., min_length=1),
+                            limit: int = Query(DEFAULT_SEARCH_LIMIT, ge=1, le=MAX_SEARCH_LIMIT),
+                            completed: Optional[bool] = None,
+                            prefix: bool = True,
+                            manager: MCPTodoManager = Depends(tenant_todo_manager)):
+    """
+    MCP Tool: Cerca i todo per titolo e descrizione (risultati ordinati per rilevanza)
+    """
+    return await run_todo(manager, manager.mcp_search_todos, query, limit=limit, completed=completed, prefix=prefix)
+
+@capabilities.route("get_changes_since", "GET", "/mcp/tools/get_changes_since", response_model=TodoChanges)
+async def get_changes_since_tool(since: Optional[str] = None,
+                                 since_time: Optional[str] = None,
+                                 limit: int = Query(DEFAULT_CHANGES_LIMIT, ge=1, le=MAX_CHANGES_LIMIT),
+                                 manager: MCPTodoManager = Depends(tenant_todo_manager)):
+    """
+    MCP Tool: Todo creati, modificati o eliminati dopo un sync_token o un istante
+    """
+    try:
+        return await run_todo(manager, manager.mcp_get_changes_since, since=since, since_time=since_time, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-@app.post("/mcp/tools/clear_completed_todos", response_model=Dict)
-async def clear_completed_todos_tool():
+@capabilities.route("clear_completed_todos", "POST", "/mcp/tools/clear_completed_todos", response_model=Dict)
+async def clear_completed_todos_tool(manager: MCPTodoManager = Depends(tenant_todo_manager)):
     """
     MCP Tool: Elimina tutti i todo completati
     """
-    return todo_manager.mcp_clear_completed_todos()
+    return await run_todo(manager, manager.mcp_clear_completed_todos)
+
+@capabilities.route("bulk_create_todos", "POST", "/mcp/tools/bulk_create_todos", response_model=Dict)
+async def bulk_create_todos_tool(request: TodoBulkCreate,
+                                 manager: MCPTodoManager = Depends(tenant_todo_manager),
+                                 key: Optional[str] = Depends(idempotency_key)):
+    """
+    MCP Tool: Crea più todo in un'unica operazione atomica (supporta Idempotency-Key)
+    """
+    items = [item.dict() for item in request.items]
+    return await idempotent(manager, key, "bulk_create_todos", items, BULK_RESULT_ADAPTER,
+                            lambda: manager.mcp_bulk_create_todos(items))
+
+@capabilities.route("bulk_update_todos", "POST", "/mcp/tools/bulk_update_todos", response_model=Dict)
+async def bulk_update_todos_tool(request: TodoBulkUpdate,
+                                 manager: MCPTodoManager = Depends(tenant_todo_manager),
+                                 key: Optional[str] = Depends(idempotency_key)):
+    """
+    MCP Tool: Aggiorna più todo in un'unica operazione atomica (supporta Idempotency-Key)
+    """
+    items = [item.dict(exclude_unset=True) for item in request.items]
+    return await idempotent(manager, key, "bulk_update_todos", items, BULK_RESULT_ADAPTER,
+                            lambda: manager.mcp_bulk_update_todos(items))
+
+@capabilities.route("bulk_delete_todos", "POST", "/mcp/tools/bulk_delete_todos", response_model=Dict)
+async def bulk_delete_todos_tool(request: TodoBulkDelete,
+                                 manager: MCPTodoManager = Depends(tenant_todo_manager),
+                                 key: Optional[str] = Depends(idempotency_key)):
+    """
+    MCP Tool: Elimina più todo in un'unica operazione atomica (supporta Idempotency-Key)
+    """
+    return await idempotent(manager, key, "bulk_delete_todos", request.ids, BULK_RESULT_ADAPTER,
+                            lambda: manager.mcp_bulk_delete_todos(request.ids))
 
 # === ENDPOINT MCP RESOURCES ===
 
-@app.get("/mcp/resources/todo_stats", response_model=TodoStats)
-async def get_todo_stats_resource():
+# Corpi serializzati delle risorse interrogate in polling, validi finché l'ETag non cambia
+todo_response_cache = VersionedResponseCache()
+TODO_LIST_ADAPTER = TypeAdapter(Union[List[Todo], TodoPage])
+TODO_STATS_ADAPTER = TypeAdapter(TodoStats)
+
+async def conditional_response(manager: MCPTodoManager, request: Request, key: Hashable, adapter: TypeAdapter,
+                               produce: Callable[[], Any], encode: Callable[[Any], bytes] = dump_json) -> Response:
+    """
+    Risposta JSON con ETag: 304 senza leggere i dati se il client ha già la
+    versione corrente, altrimenti il corpo in cache o appena serializzato.
+
+    L'ETag è letto prima di produrre i dati e la versione cresce dopo ogni
+    mutazione, quindi il corpo salvato contiene almeno lo stato dell'ETag.
+    Con TODO_FAST_JSON=1 il corpo è prodotto da `encode` senza rivalidazione.
+    """
+    etag = await run_todo(manager, manager.etag)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    
+    # Una voce per shard: l'ETag ha l'epoca del gestore, quindi non collide comunque
+    key = (id(manager), key)
+    body = todo_response_cache.get(key, etag)
+    if body is None:
+        if FAST_JSON:
+            body = await run_todo(manager, lambda: encode(produce()))
+        else:
+            # Stessa validazione di response_model, poi JSON compatto
+            body = await run_todo(manager, lambda: adapter.dump_json(adapter.validate_python(produce())))
+        todo_response_cache.set(key, etag, body)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@capabilities.route("todo_stats", "GET", "/mcp/resources/todo_stats", response_model=TodoStats)
+async def get_todo_stats_resource(request: Request, manager: MCPTodoManager = Depends(tenant_todo_manager)):
+    """
+    MCP Resource: Statistiche sui todo (supporta If-None-Match)
+    """
+    return await conditional_response(manager, request, "todo_stats", TODO_STATS_ADAPTER, manager.mcp_get_stats)
+
+@capabilities.route("todo_list", "GET", "/mcp/resources/todo_list", response_model=Union[List[Todo], TodoPage])
+async def get_todo_list_resource(request: Request,
+                                 limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+                                 cursor: Optional[str] = None,
+                                 completed: Optional[bool] = None,
+                                 fields: Optional[str] = None,
+                                 manager: MCPTodoManager = Depends(tenant_todo_manager)):
+    """
+    MCP Resource: Lista completa dei todo o una pagina alla volta (supporta If-None-Match)
+    """
+    return await conditional_response(
+        manager,
+        request,
+        ("todo_list", limit, cursor, completed, fields),
+        TODO_LIST_ADAPTER,
+        lambda: list_todos(manager, limit, cursor, completed, fields),
+        dump_todos_json
+    )
+
+@capabilities.route("todo_export", "GET", "/mcp/resources/todo_export")
+async def get_todo_export_resource(completed: Optional[bool] = None, fields: Optional[str] = None,
+                                   manager: MCPTodoManager = Depends(tenant_todo_manager)):
+    """
+    MCP Resource: Export dei todo in streaming NDJSON (un oggetto per riga)
+    """
+    try:
+        pages = manager.iter_todo_pages(completed=completed, fields=parse_fields(fields))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    def ndjson():
+        for page in pages:
+            yield "".join(json.dumps(item, ensure_ascii=False) + "\n" for item in page).encode("utf-8")
+    
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+# Intervallo dei commenti di keep-alive sugli stream SSE (secondi)
+SSE_HEARTBEAT_SECONDS = 15
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+# Risorse che cambiano a ogni mutazione dei todo
+TODO_RESOURCE_URIS = ("todo://list", "todo://stats")
+
+async def subscribe_tenant_changes(tenant: Optional[str], last_event_id: Optional[str]):
+    """
+    Iscrizione al feed delle modifiche del tenant, legata al loop corrente
+    (nel threadpool con SQLite). Lo stream inizia dopo la fine della
+    richiesta: tiene in uso lo shard per conto suo, fino a todo_registry.release.
+    """
+    manager = await acquire_todo_manager(tenant)
+    try:
+        return await run_todo(manager, manager.subscribe_changes, last_event_id, asyncio.get_running_loop())
+    except BaseException:
+        todo_registry.release(tenant)
+        raise
+
+def resume_id(last_event_id_header: Optional[str], last_event_id: Optional[str]) -> Optional[str]:
+    """Id da cui riprendere: header dei client EventSource o parametro di query"""
+    return last_event_id_header or last_event_id
+
+@capabilities.route("todo_changes", "GET", "/mcp/resources/todo_changes")
+async def get_todo_changes_resource(last_event_id: Optional[str] = None,
+                                    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID"),
+                                    manager: MCPTodoManager = Depends(tenant_todo_manager),
+                                    tenant: Optional[str] = Depends(request_tenant)):
+    """
+    MCP Resource: Stream SSE delle modifiche ai todo (created, updated, deleted).
+
+    Con Last-Event-ID riprende dagli eventi persi; un evento "reset" indica
+    che il client deve rileggere la lista completa (storico superato o
+    client troppo lento).
     """
-    MCP Resource: Statistiche sui todo
+    # `manager` convalida il tenant prima dello stream; il generatore prende lo shard per sé
+    async def events():
+        subscription = None
+        try:
+            # Iscrizione dentro il generatore: se il client se ne va prima che lo
+            # stream parta non resta un iscritto (che terrebbe vivo lo shard)
+            subscription = await subscribe_tenant_changes(tenant, resume_id(last_event_id_header, last_event_id))
+            yield "retry: 3000\n\n"
+            while True:
+                batch = await subscription.next_batch(SSE_HEARTBEAT_SECONDS)
+                if batch is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield "".join(event.to_sse() for event in batch)
+        finally:
+            if subscription is not None:
+                subscription.close()
+                todo_registry.release(tenant)
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@app.get("/mcp", tags=["mcp"])
+@app.get("/mcp/notifications", tags=["mcp"])
+async def mcp_notifications(last_event_id: Optional[str] = None,
+                            last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID"),
+                            manager: MCPTodoManager = Depends(tenant_todo_manager),
+                            tenant: Optional[str] = Depends(request_tenant)):
+    """
+    Notifiche MCP notifications/resources/updated in SSE (anche GET /mcp,
+    lo stream del trasporto streamable HTTP).
+
+    Le modifiche arrivate insieme producono una sola notifica per risorsa:
+    il client rilegge todo_list o todo_stats (con If-None-Match) solo quando
+    qualcosa è cambiato.
     """
-    return todo_manager.mcp_get_stats()
+    # `manager` convalida il tenant prima dello stream; il generatore prende lo shard per sé
+    async def notifications():
+        subscription = None
+        try:
+            subscription = await subscribe_tenant_changes(tenant, resume_id(last_event_id_header, last_event_id))
+            yield "retry: 3000\n\n"
+            while True:
+                batch = await subscription.next_batch(SSE_HEARTBEAT_SECONDS)
+                if batch is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                if not batch:
+                    continue
+                last = batch[-1]
+                for uri in TODO_RESOURCE_URIS:
+                    message = {
+                        "jsonrpc": "2.0",
+                        "method": "notifications/resources/updated",
+                        "params": {"uri": uri}
+                    }
+                    yield f"id: {last.id}\nevent: message\ndata: {json.dumps(message)}\n\n"
+        finally:
+            if subscription is not None:
+                subscription.close()
+                todo_registry.release(tenant)
+    
+    return StreamingResponse(notifications(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+# === ENDPOINT MCP JSON-RPC (STREAMABLE HTTP) ===
 
-@app.get("/mcp/resources/todo_list", response_model=List[Todo])
-async def get_todo_list_resource():
+def mcp_message_response(request: Request, message: Union[Dict, List[Dict]], status_code: int = 200) -> Response:
+    """
+    Risposta JSON-RPC (o batch di risposte) come JSON, o come singolo evento
+    SSE se il client accetta solo text/event-stream.
     """
-    MCP Resource: Lista completa dei todo
+    body = dump_json(message)
+    accept = request.headers.get("accept", "")
+    if "text/event-stream" in accept and "application/json" not in accept:
+        return Response(content=b"event: message\ndata: " + body + b"\n\n", status_code=status_code,
+                        media_type="text/event-stream", headers=SSE_HEADERS)
+    return Response(content=body, status_code=status_code, media_type="application/json")
+
+@app.post("/mcp", tags=["mcp"])
+async def mcp_endpoint(request: Request, manager: MCPTodoManager = Depends(tenant_todo_manager)):
     """
-    return todo_manager.mcp_get_all_todos()
+    Server MCP in-process (trasporto streamable HTTP): tools/call,
+    resources/read, prompts/get e i relativi */list, anche in batch.
+
+    Un batch JSON-RPC (array di richieste) è un solo round trip: le chiamate
+    indipendenti sono eseguite in modo concorrente e le risposte tornano
+    nell'ordine delle richieste. I tool lavorano sullo stesso gestore degli
+    endpoint REST (stesso store, stessi indici, stesso shard con X-Tenant-ID).
+    Server senza sessione: le notifiche arrivano con GET /mcp.
+    """
+    try:
+        payload = json.loads(await request.body())
+    except ValueError:
+        return mcp_message_response(request, error_response(None, JSONRPCError(PARSE_ERROR, "JSON non valido")), 400)
+    response = await mcp_server.dispatch(payload, manager)
+    if response is None:
+        return Response(status_code=202)
+    return mcp_message_response(request, response)
 
 # === DISCOVERY ENDPOINTS AGGIORNATI ===
 
-@app.get("/capabilities/discovery", response_model=Dict)
-async def discovery():
+def document_response(request: Request, name: str) -> Response:
+    """Documento di discovery serializzato all'avvio, con ETag (304 se il client ce l'ha già)"""
+    document = capabilities.documents[name]
+    headers = {"ETag": document.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), document.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=document.body, media_type="application/json", headers=headers)
+
+@app.get("/capabilities/discovery", response_model=Dict, tags=["discovery"])
+async def discovery(request: Request):
     """
-    Simula il processo di discovery delle capacità MCP aggiornato.
+    Nomi delle capacità MCP (tool, risorse, prompt, sampling) dal registro
     """
-    return {
-        "tools": [
-            "get_weather", 
-            "get_weather_dynamic",
-            "create_todo",
-            "get_all_todos",
-            "get_todo_by_id",
-            "update_todo",
-            "delete_todo",
-            "get_completed_todos",
-            "get_pending_todos",
-            "clear_completed_todos"
-        ],
-        "resources": [
-            "read_file",
-            "todo_stats",
-            "todo_list"
-        ],
-        "prompts": ["code_review"],
-        "sampling": ["request_sampling"]
-    }
+    return document_response(request, "discovery")
 
-@app.get("/mcp/tools", response_model=Dict)
-async def get_mcp_tools():
+@app.get("/mcp/tools", response_model=Dict, tags=["discovery"])
+async def get_mcp_tools(request: Request):
     """
     Restituisce tutti gli strumenti MCP disponibili
     """
-    # Combina strumenti meteo e todo
-    weather_tools = {
-        "tools": [
-            {
-                "name": "get_weather",
-                "description": "Ottiene il meteo simulato per una posizione",
-                "parameters": {
-                    "location": {"type": "string", "description": "Nome della città"}
-                }
-            },
-            {
-                "name": "get_weather_dynamic",
-                "description": "Ottiene dati meteo reali da OpenWeatherMap",
-                "parameters": {
-                    "location": {"type": "string", "description": "Nome della città"}
-                }
-            }
-        ]
-    }
-    
-    todo_tools = todo_manager.get_mcp_tools()
-    
-    # Combina i due set di strumenti
-    all_tools = weather_tools["tools"] + todo_tools["tools"]
-    
-    return {"tools": all_tools}
+    return document_response(request, "tools")
 
-@app.get("/mcp/resources", response_model=Dict)
-async def get_mcp_resources():
+@app.get("/mcp/resources", response_model=Dict, tags=["discovery"])
+async def get_mcp_resources(request: Request):
     """
     Restituisce tutte le risorse MCP disponibili
     """
-    file_resources = {
-        "resources": [
-            {
-                "uri": "file://read",
-                "description": "Legge il contenuto di un file",
-                "mimeType": "text/plain"
-            }
-        ]
-    }
-    
-    todo_resources = todo_manager.get_mcp_resources()
-    
-    # Combina le risorse
-    all_resources = file_resources["resources"] + todo_resources["resources"]
-    
-    return {"resources": all_resources}
+    return document_response(request, "resources")
 
 # === ENDPOINT PRINCIPALE ===
 
 @app.get("/", response_model=Dict)
-async def root():
+async def root(request: Request):
     """
     Endpoint principale con informazioni complete sul server
     """
-    return {
-        "message": "FastAPI + MCP Server",
-        "version": "1.0.0",
-        "description": "Server con funzionalità MCP per meteo e todo list",
-        "capabilities": {
-            "weather_tools": [
-                "POST /tools/get_weather",
-                "POST /tools/get_weather_dynamic"
-            ],
-            "todo_tools": [
-                "POST /tools/create_todo",
-                "GET /tools/get_all_todos",
-                "POST /tools/get_todo_by_id",
-                "POST /tools/update_todo",
-                "POST /tools/delete_todo",
-                "GET /tools/get_completed_todos",
-                "GET /tools/get_pending_todos",
-                "POST /tools/clear_completed_todos"
-            ],
-            "resources": [
-                "GET /resources/read_file",
-                "GET /resources/todo_stats",
-                "GET /resources/todo_list"
-            ],
-            "prompts": [
-                "POST /prompts/code_review"
-            ],
-            "discovery": [
-                "GET /capabilities/discovery",
-                "GET /mcp/tools",
-                "GET /mcp/resources"
-            ]
-        },
-        "documentation": {
-            "swagger_ui": "/docs",
-            "redoc": "/redoc"
-        }
-    }
+    return document_response(request, "root")
+
+# Route delle capacità e documenti di discovery, dopo tutte le altre route
+capabilities.mount(app, info={
+    "message": "FastAPI + MCP Server",
+    "version": app.version,
+    "description": "Server con funzionalità MCP per meteo e todo list"
+})
 
 if __name__ == "__main__":
     print("Avvio del server FastAPI + MCP...")
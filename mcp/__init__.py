@@ -2,4 +2,24 @@
 Modulo principale MCP
 """
 
-from .todo import TodoCreate, TodoUpdate, Todo, TodoStats, todo_manager
+from .todo import (
+    MCPTodoManager, TodoCreate, TodoUpdate, Todo, TodoStats, TodoPage, todo_manager,
+    TodoBulkCreate, TodoBulkUpdate, TodoBulkDelete, TodoSearchResult, TodoChanges,
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, MAX_BULK_ITEMS, DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT,
+    DEFAULT_CHANGES_LIMIT, MAX_CHANGES_LIMIT
+)
+from .conditional import VersionedResponseCache, etag_matches
+from .idempotency import (
+    IdempotencyKeyInProgress, IdempotencyKeyReused, MAX_KEY_LENGTH as MAX_IDEMPOTENCY_KEY_LENGTH, request_fingerprint
+)
+from .registry import CapabilityRegistry, capabilities
+from .serialization import FAST_JSON, dump_json, dump_todos_json
+from .server import (
+    MCPServer, JSONRPCError, ToolError, PARSE_ERROR, MAX_BATCH_SIZE, error_response, mcp_server
+)
+# Dopo il server: la risorsa read_file segue le risorse dei todo nella discovery
+from .files import (
+    READ_FILE_MAX_BYTES, READ_FILE_MAX_STREAM_BYTES, FileRangeNotSatisfiable, FileShrunkError, FileSlice,
+    open_file_slice, FileContentCache, file_content_cache
+)
+from .tenants import TenantCapacityError, TodoTenantRegistry, todo_registry
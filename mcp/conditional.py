@@ -0,0 +1,67 @@
+"""
+Richieste condizionali (ETag / If-None-Match) sulle risorse dei todo
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """True se l'header If-None-Match contiene l'ETag (confronto debole, RFC 9110)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+class VersionedResponseCache:
+    """
+    Corpi di risposta già serializzati, validi finché l'ETag non cambia.
+
+    Ogni voce ricorda l'ETag con cui è stata prodotta: dopo una mutazione
+    l'ETag corrente è diverso e la voce viene ricalcolata alla prima
+    richiesta. Le voci sono al massimo `max_entries` (LRU), perché la chiave
+    include i parametri della richiesta.
+    """
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, etag: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != etag:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, etag: str, body: bytes):
+        with self._lock:
+            self._entries[key] = (etag, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -0,0 +1,135 @@
+"""
+Registro ordinato delle modifiche ai todo per la sincronizzazione incrementale
+"""
+
+import threading
+from array import array
+from bisect import bisect_right
+from operator import itemgetter
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Tombstone (todo eliminati) conservati; chi è rimasto indietro oltre deve risincronizzarsi
+MAX_TOMBSTONES = 100000
+
+
+class ChangeLog:
+    """
+    Versione, istante e id di ogni mutazione, in ordine di versione.
+
+    È l'indice per data di ultima modifica: gli elementi sono aggiunti sotto
+    il lock di versione del gestore, quindi versioni e istanti sono crescenti
+    e "cosa è cambiato dopo N" è una ricerca binaria più una scansione
+    proporzionale al delta. Una cancellazione resta come tombstone.
+
+    Le voci superate (il todo è cambiato di nuovo) e i tombstone oltre
+    `max_tombstones` vengono compattati; `horizon` è la versione fino alla
+    quale il registro non è più completo. `started` è l'istante dello stato
+    iniziale (i todo caricati all'avvio non hanno una voce).
+    """
+
+    def __init__(self, max_tombstones: int = MAX_TOMBSTONES):
+        self.max_tombstones = max_tombstones
+        self.horizon = 0
+        self.started = 0
+        # Tre colonne sostituite insieme alla compattazione: i lettori prendono la tupla una volta
+        self._columns: Tuple[array, array, list] = (array("q"), array("q"), [])
+
+    def __len__(self) -> int:
+        return len(self._columns[2])
+
+    def append(self, version: int, micros: int, todo_id: str):
+        """Da chiamare sotto il lock che assegna le versioni"""
+        versions, times, ids = self._columns
+        if times and micros < times[-1]:
+            # Orologio tornato indietro: l'indice temporale resta ordinato
+            micros = times[-1]
+        versions.append(version)
+        times.append(micros)
+        # Per ultimo: un lettore considera solo le voci con l'id già presente
+        ids.append(todo_id)
+
+    def version_at(self, micros: int) -> Optional[int]:
+        """
+        Versione dello stato all'istante indicato; None se precede il registro
+        (stato iniziale o voci già compattate).
+        """
+        versions, times, ids = self._columns
+        count = len(ids)
+        position = bisect_right(times, micros, 0, count)
+        if position == 0:
+            return 0 if self.horizon == 0 and micros >= self.started else None
+        return versions[position - 1]
+
+    def since(self, after: int, limit: int) -> Tuple[List[Tuple[str, int]], int, bool]:
+        """
+        Ultima modifica di ogni todo cambiato dopo `after`, in ordine di versione.
+
+        Restituisce i primi `limit` come (id, versione), la versione
+        dell'ultimo restituito e se ne restano altri: ripartendo da quella
+        versione si ottengono i successivi.
+        """
+        versions, times, ids = self._columns
+        count = len(ids)
+        position = bisect_right(versions, after, 0, count)
+        latest: Dict[str, int] = {}
+        for position in range(position, count):
+            latest[ids[position]] = versions[position]
+        changed = sorted(latest.items(), key=itemgetter(1))
+        if len(changed) > limit:
+            return changed[:limit], changed[limit - 1][1], True
+        return changed, changed[-1][1] if changed else after, False
+
+    def compact(self, is_live: Callable[[str], bool], lock: threading.Lock):
+        """
+        Tiene l'ultima voce di ogni todo e gli ultimi `max_tombstones` tombstone.
+
+        La nuova lista è costruita fuori dal lock; sotto il lock si copiano le
+        voci aggiunte nel frattempo e si sostituiscono le colonne.
+        """
+        versions, times, ids = self._columns
+        count = len(ids)
+        seen = set()
+        keep = []
+        tombstones = 0
+        horizon = self.horizon
+        for position in range(count - 1, -1, -1):
+            todo_id = ids[position]
+            if todo_id in seen:
+                continue
+            seen.add(todo_id)
+            if not is_live(todo_id):
+                tombstones += 1
+                if tombstones > self.max_tombstones:
+                    horizon = max(horizon, versions[position])
+                    continue
+            keep.append(position)
+        keep.reverse()
+
+        new_versions = array("q", (versions[position] for position in keep))
+        new_times = array("q", (times[position] for position in keep))
+        new_ids = [ids[position] for position in keep]
+        with lock:
+            tail = len(self._columns[2])
+            new_versions.extend(versions[count:tail])
+            new_times.extend(times[count:tail])
+            new_ids.extend(ids[count:tail])
+            self._columns = (new_versions, new_times, new_ids)
+            self.horizon = horizon
+
+    def needs_compaction(self, live: int) -> bool:
+        return len(self) > 2 * live + self.max_tombstones + 1024
+
+
+def parse_sync_token(token: str, epoch: str) -> Optional[int]:
+    """
+    Versione indicata da un token "epoca-versione" (come gli id SSE e l'ETag).
+
+    None se il token è di un'altra epoca o non valido: il client deve
+    risincronizzarsi da zero.
+    """
+    token_epoch, _, version = token.strip().strip('"').rpartition("-")
+    if token_epoch != epoch:
+        return None
+    if not version.isdigit():
+        return None
+    return int(version)
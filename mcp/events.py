@@ -0,0 +1,197 @@
+"""
+Feed delle modifiche ai todo per gli stream server-sent events
+"""
+
+import asyncio
+import json
+import threading
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, Set, Union
+
+from .records import TodoRecord
+
+# Eventi recenti conservati per la ripresa con Last-Event-ID
+DEFAULT_HISTORY = 10000
+# Todo distinti in attesa per un singolo client prima di considerarlo troppo lento
+DEFAULT_MAX_PENDING = 1000
+
+CREATED = "created"
+UPDATED = "updated"
+DELETED = "deleted"
+RESET = "reset"
+
+
+class ChangeEvent:
+    """Una mutazione di un todo; `id` è l'id dell'evento SSE (epoca-versione)"""
+
+    __slots__ = ("epoch", "version", "type", "todo_id", "todo", "_data")
+
+    def __init__(self, epoch: str, version: int, event_type: str, todo_id: Optional[str],
+                 todo: Optional[Union[Dict, TodoRecord]] = None):
+        self.epoch = epoch
+        self.version = version
+        self.type = event_type
+        self.todo_id = todo_id
+        self.todo = todo
+        self._data: Optional[str] = None
+
+    @property
+    def id(self) -> str:
+        return f"{self.epoch}-{self.version}"
+
+    def data(self) -> str:
+        """Payload JSON, serializzato una sola volta per tutti i client"""
+        if self._data is None:
+            payload = {"type": self.type, "version": self.version}
+            if self.todo_id is not None:
+                payload["id"] = self.todo_id
+            if self.todo is not None:
+                payload["todo"] = self.todo if isinstance(self.todo, dict) else self.todo.to_dict()
+            self._data = json.dumps(payload, ensure_ascii=False)
+        return self._data
+
+    def to_sse(self) -> str:
+        return f"id: {self.id}\nevent: {self.type}\ndata: {self.data()}\n\n"
+
+
+class Subscription:
+    """
+    Coda di un singolo client, limitata e con coalescenza per todo.
+
+    Un nuovo evento sullo stesso todo sostituisce quello in attesa: il client
+    riceve solo lo stato più recente (creazione + modifica resta "created").
+    Se i todo distinti in attesa superano `max_pending` il client è troppo
+    lento: la coda viene svuotata e riceve un evento "reset", dopo il quale
+    deve rileggere la lista completa.
+    """
+
+    def __init__(self, feed: "ChangeFeed", loop: asyncio.AbstractEventLoop, max_pending: int):
+        self._feed = feed
+        self._loop = loop
+        self._max_pending = max_pending
+        self._pending: "OrderedDict[Optional[str], ChangeEvent]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._wakeup = asyncio.Event()
+        self._reset = False
+        self.dropped = 0
+
+    def _push(self, event: ChangeEvent):
+        """Chiamato dal feed, anche da thread diversi da quello del loop"""
+        with self._lock:
+            if self._reset:
+                self.dropped += 1
+                return
+            previous = self._pending.pop(event.todo_id, None)
+            if previous is not None and previous.type == CREATED and event.type == UPDATED:
+                # Il client non ha ancora visto il todo: resta una creazione, con lo stato nuovo
+                event = ChangeEvent(event.epoch, event.version, CREATED, event.todo_id, event.todo)
+            self._pending[event.todo_id] = event
+            if len(self._pending) > self._max_pending:
+                self.dropped += len(self._pending)
+                self._pending.clear()
+                self._reset = True
+        self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def _request_reset(self):
+        with self._lock:
+            self._pending.clear()
+            self._reset = True
+        self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def next_batch(self, timeout: float) -> Optional[List[ChangeEvent]]:
+        """Eventi in attesa (in ordine di versione); None se scade il timeout"""
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        with self._lock:
+            self._wakeup.clear()
+            events = list(self._pending.values())
+            self._pending.clear()
+            reset, self._reset = self._reset, False
+        if reset:
+            # Lo stato corrente sostituisce tutto ciò che è stato perso
+            return [self._feed.reset_event()]
+        return events
+
+    def close(self):
+        self._feed.unsubscribe(self)
+
+
+class ChangeFeed:
+    """
+    Distribuisce le mutazioni dei todo ai client connessi.
+
+    Gli eventi sono pubblicati in ordine di versione dal gestore (sotto il
+    suo lock) e conservati in uno storico circolare: un client che si
+    riconnette con Last-Event-ID riceve solo quelli successivi. Se l'id è
+    di un'altra epoca (riavvio) o troppo vecchio per lo storico riceve un
+    evento "reset".
+    """
+
+    def __init__(self, epoch: str, version: int = 0, history: int = DEFAULT_HISTORY,
+                 max_pending: int = DEFAULT_MAX_PENDING):
+        self.epoch = epoch
+        self.max_pending = max_pending
+        self._version = version
+        self._history: Deque[ChangeEvent] = deque(maxlen=history)
+        self._subscribers: Set[Subscription] = set()
+        self._lock = threading.Lock()
+        self.published = 0
+
+    def publish(self, version: int, event_type: str, todo_id: Optional[str],
+                todo: Optional[Union[Dict, TodoRecord]] = None):
+        event = ChangeEvent(self.epoch, version, event_type, todo_id, todo)
+        with self._lock:
+            self._version = version
+            self._history.append(event)
+            self.published += 1
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription._push(event)
+
+    def reset_event(self) -> ChangeEvent:
+        return ChangeEvent(self.epoch, self._version, RESET, None)
+
+    def subscribe(self, last_event_id: Optional[str] = None,
+                  loop: Optional[asyncio.AbstractEventLoop] = None) -> Subscription:
+        """Nuovo client; con `last_event_id` riceve prima gli eventi persi"""
+        subscription = Subscription(self, loop or asyncio.get_running_loop(), self.max_pending)
+        with self._lock:
+            self._subscribers.add(subscription)
+            if last_event_id is not None:
+                missed = self._missed_since(last_event_id)
+                if missed is None:
+                    subscription._request_reset()
+                else:
+                    for event in missed:
+                        subscription._push(event)
+        return subscription
+
+    def _missed_since(self, last_event_id: str) -> Optional[List[ChangeEvent]]:
+        """Eventi successivi a `last_event_id`, None se non sono più ricostruibili"""
+        epoch, _, version = last_event_id.strip().rpartition("-")
+        if epoch != self.epoch or not version.isdigit():
+            return None
+        after = int(version)
+        if after > self._version:
+            return None
+        if after == self._version:
+            return []
+        if not self._history or self._history[0].version > after + 1:
+            return None
+        return [event for event in self._history if event.version > after]
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "subscribers": len(self._subscribers),
+                "published": self.published,
+                "history": len(self._history),
+                "version": self._version,
+                "dropped": sum(subscription.dropped for subscription in self._subscribers),
+            }
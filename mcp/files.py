@@ -0,0 +1,268 @@
+"""
+Lettura dei file per la risorsa read_file: intervalli di byte, thread pool e streaming
+"""
+
+import asyncio
+import os
+import stat
+import threading
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, Hashable, Optional, Tuple
+
+from .registry import capabilities
+
+# Byte massimi restituiti nel JSON di read_file (il contenuto sta tutto in memoria)
+READ_FILE_MAX_BYTES = int(os.getenv("READ_FILE_MAX_BYTES", str(10 * 1024 * 1024)))
+# Byte massimi di una lettura in streaming (raw o Range); 0 = nessun limite
+READ_FILE_MAX_STREAM_BYTES = int(os.getenv("READ_FILE_MAX_STREAM_BYTES", "0"))
+# Dimensione dei blocchi letti da un thread del pool a ogni passo dello streaming
+READ_FILE_CHUNK_SIZE = int(os.getenv("READ_FILE_CHUNK_SIZE", str(256 * 1024)))
+# Budget in byte della cache dei contenuti letti in JSON; 0 la disattiva
+READ_FILE_CACHE_BYTES = int(os.getenv("READ_FILE_CACHE_BYTES", str(64 * 1024 * 1024)))
+
+
+class FileRangeNotSatisfiable(ValueError):
+    """L'intervallo richiesto inizia oltre la fine del file"""
+
+    def __init__(self, size: int):
+        super().__init__(f"Intervallo non soddisfacibile: il file è di {size} byte")
+        self.size = size
+
+
+class FileShrunkError(OSError):
+    """Il file si è accorciato durante la lettura: i byte letti sono meno di quelli dichiarati"""
+
+    def __init__(self, expected: int, read: int):
+        super().__init__(f"Il file si è accorciato durante la lettura: letti {read} byte su {expected}")
+        self.expected = expected
+        self.read = read
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Header Range "bytes=a-b", "bytes=a-" o "bytes=-n" -> (inizio, fine esclusa).
+
+    None se l'header manca, non è valido o chiede più intervalli: in quel
+    caso il Range si ignora e si risponde con il file intero (RFC 9110).
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, dash, last = spec.strip().partition("-")
+    if not dash or not (first or last) or (first and not first.isdigit()) or (last and not last.isdigit()):
+        return None
+    if not first:
+        # Suffisso: gli ultimi n byte
+        suffix = int(last)
+        if suffix == 0 or size == 0:
+            raise FileRangeNotSatisfiable(size)
+        return max(0, size - suffix), size
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise FileRangeNotSatisfiable(size)
+    end = min(size, int(last) + 1) if last else size
+    return start, end
+
+
+def _universal_newlines(text: str) -> str:
+    """Fine riga normalizzati come open(..., "r"), usato dall'endpoint prima della lettura a byte"""
+    return text.replace("\r\n", "\n").replace("\r", "\n")
+
+class FileSlice:
+    """
+    Intervallo di byte di un file aperto.
+
+    Le letture usano os.pread in un thread del pool, quindi il loop non si
+    blocca sul disco e più letture sullo stesso descrittore non si
+    disturbano. Lo streaming tiene in memoria un blocco alla volta.
+    """
+
+    __slots__ = ("fd", "info", "size", "start", "end", "partial")
+
+    def __init__(self, fd: int, info: os.stat_result, start: int, end: int, partial: bool):
+        self.fd = fd
+        self.info = info
+        self.size = info.st_size
+        self.start = start
+        self.end = end
+        # True se l'intervallo viene dall'header Range (risposta 206 con Content-Range)
+        self.partial = partial
+
+    @property
+    def length(self) -> int:
+        return self.end - self.start
+
+    @property
+    def etag(self) -> str:
+        """Da inode, mtime e dimensione: cambia quando il file viene riscritto o sostituito"""
+        return f'"{self.info.st_ino:x}-{self.info.st_mtime_ns:x}-{self.info.st_size:x}"'
+
+    @property
+    def cache_key(self) -> Tuple[Hashable, Tuple[int, int]]:
+        """(file e intervallo, validatore) per FileContentCache"""
+        info = self.info
+        # Fino alla fine del file: la stessa voce, invalidata, se il file cresce o si accorcia
+        end = self.end if self.end < self.size else None
+        return (info.st_dev, info.st_ino, self.start, end), (info.st_mtime_ns, info.st_size)
+
+    def _read_all(self) -> bytes:
+        parts = []
+        position = self.start
+        while position < self.end:
+            data = os.pread(self.fd, min(READ_FILE_CHUNK_SIZE, self.end - position), position)
+            if not data:
+                # File accorciato durante la lettura (es. troncato da una rotazione dei log)
+                raise FileShrunkError(self.length, position - self.start)
+            parts.append(data)
+            position += len(data)
+        return b"".join(parts)
+
+    async def read_text(self) -> str:
+        """
+        Contenuto dell'intervallo come testo UTF-8 (UnicodeDecodeError se non
+        lo è, FileShrunkError), con i fine riga CRLF e CR convertiti in LF
+        come nella lettura in modo testo.
+        """
+        return await asyncio.to_thread(lambda: _universal_newlines(self._read_all().decode("utf-8")))
+
+    async def chunks(self, chunk_size: int = READ_FILE_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        """
+        Blocchi dell'intervallo; chiude il file alla fine o se il client si disconnette.
+
+        Se il file si accorcia durante lo streaming solleva FileShrunkError:
+        gli header con Content-Length sono già partiti, quindi la risposta
+        viene interrotta (connessione chiusa) invece di finire corta.
+        """
+        try:
+            position = self.start
+            while position < self.end:
+                data = await asyncio.to_thread(os.pread, self.fd, min(chunk_size, self.end - position), position)
+                if not data:
+                    raise FileShrunkError(self.length, position - self.start)
+                position += len(data)
+                yield data
+        finally:
+            self.close()
+
+    def content_range(self) -> str:
+        return f"bytes {self.start}-{self.end - 1}/{self.size}"
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+def _open_slice(path: str, offset: int, length: Optional[int], range_header: Optional[str]) -> FileSlice:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        info = os.fstat(fd)
+        if not stat.S_ISREG(info.st_mode):
+            raise IsADirectoryError(f"Non è un file regolare: {path}")
+        size = info.st_size
+        span = parse_range(range_header, size)
+        if span is not None:
+            return FileSlice(fd, info, span[0], span[1], partial=True)
+        if offset > size:
+            raise FileRangeNotSatisfiable(size)
+        end = size if length is None else min(size, offset + length)
+        return FileSlice(fd, info, offset, end, partial=False)
+    except BaseException:
+        os.close(fd)
+        raise
+
+
+async def open_file_slice(path: str, offset: int = 0, length: Optional[int] = None,
+                          range_header: Optional[str] = None) -> FileSlice:
+    """
+    Apre il file (in un thread) e calcola l'intervallo da leggere: l'header
+    Range se valido, altrimenti `offset` e `length`. Il chiamante deve
+    consumare `chunks()` o chiamare `close()`.
+    """
+    return await asyncio.to_thread(_open_slice, path, offset, length, range_header)
+
+
+class FileContentCache:
+    """
+    Risposte JSON di read_file già lette, decodificate e serializzate.
+
+    La chiave è (dispositivo, inode, intervallo), quindi percorsi diversi
+    dello stesso file condividono la voce; ogni voce ricorda mtime e
+    dimensione del fstat con cui è stata letta e viene scartata se non
+    corrispondono più. LRU entro `max_bytes` byte di corpi serializzati.
+    """
+
+    def __init__(self, max_bytes: int = READ_FILE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+        self.evicted_bytes = 0
+
+    def get(self, key: Hashable, validator: Tuple[int, int]) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] != validator:
+                # File modificato dopo la lettura
+                del self._entries[key]
+                self.bytes -= len(entry[1])
+                self.invalidations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, validator: Tuple[int, int], body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= len(previous[1])
+            self._entries[key] = (validator, body)
+            self.bytes += len(body)
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.bytes -= len(evicted)
+                self.evictions += 1
+                self.evicted_bytes += len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+                "evicted_bytes": self.evicted_bytes,
+            }
+
+
+# Cache globale dei contenuti di read_file
+file_content_cache = FileContentCache()
+
+
+# Risorsa MCP; la route REST /mcp/resources/read_file è collegata in main.py
+capabilities.resource("read_file", "file://read", "Legge il contenuto di un file", "text/plain")
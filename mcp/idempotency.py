@@ -0,0 +1,110 @@
+"""
+Chiavi di idempotenza per i tool che creano o modificano todo
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+# Lunghezza massima accettata per una Idempotency-Key
+MAX_KEY_LENGTH = 255
+# Durata delle risposte memorizzate (default 24 ore)
+DEFAULT_TTL = float(os.getenv("TODO_IDEMPOTENCY_TTL_SECONDS", "86400"))
+
+
+class IdempotencyKeyReused(ValueError):
+    """La chiave è già stata usata con una richiesta diversa"""
+
+
+class IdempotencyKeyInProgress(ValueError):
+    """Una richiesta con la stessa chiave è ancora in corso"""
+
+
+def request_fingerprint(payload: Any) -> str:
+    """Impronta del corpo della richiesta, per riconoscere una chiave riusata su dati diversi"""
+    canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class IdempotencyCache:
+    """
+    Risposte già inviate, per chiave di idempotenza.
+
+    Un retry con la stessa chiave e lo stesso corpo riceve i byte della
+    risposta originale senza una nuova scrittura; con un corpo diverso
+    solleva IdempotencyKeyReused. Le voci scadono dopo `ttl` secondi e il
+    totale è limitato sia nel numero sia nei byte (LRU). Gli errori non
+    vengono memorizzati: il retry esegue di nuovo l'operazione.
+
+    La cache è del processo: con più worker un retry smistato su un altro
+    worker non la vede.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_TTL, max_entries: int = 10000, max_bytes: int = 16 * 1024 * 1024,
+                 clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._clock = clock
+        # chiave -> (impronta, corpo, istante)
+        self._entries: "OrderedDict[Hashable, Tuple[str, bytes, float]]" = OrderedDict()
+        self._in_progress = set()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.replays = 0
+        self.stored = 0
+        self.evictions = 0
+
+    def run(self, key: Hashable, fingerprint: str, produce: Callable[[], bytes]) -> Tuple[bytes, bool]:
+        """Corpo della risposta per `key` e True se è un replay, altrimenti esegue `produce`"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._clock() - entry[2] > self.ttl:
+                self._drop(key)
+                entry = None
+            if entry is not None:
+                if entry[0] != fingerprint:
+                    raise IdempotencyKeyReused("Idempotency-Key già usata con una richiesta diversa")
+                self._entries.move_to_end(key)
+                self.replays += 1
+                return entry[1], True
+            if key in self._in_progress:
+                raise IdempotencyKeyInProgress("Richiesta con la stessa Idempotency-Key ancora in corso")
+            self._in_progress.add(key)
+
+        try:
+            body = produce()
+        except BaseException:
+            with self._lock:
+                self._in_progress.discard(key)
+            raise
+        with self._lock:
+            # Nello stesso blocco: un retry vede la chiave in corso o la risposta, mai nessuna delle due
+            self._in_progress.discard(key)
+            self._entries[key] = (fingerprint, body, self._clock())
+            self._bytes += len(body)
+            self.stored += 1
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+        return body, False
+
+    def _drop(self, key: Hashable):
+        self._bytes -= len(self._entries.pop(key)[1])
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "stored": self.stored,
+                "replays": self.replays,
+                "evictions": self.evictions,
+            }
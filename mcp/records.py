@@ -0,0 +1,109 @@
+"""
+Rappresentazione compatta dei todo in memoria
+"""
+
+import time
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+_MICROS = 1_000_000
+
+
+def now_micros() -> int:
+    """Istante corrente in microsecondi dall'epoch"""
+    return time.time_ns() // 1000
+
+
+@lru_cache(maxsize=4096)
+def _format_seconds(seconds: int) -> str:
+    # I todo creati insieme condividono il secondo: la conversione locale è fatta una volta
+    return datetime.fromtimestamp(seconds).isoformat()
+
+
+def format_micros(micros: Optional[int]) -> Optional[str]:
+    """Timestamp in microsecondi -> ISO 8601 locale, come datetime.now().isoformat()"""
+    if micros is None:
+        return None
+    seconds, fraction = divmod(micros, _MICROS)
+    if fraction:
+        return f"{_format_seconds(seconds)}.{fraction:06d}"
+    return _format_seconds(seconds)
+
+
+def parse_micros(value: Optional[str]) -> Optional[int]:
+    """ISO 8601 locale -> microsecondi dall'epoch (inverso di `format_micros`)"""
+    if value is None:
+        return None
+    moment = datetime.fromisoformat(value)
+    return int(moment.replace(microsecond=0).timestamp()) * _MICROS + moment.microsecond
+
+
+class TodoRecord:
+    """
+    Todo in memoria con __slots__ e timestamp interi.
+
+    Niente dizionario per istanza né chiavi ripetute: un record occupa
+    circa un terzo di un dict con i timestamp come stringhe ISO. Il formato
+    dell'API non cambia, perché `to_dict` ricostruisce la rappresentazione
+    originale solo quando il todo viene restituito.
+    """
+
+    __slots__ = ("id", "title", "description", "completed", "created_at", "updated_at", "completed_at")
+
+    def __init__(self, todo_id: str, title: str, description: str, completed: bool = False,
+                 created_at: Optional[int] = None, updated_at: Optional[int] = None,
+                 completed_at: Optional[int] = None):
+        self.id = todo_id
+        self.title = title
+        self.description = description
+        self.completed = completed
+        self.created_at = now_micros() if created_at is None else created_at
+        self.updated_at = updated_at
+        self.completed_at = completed_at
+
+    def get(self, field: str):
+        """Valore di un campo nel formato dell'API"""
+        if field in ("created_at", "updated_at", "completed_at"):
+            return format_micros(getattr(self, field))
+        return getattr(self, field)
+
+    def to_dict(self) -> Dict:
+        """Todo come dizionario; come in origine, i timestamp mai impostati sono assenti"""
+        todo = {
+            "id": self.id,
+            "title": self.title,
+            "description": self.description,
+            "completed": self.completed,
+            "created_at": format_micros(self.created_at),
+        }
+        if self.updated_at is not None:
+            todo["updated_at"] = format_micros(self.updated_at)
+        if self.completed_at is not None:
+            todo["completed_at"] = format_micros(self.completed_at)
+        return todo
+
+    def copy(self) -> "TodoRecord":
+        return TodoRecord(*self.state())
+
+    def state(self) -> Tuple:
+        """Copia leggera dei campi (per gli snapshot, convertita poi con `dict_from_state`)"""
+        return (self.id, self.title, self.description, self.completed,
+                self.created_at, self.updated_at, self.completed_at)
+
+    @staticmethod
+    def dict_from_state(state: Tuple) -> Dict:
+        return TodoRecord(*state).to_dict()
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "TodoRecord":
+        """Record da un todo serializzato (log, snapshot)"""
+        return cls(
+            data["id"],
+            data["title"],
+            data["description"],
+            data["completed"],
+            parse_micros(data["created_at"]),
+            parse_micros(data.get("updated_at")),
+            parse_micros(data.get("completed_at")),
+        )
@@ -0,0 +1,161 @@
+"""
+Registro dichiarativo delle capacità MCP: tool, risorse, prompt e sampling
+"""
+
+import hashlib
+from typing import Any, Callable, Dict, List, Optional
+
+from .serialization import dump_json
+
+# Tipi di capacità, anche tag delle route REST generate
+TOOL = "tools"
+RESOURCE = "resources"
+PROMPT = "prompts"
+SAMPLING = "sampling"
+
+
+class Capability:
+    """Metadati per la discovery, handler MCP (opzionale) e route REST di una capacità"""
+
+    __slots__ = ("kind", "name", "description", "spec", "handler", "routes")
+
+    def __init__(self, kind: str, name: str, description: str, spec: Dict, handler: Optional[Callable]):
+        self.kind = kind
+        self.name = name
+        self.description = description
+        # Parametri (tool), uri e mimeType (risorse) o argomenti (prompt)
+        self.spec = spec
+        self.handler = handler
+        # (metodo, path, endpoint, opzioni di add_api_route)
+        self.routes: List[tuple] = []
+
+
+class StaticDocument:
+    """Documento JSON serializzato una volta, con ETag dal contenuto"""
+
+    __slots__ = ("body", "etag")
+
+    def __init__(self, data: Any):
+        self.body = dump_json(data)
+        self.etag = f'"{hashlib.sha256(self.body).hexdigest()[:32]}"'
+
+
+class CapabilityRegistry:
+    """
+    Unico elenco delle capacità del server.
+
+    I moduli (todo, meteo, file, sampling) dichiarano le capacità con
+    `tool`, `resource`, `prompt` e `sampling`, e vi collegano gli endpoint
+    REST con il decoratore `route`. All'avvio `mount` aggiunge le route
+    all'app e serializza una volta i documenti di discovery (/mcp/tools,
+    /mcp/resources, /capabilities/discovery e /), quindi gli elenchi non
+    possono divergere e nessuna richiesta li ricostruisce. Il server MCP
+    legge gli handler dallo stesso registro.
+    """
+
+    def __init__(self):
+        self._capabilities: Dict[str, Capability] = {}
+        self._resources_by_uri: Dict[str, Capability] = {}
+        self.documents: Dict[str, StaticDocument] = {}
+
+    def _add(self, kind: str, name: str, description: str, spec: Dict, handler: Optional[Callable]) -> Capability:
+        if name in self._capabilities:
+            raise ValueError(f"Capacità già registrata: {name}")
+        capability = self._capabilities[name] = Capability(kind, name, description, spec, handler)
+        if kind == RESOURCE:
+            self._resources_by_uri[spec["uri"]] = capability
+        return capability
+
+    def tool(self, name: str, description: str, parameters: Optional[Dict] = None,
+             handler: Optional[Callable] = None) -> Capability:
+        """`parameters`: {nome: {type, description, optional}}; `handler` esegue tools/call"""
+        return self._add(TOOL, name, description, {"parameters": parameters or {}}, handler)
+
+    def resource(self, name: str, uri: str, description: str, mime_type: str,
+                 reader: Optional[Callable] = None) -> Capability:
+        """`reader(manager)` restituisce il testo per resources/read (assente per gli stream)"""
+        return self._add(RESOURCE, name, description, {"uri": uri, "mimeType": mime_type}, reader)
+
+    def prompt(self, name: str, description: str, arguments: List[Dict],
+               handler: Optional[Callable] = None) -> Capability:
+        """`arguments` come in prompts/list: [{name, description, required}]"""
+        return self._add(PROMPT, name, description, {"arguments": arguments}, handler)
+
+    def sampling(self, name: str, description: str) -> Capability:
+        return self._add(SAMPLING, name, description, {}, None)
+
+    def alias(self, name: str, target: str) -> Capability:
+        """Altro nome (deprecato) della capacità `target`: stessi parametri e handler, nessuna route REST"""
+        capability = self._capabilities[target]
+        return self._add(capability.kind, name, f"{capability.description} (deprecato: usare {target})",
+                         capability.spec, capability.handler)
+
+    def route(self, name: str, method: str, path: str, **options) -> Callable:
+        """Decoratore: l'endpoint diventa la route REST della capacità `name`"""
+        capability = self._capabilities[name]
+
+        def decorator(endpoint: Callable) -> Callable:
+            capability.routes.append((method, path, endpoint, options))
+            return endpoint
+
+        return decorator
+
+    def get(self, kind: str, name: str) -> Optional[Capability]:
+        capability = self._capabilities.get(name)
+        return capability if capability is not None and capability.kind == kind else None
+
+    def find_resource(self, uri: str) -> Optional[Capability]:
+        return self._resources_by_uri.get(uri)
+
+    def of_kind(self, kind: str) -> List[Capability]:
+        return [capability for capability in self._capabilities.values() if capability.kind == kind]
+
+    def mount(self, app, info: Dict):
+        """
+        Aggiunge le route delle capacità all'app e costruisce i documenti.
+
+        Va chiamato dopo tutte le registrazioni e le altre route: il
+        documento "/" elenca le route dell'app raggruppate per tag.
+        """
+        for capability in self._capabilities.values():
+            for method, path, endpoint, options in capability.routes:
+                app.add_api_route(path, endpoint, methods=[method], tags=[capability.kind], **options)
+
+        tools = self.of_kind(TOOL)
+        resources = self.of_kind(RESOURCE)
+        self.documents["tools"] = StaticDocument({
+            "tools": [
+                {"name": tool.name, "description": tool.description, "parameters": tool.spec["parameters"]}
+                for tool in tools
+            ]
+        })
+        self.documents["resources"] = StaticDocument({
+            "resources": [
+                {"uri": resource.spec["uri"], "description": resource.description,
+                 "mimeType": resource.spec["mimeType"]}
+                for resource in resources
+            ]
+        })
+        self.documents["discovery"] = StaticDocument({
+            "tools": [tool.name for tool in tools],
+            "resources": [resource.name for resource in resources],
+            "prompts": [prompt.name for prompt in self.of_kind(PROMPT)],
+            "sampling": [sampling.name for sampling in self.of_kind(SAMPLING)],
+            "mcp_endpoint": "/mcp"
+        })
+
+        sections: Dict[str, List[str]] = {}
+        for route in app.routes:
+            tags = getattr(route, "tags", None)
+            if tags:
+                for method in sorted(route.methods):
+                    sections.setdefault(tags[0], []).append(f"{method} {route.path}")
+        self.documents["root"] = StaticDocument({
+            **info,
+            "capabilities": sections,
+            "documentation": {"swagger_ui": app.docs_url, "redoc": app.redoc_url}
+        })
+
+
+# Registro globale delle capacità del processo
+capabilities = CapabilityRegistry()
@@ -0,0 +1,180 @@
+"""
+Indice invertito per la ricerca full-text e per prefisso sui todo
+"""
+
+import heapq
+import math
+import re
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Tuple
+
+# Peso dei termini del titolo rispetto alla descrizione
+TITLE_WEIGHT = 2
+# Numero massimo di termini del vocabolario in cui si espande un prefisso
+MAX_PREFIX_EXPANSIONS = 200
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    """Token minuscoli e senza accenti ("Perché" -> "perche")"""
+    if not text:
+        return []
+    normalized = unicodedata.normalize("NFKD", text.lower())
+    stripped = "".join(char for char in normalized if not unicodedata.combining(char))
+    return _TOKEN_RE.findall(stripped)
+
+
+class TodoSearchIndex:
+    """
+    Indice invertito termine -> {id todo: peso}.
+
+    Il peso è la frequenza del termine, con i termini del titolo contati
+    TITLE_WEIGHT volte. Un vocabolario ordinato permette di espandere i
+    prefissi con una ricerca binaria. L'indice viene aggiornato a ogni
+    scrittura: aggiungere o rimuovere un todo costa O(termini del todo).
+
+    Le scritture sono serializzate da un lock interno; la ricerca non lo
+    prende e copia le liste di posting prima di scorrerle, quindi durante
+    una scrittura concorrente può vedere lo stato precedente o quello nuovo.
+    """
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._doc_terms: Dict[str, Dict[str, int]] = {}
+        self._vocabulary: List[str] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._doc_terms)
+
+    @staticmethod
+    def _weights(title: str, description: str) -> Dict[str, int]:
+        weights: Dict[str, int] = {}
+        for term in tokenize(title):
+            weights[term] = weights.get(term, 0) + TITLE_WEIGHT
+        for term in tokenize(description):
+            weights[term] = weights.get(term, 0) + 1
+        return weights
+
+    def add(self, todo_id: str, title: str, description: str):
+        """Indicizza un todo (sostituisce l'eventuale versione precedente)"""
+        weights = self._weights(title, description)
+        with self._lock:
+            self._remove(todo_id)
+            self._add(todo_id, weights)
+
+    def remove(self, todo_id: str):
+        """Toglie un todo dall'indice"""
+        with self._lock:
+            self._remove(todo_id)
+
+    def _add(self, todo_id: str, weights: Dict[str, int]):
+        self._doc_terms[todo_id] = weights
+        for term, weight in weights.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                insort(self._vocabulary, term)
+            postings[todo_id] = weight
+
+    def _remove(self, todo_id: str):
+        weights = self._doc_terms.pop(todo_id, None)
+        if weights is None:
+            return
+        for term in weights:
+            postings = self._postings[term]
+            del postings[todo_id]
+            if not postings:
+                del self._postings[term]
+                del self._vocabulary[bisect_left(self._vocabulary, term)]
+
+    def _expand(self, term: str, prefix: bool) -> List[str]:
+        """Termini del vocabolario che corrispondono a `term`"""
+        if not prefix:
+            return [term] if term in self._postings else []
+        vocabulary = self._vocabulary
+        start = bisect_left(vocabulary, term)
+        matches = []
+        for position in range(start, start + MAX_PREFIX_EXPANSIONS):
+            try:
+                candidate = vocabulary[position]
+            except IndexError:
+                # Fine del vocabolario (o termine rimosso nel frattempo)
+                break
+            if not candidate.startswith(term):
+                break
+            matches.append(candidate)
+        return matches
+
+    def search(self, query: str, limit: int = 20, prefix: bool = True,
+               candidates: Optional[Dict[str, object]] = None) -> Tuple[List[Tuple[str, float]], int]:
+        """
+        Cerca i todo che contengono tutti i termini della query.
+
+        Con `prefix` ogni termine corrisponde anche ai termini che iniziano
+        così. Il punteggio somma peso * idf dei termini trovati; restituisce
+        i migliori `limit` come (id, punteggio) e il numero totale di risultati.
+        `candidates`, se indicato, limita i risultati a quegli id.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return [], 0
+
+        # Per ogni termine: liste di posting delle espansioni con il rispettivo idf
+        total_docs = max(len(self._doc_terms), 1)
+        expansions = []
+        for term in terms:
+            matched = []
+            for expanded in self._expand(term, prefix):
+                # Copia atomica: una scrittura concorrente non altera l'iterazione
+                postings = dict(self._postings.get(expanded, ()))
+                if postings:
+                    matched.append((postings, math.log(1 + total_docs / len(postings))))
+            if not matched:
+                return [], 0
+            expansions.append(matched)
+
+        # Si parte dal termine più selettivo; gli altri vengono solo consultati per id
+        expansions.sort(key=lambda matched: sum(len(postings) for postings, _ in matched))
+        first, others = expansions[0], expansions[1:]
+        if not others and len(first) == 1 and candidates is None:
+            # Un solo termine esatto: il punteggio è proporzionale al peso, niente da sommare
+            postings, idf = first[0]
+            best = heapq.nlargest(limit, postings.items(), key=lambda item: (item[1], -int(item[0])))
+            return [(todo_id, weight * idf) for todo_id, weight in best], len(postings)
+
+        totals: Dict[str, float] = {}
+        for postings, idf in first:
+            for todo_id, weight in postings.items():
+                score = weight * idf
+                previous = totals.get(todo_id)
+                if previous is not None:
+                    # Stesso todo trovato da un'altra espansione del prefisso: conta la migliore
+                    if score > previous:
+                        totals[todo_id] = score
+                    continue
+                if candidates is not None and todo_id not in candidates:
+                    continue
+                totals[todo_id] = score
+
+        if others:
+            for todo_id in list(totals):
+                score = totals[todo_id]
+                for matched in others:
+                    best = 0.0
+                    for postings, idf in matched:
+                        weight = postings.get(todo_id)
+                        if weight is not None and weight * idf > best:
+                            best = weight * idf
+                    if not best:
+                        del totals[todo_id]
+                        break
+                    score += best
+                else:
+                    totals[todo_id] = score
+
+        best = heapq.nlargest(limit, totals.items(), key=lambda item: (item[1], -int(item[0])))
+        return best, len(totals)
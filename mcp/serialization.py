@@ -0,0 +1,51 @@
+"""
+Serializzazione JSON veloce delle risposte sui todo
+"""
+
+import os
+from typing import Any, Dict, List, Union
+
+from pydantic_core import to_json
+
+from .todo import TODO_FIELDS
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - senza orjson si usa il serializzatore di pydantic-core
+    orjson = None
+
+# Percorso veloce attivabile con TODO_FAST_JSON=1: i dati del gestore non vengono rivalidati
+FAST_JSON = os.getenv("TODO_FAST_JSON", "0") == "1"
+
+# Campi di Todo che il gestore omette finché non sono impostati (gli ultimi del modello)
+_OPTIONAL_FIELDS = ("updated_at", "completed_at")
+
+
+def dump_json(data: Any) -> bytes:
+    """JSON compatto in UTF-8 di dati già fidati (orjson se installato)"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return to_json(data)
+
+
+def _complete(todo: Dict) -> Dict:
+    # I todo mai modificati non hanno updated_at/completed_at: il modello li espone a null.
+    # Sono gli ultimi campi, quindi aggiungerli in coda mantiene l'ordine di response_model;
+    # il dizionario è una copia fresca prodotta dal gestore per questa richiesta.
+    if len(todo) != len(TODO_FIELDS):
+        for field in _OPTIONAL_FIELDS:
+            todo.setdefault(field, None)
+    return todo
+
+
+def dump_todos_json(data: Union[List[Dict], Dict]) -> bytes:
+    """
+    Lista di todo (o pagina a cursore) -> stessi byte di response_model.
+
+    La lista completa segue il modello Todo, quindi i campi mancanti sono
+    aggiunti a null; le pagine restituiscono gli elementi così come sono
+    (con `fields` contengono solo i campi richiesti).
+    """
+    if isinstance(data, list):
+        data = [_complete(todo) for todo in data]
+    return dump_json(data)
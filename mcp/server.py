@@ -0,0 +1,518 @@
+"""
+Server MCP (JSON-RPC 2.0, anche in batch) sul gestore dei todo, senza processi separati
+"""
+
+import asyncio
+import inspect
+import json
+import os
+from typing import Annotated, Any, Callable, Dict, List, Optional, Tuple
+
+from pydantic import Field, TypeAdapter, ValidationError, validate_call
+
+from .idempotency import (
+    MAX_KEY_LENGTH, IdempotencyKeyInProgress, IdempotencyKeyReused, request_fingerprint
+)
+from .registry import PROMPT, RESOURCE, TOOL, Capability, CapabilityRegistry, capabilities
+from .serialization import dump_json
+from .todo import (
+    DEFAULT_CHANGES_LIMIT, DEFAULT_PAGE_SIZE, DEFAULT_SEARCH_LIMIT, MAX_BULK_ITEMS, MAX_CHANGES_LIMIT,
+    MAX_PAGE_SIZE, MAX_SEARCH_LIMIT, MCPTodoManager, Todo, TodoBulkUpdateItem, TodoCreate
+)
+
+# Versioni del protocollo supportate, dalla più recente
+PROTOCOL_VERSIONS = ("2025-06-18", "2025-03-26", "2024-11-05")
+SERVER_INFO = {"name": "Todo List Server", "version": "1.0.0"}
+
+# Codici di errore JSON-RPC
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+RESOURCE_NOT_FOUND = -32002
+
+# Numero massimo di richieste in un batch JSON-RPC
+MAX_BATCH_SIZE = int(os.getenv("MCP_MAX_BATCH_SIZE", "100"))
+
+TODO_ADAPTER = TypeAdapter(Todo)
+RESULT_ADAPTER = TypeAdapter(Dict)
+
+IdempotencyKey = Annotated[Optional[str], Field(None, max_length=MAX_KEY_LENGTH)]
+
+
+class JSONRPCError(Exception):
+    """Errore restituito al client come `error` della risposta JSON-RPC"""
+
+    def __init__(self, code: int, message: str, data: Any = None):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.data = data
+
+    def to_dict(self) -> Dict:
+        error = {"code": self.code, "message": self.message}
+        if self.data is not None:
+            error["data"] = self.data
+        return error
+
+
+class ToolError(Exception):
+    """Errore di esecuzione di un tool: risultato con isError, non errore di protocollo"""
+
+
+def error_response(request_id: Any, error: JSONRPCError) -> Dict:
+    return {"jsonrpc": "2.0", "id": request_id, "error": error.to_dict()}
+
+
+# === TOOL SUI TODO ===
+# Stessa validazione e stessi messaggi degli endpoint REST /mcp/tools/*
+
+def _idempotent(manager: MCPTodoManager, key: Optional[str], operation: str, payload: Any,
+                adapter: TypeAdapter, produce: Callable[[], Any]) -> Tuple[Any, bool]:
+    """
+    Come le scritture REST con Idempotency-Key: stessa chiave di cache
+    (operazione, chiave), quindi un retry può passare da REST a MCP e viceversa.
+    """
+    if key is None:
+        return produce(), False
+    try:
+        body, replayed = manager.idempotency.run(
+            (operation, key),
+            request_fingerprint(payload),
+            lambda: adapter.dump_json(adapter.validate_python(produce()))
+        )
+    except (IdempotencyKeyReused, IdempotencyKeyInProgress) as e:
+        raise ToolError(str(e))
+    return json.loads(body), replayed
+
+
+def _create_todo(manager: MCPTodoManager, title: str, description: str = "",
+                 idempotency_key: IdempotencyKey = None):
+    payload = {"title": title, "description": description}
+    return _idempotent(manager, idempotency_key, "create_todo", payload, TODO_ADAPTER,
+                       lambda: manager.mcp_create_todo(title, description))
+
+
+def _get_all_todos(manager: MCPTodoManager,
+                   limit: Annotated[Optional[int], Field(None, ge=1, le=MAX_PAGE_SIZE)] = None,
+                   cursor: Optional[str] = None, completed: Optional[bool] = None,
+                   fields: Optional[str] = None):
+    if limit is None and cursor is None and completed is None and fields is None:
+        return manager.mcp_get_all_todos()
+    try:
+        return manager.mcp_list_todos(
+            cursor=cursor,
+            limit=limit or DEFAULT_PAGE_SIZE,
+            completed=completed,
+            fields=[field.strip() for field in fields.split(",") if field.strip()] if fields else None
+        )
+    except ValueError as e:
+        raise ToolError(str(e))
+
+
+def _get_todo_by_id(manager: MCPTodoManager, todo_id: str):
+    todo = manager.mcp_get_todo_by_id(todo_id)
+    if todo is None:
+        raise ToolError(f"Todo con ID {todo_id} non trovato")
+    return todo
+
+
+def _update_todo(manager: MCPTodoManager, todo_id: str, title: Optional[str] = None,
+                 description: Optional[str] = None, completed: Optional[bool] = None):
+    updates = {
+        field: value
+        for field, value in (("title", title), ("description", description), ("completed", completed))
+        if value is not None
+    }
+    todo = manager.mcp_update_todo(todo_id, updates)
+    if todo is None:
+        raise ToolError(f"Todo con ID {todo_id} non trovato")
+    return todo
+
+
+def _delete_todo(manager: MCPTodoManager, todo_id: str):
+    todo = manager.mcp_delete_todo(todo_id)
+    if todo is None:
+        raise ToolError(f"Todo con ID {todo_id} non trovato")
+    return {"message": f"Todo '{todo['title']}' eliminato con successo"}
+
+
+def _search_todos(manager: MCPTodoManager, query: Annotated[str, Field(min_length=1)],
+                  limit: Annotated[int, Field(ge=1, le=MAX_SEARCH_LIMIT)] = DEFAULT_SEARCH_LIMIT,
+                  completed: Optional[bool] = None, prefix: bool = True):
+    return manager.mcp_search_todos(query, limit=limit, completed=completed, prefix=prefix)
+
+
+def _get_changes_since(manager: MCPTodoManager, since: Optional[str] = None, since_time: Optional[str] = None,
+                       limit: Annotated[int, Field(ge=1, le=MAX_CHANGES_LIMIT)] = DEFAULT_CHANGES_LIMIT):
+    try:
+        return manager.mcp_get_changes_since(since=since, since_time=since_time, limit=limit)
+    except ValueError as e:
+        raise ToolError(str(e))
+
+
+def _bulk_create_todos(manager: MCPTodoManager,
+                       items: Annotated[List[TodoCreate], Field(max_length=MAX_BULK_ITEMS)],
+                       idempotency_key: IdempotencyKey = None):
+    items = [item.dict() for item in items]
+    return _idempotent(manager, idempotency_key, "bulk_create_todos", items, RESULT_ADAPTER,
+                       lambda: manager.mcp_bulk_create_todos(items))
+
+
+def _bulk_update_todos(manager: MCPTodoManager,
+                       items: Annotated[List[TodoBulkUpdateItem], Field(max_length=MAX_BULK_ITEMS)],
+                       idempotency_key: IdempotencyKey = None):
+    items = [item.dict(exclude_unset=True) for item in items]
+    return _idempotent(manager, idempotency_key, "bulk_update_todos", items, RESULT_ADAPTER,
+                       lambda: manager.mcp_bulk_update_todos(items))
+
+
+def _bulk_delete_todos(manager: MCPTodoManager,
+                       ids: Annotated[List[str], Field(max_length=MAX_BULK_ITEMS)],
+                       idempotency_key: IdempotencyKey = None):
+    return _idempotent(manager, idempotency_key, "bulk_delete_todos", ids, RESULT_ADAPTER,
+                       lambda: manager.mcp_bulk_delete_todos(ids))
+
+
+def _get_completed_todos(manager: MCPTodoManager):
+    return manager.mcp_get_completed_todos()
+
+
+def _get_pending_todos(manager: MCPTodoManager):
+    return manager.mcp_get_pending_todos()
+
+
+def _clear_completed_todos(manager: MCPTodoManager):
+    return manager.mcp_clear_completed_todos()
+
+
+def _export_ndjson(manager: MCPTodoManager) -> str:
+    return "".join(
+        json.dumps(item, ensure_ascii=False) + "\n"
+        for page in manager.iter_todo_pages()
+        for item in page
+    )
+
+
+# === CAPACITÀ DEI TODO ===
+
+IDEMPOTENCY_KEY_PARAMETER = {
+    "type": "string",
+    "description": "Chiave per ripetere la richiesta senza duplicati (anche header Idempotency-Key)",
+    "optional": True
+}
+
+capabilities.tool("create_todo", "Crea un nuovo todo item", {
+    "title": {"type": "string", "description": "Titolo del todo"},
+    "description": {"type": "string", "description": "Descrizione del todo", "optional": True},
+    "idempotency_key": IDEMPOTENCY_KEY_PARAMETER
+}, handler=_create_todo)
+capabilities.tool("get_all_todos", "Ottiene i todo items, tutti o una pagina alla volta", {
+    "limit": {"type": "integer", "description": f"Dimensione pagina (max {MAX_PAGE_SIZE})", "optional": True},
+    "cursor": {"type": "string", "description": "Cursore next_cursor della pagina precedente", "optional": True},
+    "completed": {"type": "boolean", "description": "Filtra per stato completamento", "optional": True},
+    "fields": {"type": "string", "description": "Campi da restituire separati da virgola", "optional": True}
+}, handler=_get_all_todos)
+capabilities.tool("get_todo_by_id", "Ottiene un todo specifico", {
+    "todo_id": {"type": "string", "description": "ID del todo"}
+}, handler=_get_todo_by_id)
+capabilities.tool("update_todo", "Aggiorna un todo esistente", {
+    "todo_id": {"type": "string", "description": "ID del todo"},
+    "title": {"type": "string", "description": "Nuovo titolo", "optional": True},
+    "description": {"type": "string", "description": "Nuova descrizione", "optional": True},
+    "completed": {"type": "boolean", "description": "Stato completamento", "optional": True}
+}, handler=_update_todo)
+capabilities.tool("delete_todo", "Elimina un todo", {
+    "todo_id": {"type": "string", "description": "ID del todo"}
+}, handler=_delete_todo)
+capabilities.tool("search_todos", "Cerca i todo per titolo e descrizione, con corrispondenza per prefisso", {
+    "query": {"type": "string", "description": "Termini da cercare"},
+    "limit": {"type": "integer", "description": f"Numero massimo di risultati (max {MAX_SEARCH_LIMIT})", "optional": True},
+    "completed": {"type": "boolean", "description": "Filtra per stato completamento", "optional": True},
+    "prefix": {"type": "boolean", "description": "Corrispondenza per prefisso (default true)", "optional": True}
+}, handler=_search_todos)
+capabilities.tool("get_changes_since", "Todo creati, modificati o eliminati dopo un sync_token o un istante", {
+    "since": {"type": "string", "description": "sync_token della risposta precedente", "optional": True},
+    "since_time": {"type": "string", "description": "Istante ISO 8601 (alternativo a since)", "optional": True},
+    "limit": {"type": "integer", "description": f"Numero massimo di todo (max {MAX_CHANGES_LIMIT})", "optional": True}
+}, handler=_get_changes_since)
+capabilities.tool("bulk_create_todos", "Crea più todo in un'unica operazione atomica", {
+    "items": {"type": "array", "description": f"Lista di {{title, description}} (max {MAX_BULK_ITEMS})"},
+    "idempotency_key": IDEMPOTENCY_KEY_PARAMETER
+}, handler=_bulk_create_todos)
+capabilities.tool("bulk_update_todos", "Aggiorna più todo in un'unica operazione atomica", {
+    "items": {"type": "array", "description": f"Lista di {{id, title, description, completed}} (max {MAX_BULK_ITEMS})"},
+    "idempotency_key": IDEMPOTENCY_KEY_PARAMETER
+}, handler=_bulk_update_todos)
+capabilities.tool("bulk_delete_todos", "Elimina più todo in un'unica operazione atomica", {
+    "ids": {"type": "array", "description": f"ID dei todo da eliminare (max {MAX_BULK_ITEMS})"},
+    "idempotency_key": IDEMPOTENCY_KEY_PARAMETER
+}, handler=_bulk_delete_todos)
+capabilities.tool("get_completed_todos", "Ottiene i todo completati", handler=_get_completed_todos)
+capabilities.tool("get_pending_todos", "Ottiene i todo in sospeso", handler=_get_pending_todos)
+capabilities.tool("clear_completed_todos", "Elimina tutti i todo completati", handler=_clear_completed_todos)
+
+# Nomi dei tool del vecchio server stdio (FastMCP): restano validi per i client già configurati
+LEGACY_TOOL_ALIASES = {"add_todo": "create_todo", "get_todos": "get_all_todos", "get_todo": "get_todo_by_id"}
+for legacy_name, current_name in LEGACY_TOOL_ALIASES.items():
+    capabilities.alias(legacy_name, current_name)
+
+capabilities.resource("todo_stats", "todo://stats", "Statistiche sui todo", "application/json",
+                      reader=lambda manager: dump_json(manager.mcp_get_stats()).decode())
+capabilities.resource("todo_list", "todo://list", "Lista completa dei todo", "application/json",
+                      reader=lambda manager: dump_json(manager.mcp_get_all_todos()).decode())
+capabilities.resource("todo_export", "todo://export", "Export in streaming dei todo, un oggetto JSON per riga",
+                      "application/x-ndjson", reader=_export_ndjson)
+capabilities.resource("todo_changes", "todo://changes",
+                      "Stream SSE delle modifiche ai todo, con ripresa da Last-Event-ID", "text/event-stream")
+
+
+def input_schema(parameters: Dict) -> Dict:
+    """Parametri della discovery (`optional` per campo) -> inputSchema JSON Schema"""
+    properties = {}
+    required = []
+    for name, spec in parameters.items():
+        properties[name] = {key: value for key, value in spec.items() if key != "optional"}
+        if not spec.get("optional"):
+            required.append(name)
+    schema = {"type": "object", "properties": properties}
+    if required:
+        schema["required"] = required
+    return schema
+
+
+class _Handler:
+    """Handler di una capacità, validato con pydantic; riceve il gestore solo se ha un parametro `manager`"""
+
+    __slots__ = ("function", "wants_manager", "is_async")
+
+    def __init__(self, function: Callable):
+        self.wants_manager = "manager" in inspect.signature(function).parameters
+        self.is_async = inspect.iscoroutinefunction(function)
+        self.function = validate_call(function, config={"arbitrary_types_allowed": True})
+
+    async def __call__(self, manager: MCPTodoManager, arguments: Dict, offload: bool) -> Any:
+        if self.wants_manager:
+            arguments = {"manager": manager, **arguments}
+        if offload and not self.is_async:
+            # Funzione sincrona con I/O bloccante: in un thread, così il loop resta libero
+            # e le chiamate di un batch si sovrappongono
+            return await asyncio.to_thread(self.function, **arguments)
+        result = self.function(**arguments)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+
+class MCPServer:
+    """
+    Metodi MCP eseguiti sul gestore dei todo passato da chi chiama.
+
+    È lo stesso server per ogni trasporto: l'endpoint HTTP /mcp dell'app
+    FastAPI (JSON o SSE) e lo stdio di mcp_server_todo_list.py. Il gestore
+    arriva dal trasporto, quindi REST e MCP leggono e scrivono lo stesso
+    store (o lo stesso shard del tenant) con gli stessi indici.
+
+    tools/call, resources/read e prompts/get sono ricerche per nome (o uri)
+    nel registro delle capacità, lo stesso che genera route e discovery;
+    gli elenchi */list sono costruiti una volta. Un batch JSON-RPC esegue
+    le richieste in modo concorrente e restituisce le risposte nell'ordine
+    delle richieste: i tool asincroni (meteo) si sovrappongono sempre, quelli
+    sincroni vanno in un thread se il gestore fa I/O bloccante (SQLite),
+    altrimenti restano sul loop perché costano meno di un cambio di thread.
+    Le richieste di un batch sono indipendenti, senza ordine di esecuzione.
+
+    Il server non ha stato di sessione: non assegna Mcp-Session-Id, che
+    nell'app sceglierebbe uno shard separato invece dello store condiviso.
+    """
+
+    def __init__(self, registry: CapabilityRegistry, max_batch_size: int = MAX_BATCH_SIZE):
+        self.registry = registry
+        self.max_batch_size = max_batch_size
+        self._handlers: Dict[str, _Handler] = {}
+        self._lists: Dict[str, Dict] = {}
+        self._methods = {
+            "initialize": self._initialize,
+            "ping": self._ping,
+            "tools/list": self._tools_list,
+            "tools/call": self._tools_call,
+            "resources/list": self._resources_list,
+            "resources/read": self._resources_read,
+            "prompts/list": self._prompts_list,
+            "prompts/get": self._prompts_get,
+        }
+        self.requests = 0
+        self.batches = 0
+        self.errors = 0
+
+    def _handler(self, capability: Capability) -> _Handler:
+        handler = self._handlers.get(capability.name)
+        if handler is None:
+            handler = self._handlers[capability.name] = _Handler(capability.handler)
+        return handler
+
+    def _listing(self, kind: str, build: Callable[[Capability], Dict]) -> Dict:
+        # Le capacità sono registrate all'import dei moduli: gli elenchi non cambiano dopo l'avvio
+        listing = self._lists.get(kind)
+        if listing is None:
+            listing = self._lists[kind] = {
+                kind: [build(capability) for capability in self.registry.of_kind(kind)
+                       if capability.handler is not None]
+            }
+        return listing
+
+    async def dispatch(self, payload: Any, manager: MCPTodoManager) -> Optional[Any]:
+        """
+        Risposta a un messaggio o a un batch (lista) JSON-RPC.
+
+        None se non c'è niente da rispondere (solo notifiche o risposte del client).
+        Con un gestore bloccante (SQLite) i handler sincroni vanno in un thread,
+        anche per una richiesta singola: l'attesa di un lock non ferma il loop.
+        """
+        if not isinstance(payload, list):
+            return await self.handle(payload, manager, manager.blocking_io)
+        if not payload:
+            self.errors += 1
+            return error_response(None, JSONRPCError(INVALID_REQUEST, "Batch vuoto"))
+        if len(payload) > self.max_batch_size:
+            self.errors += 1
+            return error_response(None, JSONRPCError(
+                INVALID_REQUEST, f"Troppe richieste nel batch: massimo {self.max_batch_size}"))
+        self.batches += 1
+        responses = await asyncio.gather(*(self.handle(message, manager, manager.blocking_io) for message in payload))
+        return [response for response in responses if response is not None] or None
+
+    async def handle(self, message: Any, manager: MCPTodoManager, offload: bool = False) -> Optional[Dict]:
+        """Risposta a un messaggio JSON-RPC; None per le notifiche e le risposte del client"""
+        if not isinstance(message, dict) or message.get("jsonrpc") != "2.0":
+            self.errors += 1
+            return error_response(None, JSONRPCError(INVALID_REQUEST, "Richiesta JSON-RPC non valida"))
+        request_id = message.get("id")
+        method = message.get("method")
+        if "id" not in message or method is None:
+            # Notifica (es. notifications/initialized) o risposta del client: nessuna risposta
+            return None
+
+        self.requests += 1
+        try:
+            handler = self._methods.get(method)
+            if handler is None:
+                raise JSONRPCError(METHOD_NOT_FOUND, f"Metodo non trovato: {method}")
+            params = message.get("params") or {}
+            if not isinstance(params, dict):
+                raise JSONRPCError(INVALID_PARAMS, "params deve essere un oggetto")
+            result = handler(params, manager, offload)
+            if inspect.isawaitable(result):
+                result = await result
+        except JSONRPCError as e:
+            self.errors += 1
+            return error_response(request_id, e)
+        except Exception as e:
+            self.errors += 1
+            return error_response(request_id, JSONRPCError(INTERNAL_ERROR, f"Errore interno: {e}"))
+        return {"jsonrpc": "2.0", "id": request_id, "result": result}
+
+    def _initialize(self, params: Dict, manager: MCPTodoManager, offload: bool) -> Dict:
+        requested = params.get("protocolVersion")
+        return {
+            "protocolVersion": requested if requested in PROTOCOL_VERSIONS else PROTOCOL_VERSIONS[0],
+            "capabilities": {
+                "tools": {"listChanged": False},
+                "resources": {"subscribe": False, "listChanged": False},
+                "prompts": {"listChanged": False},
+            },
+            "serverInfo": SERVER_INFO,
+        }
+
+    def _ping(self, params: Dict, manager: MCPTodoManager, offload: bool) -> Dict:
+        return {}
+
+    def _tools_list(self, params: Dict, manager: MCPTodoManager, offload: bool) -> Dict:
+        return self._listing(TOOL, lambda tool: {
+            "name": tool.name,
+            "description": tool.description,
+            "inputSchema": input_schema(tool.spec["parameters"]),
+        })
+
+    async def _tools_call(self, params: Dict, manager: MCPTodoManager, offload: bool) -> Dict:
+        name = params.get("name")
+        tool = self.registry.get(TOOL, name)
+        if tool is None or tool.handler is None:
+            raise JSONRPCError(INVALID_PARAMS, f"Tool non trovato: {name}")
+        arguments = params.get("arguments") or {}
+        if not isinstance(arguments, dict):
+            raise JSONRPCError(INVALID_PARAMS, "arguments deve essere un oggetto")
+        try:
+            result = await self._handler(tool)(manager, arguments, offload)
+        except ValidationError as e:
+            raise JSONRPCError(INVALID_PARAMS, f"Argomenti non validi per {name}",
+                               e.errors(include_url=False, include_context=False, include_input=False))
+        except ToolError as e:
+            return {"content": [{"type": "text", "text": str(e)}], "isError": True}
+
+        replayed = False
+        if isinstance(result, tuple):
+            # Scritture con chiave di idempotenza: (risultato, replay)
+            result, replayed = result
+        response = {"content": [{"type": "text", "text": dump_json(result).decode()}], "isError": False}
+        if isinstance(result, dict):
+            response["structuredContent"] = result
+        if replayed:
+            response["_meta"] = {"idempotentReplayed": True}
+        return response
+
+    def _resources_list(self, params: Dict, manager: MCPTodoManager, offload: bool) -> Dict:
+        return self._listing(RESOURCE, lambda resource: {
+            "name": resource.name,
+            "description": resource.description,
+            **resource.spec,
+        })
+
+    async def _resources_read(self, params: Dict, manager: MCPTodoManager, offload: bool) -> Dict:
+        uri = params.get("uri")
+        resource = self.registry.find_resource(uri)
+        if resource is None or resource.handler is None:
+            raise JSONRPCError(RESOURCE_NOT_FOUND, f"Risorsa non trovata: {uri}", {"uri": uri})
+        read = resource.handler
+        text = await asyncio.to_thread(read, manager) if offload else read(manager)
+        return {"contents": [{"uri": uri, "mimeType": resource.spec["mimeType"], "text": text}]}
+
+    def _prompts_list(self, params: Dict, manager: MCPTodoManager, offload: bool) -> Dict:
+        return self._listing(PROMPT, lambda prompt: {
+            "name": prompt.name,
+            "description": prompt.description,
+            "arguments": prompt.spec["arguments"],
+        })
+
+    async def _prompts_get(self, params: Dict, manager: MCPTodoManager, offload: bool) -> Dict:
+        name = params.get("name")
+        prompt = self.registry.get(PROMPT, name)
+        if prompt is None or prompt.handler is None:
+            raise JSONRPCError(INVALID_PARAMS, f"Prompt non trovato: {name}")
+        arguments = params.get("arguments") or {}
+        if not isinstance(arguments, dict):
+            raise JSONRPCError(INVALID_PARAMS, "arguments deve essere un oggetto")
+        try:
+            messages = await self._handler(prompt)(manager, arguments, offload)
+        except ValidationError as e:
+            raise JSONRPCError(INVALID_PARAMS, f"Argomenti non validi per {name}",
+                               e.errors(include_url=False, include_context=False, include_input=False))
+        return {
+            "description": prompt.description,
+            "messages": [
+                {
+                    # MCP ammette solo user e assistant: le istruzioni di sistema vanno al modello come user
+                    "role": message["role"] if message["role"] in ("user", "assistant") else "user",
+                    "content": {"type": "text", "text": message["content"]},
+                }
+                for message in messages
+            ],
+        }
+
+    def stats(self) -> Dict:
+        return {"requests": self.requests, "batches": self.batches, "errors": self.errors}
+
+
+# Server MCP condiviso da tutti i trasporti del processo
+mcp_server = MCPServer(capabilities)
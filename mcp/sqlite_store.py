@@ -0,0 +1,618 @@
+"""
+Backend SQLite condiviso tra i worker per la todo list
+"""
+
+import asyncio
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+from .delta import parse_sync_token
+from .events import CREATED, DEFAULT_HISTORY, DELETED, UPDATED, ChangeFeed, Subscription
+from .idempotency import IdempotencyCache
+from .search import TITLE_WEIGHT, tokenize
+from .todo import (
+    DEFAULT_CHANGES_LIMIT, DEFAULT_PAGE_SIZE, DEFAULT_SEARCH_LIMIT, MAX_CHANGES_LIMIT, MAX_PAGE_SIZE,
+    MAX_SEARCH_LIMIT, SAMPLE_TODOS, MCPTodoManager, decode_cursor, encode_cursor
+)
+
+# Eventi conservati nella tabella todo_changes
+CHANGES_RETENTION = 100000
+# Intervallo di lettura delle nuove modifiche per il feed SSE (secondi)
+CHANGES_POLL_INTERVAL = 0.2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS todos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title TEXT NOT NULL,
+    description TEXT NOT NULL,
+    completed INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL,
+    updated_at TEXT,
+    completed_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_todos_completed ON todos (completed, id);
+
+CREATE TABLE IF NOT EXISTS todo_meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO todo_meta (key, value) VALUES ('total', 0), ('completed', 0), ('version', 0);
+-- Epoca casuale del database: insieme alla versione forma l'ETag
+INSERT OR IGNORE INTO todo_meta (key, value) VALUES ('epoch', abs(random() % 4294967296));
+
+-- Contatori mantenuti dai trigger: le statistiche non scansionano la tabella
+CREATE TRIGGER IF NOT EXISTS todos_count_insert AFTER INSERT ON todos BEGIN
+    UPDATE todo_meta SET value = value + 1 WHERE key = 'total';
+    UPDATE todo_meta SET value = value + NEW.completed WHERE key = 'completed';
+END;
+CREATE TRIGGER IF NOT EXISTS todos_count_delete AFTER DELETE ON todos BEGIN
+    UPDATE todo_meta SET value = value - 1 WHERE key = 'total';
+    UPDATE todo_meta SET value = value - OLD.completed WHERE key = 'completed';
+END;
+CREATE TRIGGER IF NOT EXISTS todos_count_update AFTER UPDATE OF completed ON todos
+WHEN NEW.completed != OLD.completed BEGIN
+    UPDATE todo_meta SET value = value + NEW.completed - OLD.completed WHERE key = 'completed';
+END;
+
+-- Versione condivisa da tutti i worker, incrementata a ogni mutazione, e
+-- registro delle modifiche per il feed SSE e la sincronizzazione incrementale
+-- (gli ultimi CHANGES_RETENTION eventi; le cancellazioni fanno da tombstone)
+CREATE TABLE IF NOT EXISTS todo_changes (
+    version INTEGER PRIMARY KEY,
+    todo_id INTEGER NOT NULL,
+    op TEXT NOT NULL,
+    changed_at INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_todo_changes_time ON todo_changes (changed_at);
+DROP TRIGGER IF EXISTS todos_version_insert;
+DROP TRIGGER IF EXISTS todos_version_update;
+DROP TRIGGER IF EXISTS todos_version_delete;
+DROP TRIGGER IF EXISTS todos_change_insert;
+DROP TRIGGER IF EXISTS todos_change_update;
+DROP TRIGGER IF EXISTS todos_change_delete;
+CREATE TRIGGER IF NOT EXISTS todos_changelog_insert AFTER INSERT ON todos BEGIN
+    UPDATE todo_meta SET value = value + 1 WHERE key = 'version';
+    INSERT INTO todo_changes (version, todo_id, op, changed_at)
+    SELECT value, NEW.id, 'created', {now_micros} FROM todo_meta WHERE key = 'version';
+END;
+CREATE TRIGGER IF NOT EXISTS todos_changelog_update AFTER UPDATE ON todos BEGIN
+    UPDATE todo_meta SET value = value + 1 WHERE key = 'version';
+    INSERT INTO todo_changes (version, todo_id, op, changed_at)
+    SELECT value, NEW.id, 'updated', {now_micros} FROM todo_meta WHERE key = 'version';
+END;
+CREATE TRIGGER IF NOT EXISTS todos_changelog_delete AFTER DELETE ON todos BEGIN
+    UPDATE todo_meta SET value = value + 1 WHERE key = 'version';
+    INSERT INTO todo_changes (version, todo_id, op, changed_at)
+    SELECT value, OLD.id, 'deleted', {now_micros} FROM todo_meta WHERE key = 'version';
+END;
+CREATE TRIGGER IF NOT EXISTS todo_changes_retention AFTER INSERT ON todo_changes BEGIN
+    DELETE FROM todo_changes WHERE version <= NEW.version - {retention};
+END;
+""".replace("{retention}", str(CHANGES_RETENTION)).replace(
+    # Microsecondi dall'epoch (unixepoch('subsec') richiede SQLite 3.42)
+    "{now_micros}", "CAST((julianday('now') - 2440587.5) * 86400000000 AS INTEGER)"
+)
+
+# Indice full-text FTS5 "external content" sulla tabella todos, tenuto allineato dai trigger
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS todos_fts USING fts5(
+    title, description, content='todos', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS todos_fts_insert AFTER INSERT ON todos BEGIN
+    INSERT INTO todos_fts (rowid, title, description) VALUES (NEW.id, NEW.title, NEW.description);
+END;
+CREATE TRIGGER IF NOT EXISTS todos_fts_delete AFTER DELETE ON todos BEGIN
+    INSERT INTO todos_fts (todos_fts, rowid, title, description)
+    VALUES ('delete', OLD.id, OLD.title, OLD.description);
+END;
+CREATE TRIGGER IF NOT EXISTS todos_fts_update AFTER UPDATE OF title, description ON todos BEGIN
+    INSERT INTO todos_fts (todos_fts, rowid, title, description)
+    VALUES ('delete', OLD.id, OLD.title, OLD.description);
+    INSERT INTO todos_fts (rowid, title, description) VALUES (NEW.id, NEW.title, NEW.description);
+END;
+"""
+
+COLUMNS = "id, title, description, completed, created_at, updated_at, completed_at"
+
+
+class SQLitePool:
+    """
+    Pool di connessioni SQLite del processo.
+
+    Le connessioni sono create al primo uso (quindi dopo il fork dei worker
+    gunicorn) e riusate; ognuna mantiene la propria cache di statement
+    preparati, quindi le query con parametri non vengono ricompilate.
+    """
+
+    def __init__(self, path: str, size: int = 4, busy_timeout_ms: int = 5000):
+        self.path = path
+        self.size = size
+        self.busy_timeout_ms = busy_timeout_ms
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._all: List[sqlite3.Connection] = []
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False,
+                               cached_statements=128)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={self.busy_timeout_ms}")
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Presta una connessione del pool (ne crea una se il pool non è pieno)"""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self.size
+                if create:
+                    self._created += 1
+            if create:
+                conn = self._connect()
+                with self._lock:
+                    self._all.append(conn)
+            else:
+                conn = self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Connessione con transazione in scrittura (BEGIN IMMEDIATE ... COMMIT)"""
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def close(self):
+        with self._lock:
+            for conn in self._all:
+                conn.close()
+            self._all.clear()
+            self._created = 0
+        self._idle = queue.LifoQueue()
+
+
+def _row_to_todo(row: sqlite3.Row) -> Dict:
+    todo = dict(row)
+    todo["id"] = str(todo["id"])
+    todo["completed"] = bool(todo["completed"])
+    return todo
+
+
+def _parse_id(todo_id: str) -> Optional[int]:
+    """Id numerico della tabella, None se l'id non può esistere"""
+    try:
+        return int(todo_id)
+    except (TypeError, ValueError):
+        return None
+
+
+class SQLiteTodoManager(MCPTodoManager):
+    """
+    Gestore MCP con i todo in un database SQLite in modalità WAL.
+
+    Tutti i worker gunicorn aprono lo stesso file, quindi vedono gli stessi
+    todo: un GET smistato su un altro worker trova ciò che è stato appena
+    creato. Gli id sono AUTOINCREMENT (mai riutilizzati), così i cursori di
+    paginazione restano stabili; le statistiche e la versione per gli ETag
+    leggono contatori mantenuti da trigger invece di contare le righe. Le istruzioni con RETURNING sono
+    sempre lette con fetchall(), così lo statement termina e la transazione
+    implicita si chiude subito.
+    """
+
+    # Ogni operazione attende il database: le chiamate concorrenti vanno in thread separati
+    blocking_io = True
+    persistent = True
+
+    def __init__(self, path: str, pool_size: int = 4, sample_data: bool = True):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._pool = SQLitePool(path, size=pool_size)
+        with self._pool.connection() as conn:
+            self._migrate_changes(conn)
+            conn.executescript(SCHEMA)
+            self._create_search_index(conn)
+            self._epoch = format(conn.execute("SELECT value FROM todo_meta WHERE key = 'epoch'").fetchone()[0], "x")
+        if sample_data:
+            self._initialize_sample_data()
+
+        # Il feed parte dagli ultimi eventi del registro, così la ripresa con
+        # Last-Event-ID funziona anche dopo un riavvio o su un altro worker
+        self._changes_seen = max(0, self.current_version() - DEFAULT_HISTORY)
+        self.changes = ChangeFeed(self._epoch, self._changes_seen)
+        self._poll_lock = threading.Lock()
+        self._poller: Optional[threading.Thread] = None
+        self._closed = False
+        self.idempotency = IdempotencyCache()
+
+    @staticmethod
+    def _migrate_changes(conn: sqlite3.Connection):
+        """Aggiunge changed_at a un registro delle modifiche creato senza"""
+        columns = [row["name"] for row in conn.execute("PRAGMA table_info(todo_changes)")]
+        if columns and "changed_at" not in columns:
+            try:
+                conn.execute("ALTER TABLE todo_changes ADD COLUMN changed_at INTEGER")
+            except sqlite3.OperationalError:
+                # Un altro worker in avvio l'ha appena aggiunta
+                pass
+
+    @staticmethod
+    def _create_search_index(conn: sqlite3.Connection):
+        """Crea l'indice FTS5; se il database esisteva già lo popola dai todo presenti"""
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'todos_fts'"
+        ).fetchone()
+        conn.executescript(FTS_SCHEMA)
+        if not exists:
+            # Idempotente: innocuo se più worker in avvio lo eseguono insieme
+            conn.execute("INSERT INTO todos_fts (todos_fts) VALUES ('rebuild')")
+
+    def _initialize_sample_data(self):
+        """Inserisce i dati di esempio una sola volta, anche con più worker in avvio"""
+        with self._pool.transaction() as conn:
+            if conn.execute("SELECT 1 FROM todo_meta WHERE key = 'initialized'").fetchone():
+                return
+            now = datetime.now().isoformat()
+            conn.executemany(
+                "INSERT INTO todos (title, description, completed, created_at) VALUES (?, ?, 0, ?)",
+                [(title, description, now) for title, description in SAMPLE_TODOS]
+            )
+            conn.execute("INSERT INTO todo_meta (key, value) VALUES ('initialized', 1)")
+
+    def current_version(self) -> int:
+        """Versione del database (contatore mantenuto dai trigger, comune ai worker)"""
+        with self._pool.connection() as conn:
+            return conn.execute("SELECT value FROM todo_meta WHERE key = 'version'").fetchone()[0]
+
+    def subscribe_changes(self, last_event_id: Optional[str] = None,
+                          loop: Optional[asyncio.AbstractEventLoop] = None) -> Subscription:
+        """
+        Iscrive un client al feed delle modifiche.
+
+        Le modifiche di tutti i worker arrivano dalla tabella todo_changes,
+        letta da un thread avviato alla prima iscrizione. La prima iscrizione
+        interroga il database: dall'app va chiamata nel threadpool con `loop`.
+        """
+        if self._poller is None:
+            self._start_poller()
+        return self.changes.subscribe(last_event_id, loop)
+
+    def _start_poller(self):
+        """Legge le modifiche arretrate e avvia il thread di polling (una sola volta)"""
+        with self._poll_lock:
+            if self._poller is None:
+                self._poll_changes()
+                self._poller = threading.Thread(target=self._poll_loop, name="todo-changes-poller", daemon=True)
+                self._poller.start()
+
+    def _poll_loop(self):
+        while not self._closed:
+            time.sleep(CHANGES_POLL_INTERVAL)
+            try:
+                with self._poll_lock:
+                    self._poll_changes()
+            except sqlite3.Error:
+                # Errore transitorio (database occupato o chiuso): si riprova al giro successivo
+                continue
+
+    def _poll_changes(self):
+        """Pubblica nel feed le modifiche registrate dopo l'ultima letta"""
+        select_columns = ", ".join(f"t.{column}" for column in COLUMNS.split(", "))
+        with self._pool.connection() as conn:
+            rows = conn.execute(
+                f"SELECT c.version AS change_version, c.todo_id AS change_todo_id, c.op AS change_op, "
+                f"{select_columns} FROM todo_changes c LEFT JOIN todos t ON t.id = c.todo_id "
+                "WHERE c.version > ? ORDER BY c.version",
+                (self._changes_seen,)
+            ).fetchall()
+        for row in rows:
+            todo = dict(row)
+            version = todo.pop("change_version")
+            todo_id = str(todo.pop("change_todo_id"))
+            op = todo.pop("change_op")
+            self._changes_seen = version
+            if op == DELETED:
+                self.changes.publish(version, DELETED, todo_id)
+            elif todo["id"] is not None:
+                # Stato attuale del todo: le modifiche successive arrivano comunque dopo
+                todo["id"] = str(todo["id"])
+                todo["completed"] = bool(todo["completed"])
+                self.changes.publish(version, CREATED if op == CREATED else UPDATED, todo_id, todo)
+
+    def mcp_get_changes_since(self, since: Optional[str] = None, since_time: Optional[str] = None,
+                              limit: int = DEFAULT_CHANGES_LIMIT) -> Dict:
+        """
+        Todo creati, modificati o eliminati dopo un sync_token o un istante (MCP Tool).
+
+        Legge todo_changes dalla versione indicata (chiave primaria) e per
+        ogni todo tiene l'ultima modifica; le righe 'deleted' sono i tombstone.
+        Tutto in una transazione di lettura, quindi il sync_token restituito
+        corrisponde esattamente allo stato letto.
+        """
+        limit = max(1, min(limit, MAX_CHANGES_LIMIT))
+        select_columns = ", ".join(f"t.{column}" for column in COLUMNS.split(", "))
+        with self._pool.connection() as conn:
+            conn.execute("BEGIN")
+            try:
+                current = conn.execute("SELECT value FROM todo_meta WHERE key = 'version'").fetchone()[0]
+                oldest = conn.execute("SELECT MIN(version) FROM todo_changes").fetchone()[0]
+                # Versione fino alla quale il registro non è più completo
+                horizon = current if oldest is None else oldest - 1
+                after = self._sync_start_sql(conn, since, since_time, current, horizon)
+                if after is None or after > current or after < horizon:
+                    return self._changes_result(current, reset=True)
+                rows = conn.execute(
+                    f"SELECT c.todo_id AS change_todo_id, c.version AS change_version, {select_columns} "
+                    "FROM (SELECT todo_id, MAX(version) AS version FROM todo_changes WHERE version > ? "
+                    "GROUP BY todo_id ORDER BY version LIMIT ?) c "
+                    "LEFT JOIN todos t ON t.id = c.todo_id ORDER BY c.version",
+                    (after, limit + 1)
+                ).fetchall()
+            finally:
+                conn.execute("COMMIT")
+
+        has_more = len(rows) > limit
+        todos, deleted = [], []
+        for row in rows[:limit]:
+            todo = dict(row)
+            todo_id = str(todo.pop("change_todo_id"))
+            todo.pop("change_version")
+            if todo["id"] is None:
+                deleted.append(todo_id)
+            else:
+                todos.append(_row_to_todo(todo))
+        version = rows[limit - 1]["change_version"] if has_more else current
+        return self._changes_result(version, todos=todos, deleted=deleted, has_more=has_more)
+
+    def _sync_start_sql(self, conn: sqlite3.Connection, since: Optional[str], since_time: Optional[str],
+                        current: int, horizon: int) -> Optional[int]:
+        """Versione da cui partire; None se serve una risincronizzazione completa"""
+        if since is not None:
+            return parse_sync_token(since, self._epoch)
+        if since_time is None:
+            return None
+        # Scansione dell'indice su changed_at limitata alle modifiche successive
+        first = conn.execute(
+            "SELECT MIN(version) FROM todo_changes WHERE changed_at > ?",
+            (self._parse_since_time(since_time),)
+        ).fetchone()[0]
+        if first is None:
+            return current
+        # La modifica precedente deve essere nota e datata, altrimenti ne potrebbero mancare alcune
+        previous = conn.execute(
+            "SELECT changed_at FROM todo_changes WHERE version < ? ORDER BY version DESC LIMIT 1", (first,)
+        ).fetchone()
+        if previous is None:
+            return first - 1 if horizon == 0 else None
+        return first - 1 if previous["changed_at"] is not None else None
+
+    def close(self):
+        """Ferma il feed e chiude le connessioni del pool"""
+        self._closed = True
+        self._pool.close()
+
+    def mcp_create_todo(self, title: str, description: str = "") -> Dict:
+        """Crea un nuovo todo item (MCP Tool)"""
+        with self._pool.connection() as conn:
+            return self._insert(conn, title, description)
+
+    def _insert(self, conn: sqlite3.Connection, title: str, description: str) -> Dict:
+        row = conn.execute(
+            f"INSERT INTO todos (title, description, completed, created_at) VALUES (?, ?, 0, ?) "
+            f"RETURNING {COLUMNS}",
+            (title, description, datetime.now().isoformat())
+        ).fetchall()[0]
+        return _row_to_todo(row)
+
+    def mcp_get_all_todos(self) -> List[Dict]:
+        """Ottiene tutti i todo items (MCP Tool)"""
+        with self._pool.connection() as conn:
+            rows = conn.execute(f"SELECT {COLUMNS} FROM todos ORDER BY id").fetchall()
+        return [_row_to_todo(row) for row in rows]
+
+    def mcp_list_todos(self, cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE,
+                       completed: Optional[bool] = None, fields: Optional[List[str]] = None) -> Dict:
+        """Ottiene una pagina di todo ordinata per id (MCP Tool)"""
+        after = decode_cursor(cursor) if cursor else 0
+        projection = self._parse_fields(fields)
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+        query = f"SELECT {COLUMNS} FROM todos WHERE id > ?"
+        params: list = [after]
+        if completed is not None:
+            query += " AND completed = ?"
+            params.append(int(completed))
+        # Una riga in più per sapere se esiste una pagina successiva
+        query += " ORDER BY id LIMIT ?"
+        params.append(limit + 1)
+
+        with self._pool.connection() as conn:
+            rows = conn.execute(query, params).fetchall()
+
+        todos = [_row_to_todo(row) for row in rows[:limit]]
+        items = [{field: todo.get(field) for field in projection} for todo in todos]
+        return {
+            "items": items,
+            "next_cursor": encode_cursor(todos[-1]["id"]) if len(rows) > limit else None
+        }
+
+    def mcp_get_todo_by_id(self, todo_id: str) -> Optional[Dict]:
+        """Ottiene un todo specifico per ID (MCP Tool)"""
+        row_id = _parse_id(todo_id)
+        if row_id is None:
+            return None
+        with self._pool.connection() as conn:
+            row = conn.execute(f"SELECT {COLUMNS} FROM todos WHERE id = ?", (row_id,)).fetchone()
+        return _row_to_todo(row) if row else None
+
+    def mcp_update_todo(self, todo_id: str, updates: Dict) -> Optional[Dict]:
+        """Aggiorna un todo esistente (MCP Tool)"""
+        with self._pool.connection() as conn:
+            return self._update_row(conn, todo_id, updates)
+
+    def _update_row(self, conn: sqlite3.Connection, todo_id: str, updates: Dict) -> Optional[Dict]:
+        row_id = _parse_id(todo_id)
+        if row_id is None:
+            return None
+
+        completed = updates.get("completed")
+        now = datetime.now().isoformat()
+        rows = conn.execute(
+            "UPDATE todos SET "
+            "title = COALESCE(?, title), "
+            "description = COALESCE(?, description), "
+            "completed = COALESCE(?, completed), "
+            "completed_at = CASE WHEN ? = 1 THEN ? ELSE completed_at END, "
+            "updated_at = ? "
+            f"WHERE id = ? RETURNING {COLUMNS}",
+            (
+                updates.get("title"),
+                updates.get("description"),
+                None if completed is None else int(completed),
+                None if completed is None else int(completed),
+                now,
+                now,
+                row_id,
+            )
+        ).fetchall()
+        return _row_to_todo(rows[0]) if rows else None
+
+    def mcp_delete_todo(self, todo_id: str) -> Optional[Dict]:
+        """Elimina un todo (MCP Tool)"""
+        with self._pool.connection() as conn:
+            return self._delete_row(conn, todo_id)
+
+    def _delete_row(self, conn: sqlite3.Connection, todo_id: str) -> Optional[Dict]:
+        row_id = _parse_id(todo_id)
+        if row_id is None:
+            return None
+        rows = conn.execute(f"DELETE FROM todos WHERE id = ? RETURNING {COLUMNS}", (row_id,)).fetchall()
+        return _row_to_todo(rows[0]) if rows else None
+
+    def mcp_bulk_create_todos(self, items: List[Dict]) -> Dict:
+        """Crea più todo in un'unica transazione (MCP Tool)"""
+        with self._pool.transaction() as conn:
+            todos = [self._insert(conn, item["title"], item.get("description", "")) for item in items]
+        return self._bulk_result([{"id": todo["id"], "ok": True, "todo": todo} for todo in todos])
+
+    def mcp_bulk_update_todos(self, items: List[Dict]) -> Dict:
+        """Aggiorna più todo in un'unica transazione (MCP Tool)"""
+        results = []
+        with self._pool.transaction() as conn:
+            for item in items:
+                updates = {key: value for key, value in item.items() if key != "id"}
+                todo = self._update_row(conn, item["id"], updates)
+                if todo is None:
+                    results.append({"id": item["id"], "ok": False, "error": "Todo non trovato"})
+                else:
+                    results.append({"id": item["id"], "ok": True, "todo": todo})
+        return self._bulk_result(results)
+
+    def mcp_bulk_delete_todos(self, todo_ids: List[str]) -> Dict:
+        """Elimina più todo in un'unica transazione (MCP Tool)"""
+        results = []
+        with self._pool.transaction() as conn:
+            for todo_id in todo_ids:
+                todo = self._delete_row(conn, todo_id)
+                if todo is None:
+                    results.append({"id": todo_id, "ok": False, "error": "Todo non trovato"})
+                else:
+                    results.append({"id": todo_id, "ok": True, "todo": todo})
+        return self._bulk_result(results)
+
+    def mcp_search_todos(self, query: str, limit: int = DEFAULT_SEARCH_LIMIT,
+                         completed: Optional[bool] = None, prefix: bool = True) -> Dict:
+        """Cerca i todo per titolo e descrizione con l'indice FTS5, ordinati per bm25 (MCP Tool)"""
+        limit = max(1, min(limit, MAX_SEARCH_LIMIT))
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return {"query": query, "total_matches": 0, "items": []}
+
+        # Termini tra virgolette (nessuna sintassi FTS5 dall'utente), in AND implicito
+        match = " ".join(f'"{term}"*' if prefix else f'"{term}"' for term in terms)
+        where = "todos_fts MATCH ?"
+        params: list = [match]
+        if completed is not None:
+            where += " AND t.completed = ?"
+            params.append(int(completed))
+
+        select_columns = ", ".join(f"t.{column}" for column in COLUMNS.split(", "))
+        with self._pool.connection() as conn:
+            total = conn.execute(
+                f"SELECT COUNT(*) FROM todos_fts JOIN todos t ON t.id = todos_fts.rowid WHERE {where}",
+                params
+            ).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT {select_columns}, -bm25(todos_fts, {TITLE_WEIGHT}.0, 1.0) AS score "
+                f"FROM todos_fts JOIN todos t ON t.id = todos_fts.rowid "
+                f"WHERE {where} ORDER BY score DESC, t.id LIMIT ?",
+                params + [limit]
+            ).fetchall()
+
+        items = []
+        for row in rows:
+            todo = dict(row)
+            score = todo.pop("score")
+            todo["id"] = str(todo["id"])
+            todo["completed"] = bool(todo["completed"])
+            items.append({"score": round(score, 4), "todo": todo})
+        return {"query": query, "total_matches": total, "items": items}
+
+    def mcp_get_completed_todos(self) -> List[Dict]:
+        """Ottiene tutti i todo completati (MCP Tool)"""
+        with self._pool.connection() as conn:
+            rows = conn.execute(f"SELECT {COLUMNS} FROM todos WHERE completed = 1 ORDER BY id").fetchall()
+        return [_row_to_todo(row) for row in rows]
+
+    def mcp_get_pending_todos(self) -> List[Dict]:
+        """Ottiene tutti i todo in sospeso (MCP Tool)"""
+        with self._pool.connection() as conn:
+            rows = conn.execute(f"SELECT {COLUMNS} FROM todos WHERE completed = 0 ORDER BY id").fetchall()
+        return [_row_to_todo(row) for row in rows]
+
+    def mcp_clear_completed_todos(self) -> Dict:
+        """Elimina tutti i todo completati (MCP Tool)"""
+        with self._pool.connection() as conn:
+            deleted = conn.execute("DELETE FROM todos WHERE completed = 1").rowcount
+
+        if not deleted:
+            return {"message": "Nessun todo completato da eliminare", "deleted_count": 0}
+        return {"message": f"Eliminati {deleted} todo completati", "deleted_count": deleted}
+
+    def mcp_get_stats(self) -> Dict:
+        """Calcola statistiche sui todo (MCP Resource) dai contatori dei trigger"""
+        with self._pool.connection() as conn:
+            counters = dict(conn.execute(
+                "SELECT key, value FROM todo_meta WHERE key IN ('total', 'completed')"
+            ).fetchall())
+        total = counters["total"]
+        completed = counters["completed"]
+        pending = total - completed
+
+        return {
+            "total_todos": total,
+            "completed_todos": completed,
+            "pending_todos": pending,
+            "completion_rate": f"{(completed / total * 100):.1f}%" if total > 0 else "0%"
+        }
@@ -0,0 +1,306 @@
+"""
+Persistenza della todo list: log append-only con snapshot periodici
+"""
+
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - piattaforme senza flock
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Politiche di fsync del log
+FSYNC_ALWAYS = "always"
+FSYNC_BATCH = "batch"
+FSYNC_NEVER = "never"
+FSYNC_POLICIES = (FSYNC_ALWAYS, FSYNC_BATCH, FSYNC_NEVER)
+
+SNAPSHOT_FILE = "snapshot.ndjson"
+LOCK_FILE = "todo.lock"
+
+
+class TodoStorage:
+    """
+    Storage nullo: lo stato vive solo in memoria.
+
+    Definisce l'interfaccia usata da MCPTodoManager; le sottoclassi
+    persistono le mutazioni e ricostruiscono lo stato all'avvio.
+    """
+
+    # Lo stato sopravvive alla chiusura dello storage?
+    persistent = False
+
+    def load(self) -> Optional[Tuple[Dict[str, Dict], int]]:
+        """Stato salvato (todo per id, prossimo id) oppure None se assente"""
+        return None
+
+    def append(self, record: Dict) -> bool:
+        """Registra una mutazione; True se è il momento di uno snapshot"""
+        return False
+
+    def snapshot(self, next_id: int, todos: Iterable[Dict]):
+        """Salva uno snapshot compattato dello stato corrente"""
+
+    def close(self):
+        """Rende durevoli le scritture pendenti e rilascia le risorse"""
+
+
+class LogStorage(TodoStorage):
+    """
+    Log append-only (NDJSON) con group commit e snapshot compattati.
+
+    Ogni mutazione è una riga con numero di sequenza crescente, scritta e
+    passata al sistema operativo subito. L'fsync dipende dalla politica:
+    "always" a ogni scrittura, "batch" da un thread che raggruppa le scritture
+    ogni `fsync_interval` secondi (group commit), "never" lo lascia al kernel.
+
+    Ogni `snapshot_every` mutazioni il log passa a un nuovo segmento e lo
+    stato viene scritto in background in uno snapshot; i segmenti coperti
+    dallo snapshot vengono poi eliminati. All'avvio si carica lo snapshot e
+    si riapplicano i record successivi. La directory è bloccata con flock:
+    un solo processo per volta può usarla.
+    """
+
+    persistent = True
+
+    def __init__(self, directory: str, fsync_policy: str = FSYNC_BATCH, fsync_interval: float = 0.05,
+                 snapshot_every: int = 10000, lock_timeout: float = 10.0):
+        if fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"Politica di fsync non valida: {fsync_policy}")
+        self.directory = directory
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval
+        self.snapshot_every = snapshot_every
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._lock_file = self._acquire_directory_lock(lock_timeout)
+        self._seq = 0
+        self._since_snapshot = 0
+        self._dirty = False
+        self._closed = False
+        self._file = None
+        self._snapshot_thread: Optional[threading.Thread] = None
+        self._flusher: Optional[threading.Thread] = None
+
+    # --- ciclo di vita ---
+
+    def _acquire_directory_lock(self, timeout: float):
+        """Impedisce a due processi di scrivere lo stesso log"""
+        lock_file = open(os.path.join(self.directory, LOCK_FILE), "a")
+        if fcntl is None:
+            return lock_file
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return lock_file
+            except OSError:
+                if time.monotonic() >= deadline:
+                    lock_file.close()
+                    raise RuntimeError(
+                        f"Directory {self.directory} già in uso da un altro processo: "
+                        "usa un solo worker oppure il backend condiviso"
+                    )
+                time.sleep(0.1)
+
+    def _segment_path(self, first_seq: int) -> str:
+        return os.path.join(self.directory, f"wal-{first_seq:020d}.log")
+
+    def _segments(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.directory, "wal-*.log")))
+
+    def _open_segment(self):
+        """Apre un nuovo segmento che inizia dal prossimo numero di sequenza"""
+        self._file = open(self._segment_path(self._seq + 1), "a", encoding="utf-8")
+
+    def _start_flusher(self):
+        if self.fsync_policy != FSYNC_BATCH:
+            return
+        self._flusher = threading.Thread(target=self._flush_loop, name="todo-log-fsync", daemon=True)
+        self._flusher.start()
+
+    def _flush_loop(self):
+        while not self._closed:
+            time.sleep(self.fsync_interval)
+            self._sync()
+
+    def _sync(self):
+        with self._lock:
+            if self._dirty and self._file is not None:
+                os.fsync(self._file.fileno())
+                self._dirty = False
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            if self._file is not None:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._file.close()
+                self._file = None
+        if self._snapshot_thread is not None:
+            self._snapshot_thread.join()
+        self._lock_file.close()
+
+    # --- recupero ---
+
+    def load(self) -> Optional[Tuple[Dict[str, Dict], int]]:
+        """Carica l'ultimo snapshot e riapplica la coda del log"""
+        todos: Dict[str, Dict] = {}
+        next_id = 1
+        snapshot_seq = 0
+        found = False
+
+        snapshot_path = os.path.join(self.directory, SNAPSHOT_FILE)
+        if os.path.exists(snapshot_path):
+            found = True
+            with open(snapshot_path, encoding="utf-8") as f:
+                header = json.loads(f.readline())
+                snapshot_seq = header["seq"]
+                next_id = header["next_id"]
+                for line in f:
+                    todo = json.loads(line)
+                    todos[todo["id"]] = todo
+
+        self._seq = snapshot_seq
+        for segment in self._segments():
+            found = True
+            good_bytes = 0
+            torn = False
+            with open(segment, "rb") as f:
+                for line in f:
+                    try:
+                        # Senza "\n" finale la scrittura non è stata completata
+                        if not line.endswith(b"\n"):
+                            raise ValueError("riga incompleta")
+                        record = json.loads(line)
+                    except ValueError:
+                        # Riga troncata da un crash durante la scrittura: fine del log utile
+                        logger.warning("Record troncato ignorato in %s", segment)
+                        torn = True
+                        break
+                    good_bytes += len(line)
+                    if record["seq"] <= snapshot_seq:
+                        continue
+                    next_id = self._apply(todos, record, next_id)
+                    self._seq = record["seq"]
+                    self._since_snapshot += 1
+            if torn:
+                # Il nuovo segmento può avere lo stesso nome: i record scritti dopo
+                # il riavvio non devono finire attaccati alla riga troncata
+                self._truncate(segment, good_bytes)
+
+        self._open_segment()
+        self._start_flusher()
+        return (todos, next_id) if found else None
+
+    @staticmethod
+    def _truncate(path: str, size: int):
+        """Taglia il segmento dopo l'ultimo record valido e lo rende durevole"""
+        with open(path, "r+b") as f:
+            f.truncate(size)
+            f.flush()
+            os.fsync(f.fileno())
+
+    @staticmethod
+    def _apply(todos: Dict[str, Dict], record: Dict, next_id: int) -> int:
+        """Riapplica un record del log allo stato in ricostruzione"""
+        op = record["op"]
+        if op in ("create", "update"):
+            todo = record["todo"]
+            todos[todo["id"]] = todo
+            next_id = max(next_id, int(todo["id"]) + 1)
+        elif op == "delete":
+            for todo_id in record["ids"]:
+                todos.pop(todo_id, None)
+        elif op == "batch":
+            # Operazione bulk: un'unica riga, quindi applicata per intero o per niente
+            for inner in record["records"]:
+                next_id = LogStorage._apply(todos, inner, next_id)
+        return next_id
+
+    # --- scrittura ---
+
+    def append(self, record: Dict) -> bool:
+        with self._lock:
+            self._seq += 1
+            line = json.dumps({"seq": self._seq, **record}, ensure_ascii=False)
+            self._file.write(line + "\n")
+            self._file.flush()
+            if self.fsync_policy == FSYNC_ALWAYS:
+                os.fsync(self._file.fileno())
+            else:
+                self._dirty = True
+            self._since_snapshot += 1
+            return self._since_snapshot >= self.snapshot_every and self._snapshot_thread is None
+
+    def snapshot(self, next_id: int, todos: Iterable[Dict]):
+        """
+        Ruota il log e scrive lo snapshot in un thread separato.
+
+        `todos` deve basarsi su una copia dello stato: viene consumato e
+        serializzato mentre il gestore accetta scritture sul nuovo segmento.
+        """
+        with self._lock:
+            if self._snapshot_thread is not None:
+                return
+            snapshot_seq = self._seq
+            old_segments = self._segments()
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._dirty = False
+            self._open_segment()
+            self._since_snapshot = 0
+            self._snapshot_thread = threading.Thread(
+                target=self._write_snapshot,
+                args=(snapshot_seq, next_id, todos, old_segments),
+                name="todo-snapshot",
+                daemon=True,
+            )
+            self._snapshot_thread.start()
+
+    def _write_snapshot(self, seq: int, next_id: int, todos: Iterable[Dict], old_segments: List[str]):
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        tmp_path = path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(json.dumps({"seq": seq, "next_id": next_id}) + "\n")
+                for todo in todos:
+                    f.write(json.dumps(todo, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+            # I segmenti precedenti sono ora coperti dallo snapshot
+            for segment in old_segments:
+                os.remove(segment)
+        except OSError as e:
+            logger.error("Snapshot dei todo fallito: %s", e)
+        finally:
+            self._snapshot_thread = None
+
+    def wait_for_snapshot(self):
+        """Attende la fine dello snapshot in corso (usato da benchmark e shutdown)"""
+        thread = self._snapshot_thread
+        if thread is not None:
+            thread.join()
+
+
+def create_storage(backend: str, directory: str, fsync_policy: str = FSYNC_BATCH,
+                   fsync_interval: float = 0.05, snapshot_every: int = 10000) -> TodoStorage:
+    """Costruisce lo storage indicato dalla configurazione"""
+    if backend == "memory":
+        return TodoStorage()
+    if backend == "log":
+        return LogStorage(directory, fsync_policy=fsync_policy, fsync_interval=fsync_interval,
+                          snapshot_every=snapshot_every)
+    raise ValueError(f"Storage dei todo non valido: {backend}")
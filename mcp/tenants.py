@@ -0,0 +1,155 @@
+"""
+Store dei todo separati per tenant o sessione
+"""
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+from .todo import MCPTodoManager, create_todo_manager, todo_manager
+
+# Id di tenant ammessi: finiscono nei percorsi dei file (log, database), quindi niente "." iniziale
+_TENANT_RE = re.compile(r"^[A-Za-z0-9_-][A-Za-z0-9_.-]{0,63}$")
+
+
+class TenantCapacityError(RuntimeError):
+    """Raggiunto max_tenants e nessuno shard può essere chiuso per fare posto"""
+
+
+class TodoTenantRegistry:
+    """
+    Un gestore dei todo (shard) per tenant, creato alla prima richiesta.
+
+    Ogni shard ha dizionario, indici, contatore degli id, versione, lock e
+    feed delle modifiche propri: contesa e costo delle statistiche dipendono
+    solo dal tenant. Senza tenant si usa il gestore globale, mai rimosso.
+
+    Le richieste prendono uno shard con `acquire` e lo restituiscono con
+    `release`. Con uno storage persistente ("log", "sqlite") gli shard
+    inattivi da più di `idle_seconds` vengono chiusi e, per fare posto a un
+    nuovo tenant oltre `max_tenants`, si chiude il meno usato di recente;
+    i todo vengono ricaricati alla richiesta successiva. Uno shard ancora in
+    uso (richieste in corso o client SSE collegati) non viene mai chiuso.
+    Con lo storage "memory" chiudere uno shard ne cancellerebbe i todo: gli
+    shard restano aperti e, raggiunto `max_tenants`, i nuovi tenant sono
+    rifiutati con TenantCapacityError.
+    La pulizia avviene durante `acquire`, al massimo una volta ogni
+    `sweep_interval` secondi, senza thread dedicati.
+    """
+
+    def __init__(self, default: MCPTodoManager,
+                 factory: Callable[[str], MCPTodoManager] = create_todo_manager,
+                 max_tenants: int = 1000, idle_seconds: float = 1800, sweep_interval: float = 60):
+        self.default = default
+        self.max_tenants = max_tenants
+        self.idle_seconds = idle_seconds
+        self.sweep_interval = sweep_interval
+        self._factory = factory
+        # tenant -> [gestore, ultimo accesso, richieste in corso], dal meno al più recente
+        self._shards: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._next_sweep = time.monotonic() + sweep_interval
+        self.created = 0
+        self.evicted = 0
+
+    def acquire(self, tenant: Optional[str]) -> MCPTodoManager:
+        """
+        Gestore del tenant (il globale se `tenant` è vuoto), in uso fino a
+        `release(tenant)`; ValueError se l'id non è valido,
+        TenantCapacityError se non c'è posto per un nuovo tenant.
+        """
+        if not tenant:
+            return self.default
+        if not _TENANT_RE.match(tenant):
+            raise ValueError(f"Tenant non valido: {tenant}")
+
+        now = time.monotonic()
+        evicted = []
+        try:
+            with self._lock:
+                if now >= self._next_sweep:
+                    self._next_sweep = now + self.sweep_interval
+                    evicted = self._evict_idle(now)
+                shard = self._shards.get(tenant)
+                if shard is not None:
+                    shard[1] = now
+                    self._shards.move_to_end(tenant)
+                else:
+                    evicted += self._evict_over_capacity(self.max_tenants - 1)
+                    if len(self._shards) >= self.max_tenants:
+                        raise TenantCapacityError(f"Raggiunto il limite di {self.max_tenants} tenant attivi")
+                    # Creazione sotto il lock: due richieste concorrenti non aprono due volte lo stesso store
+                    shard = self._shards[tenant] = [self._factory(tenant), now, 0]
+                    self.created += 1
+                shard[2] += 1
+        finally:
+            for manager in evicted:
+                manager.close()
+        return shard[0]
+
+    def release(self, tenant: Optional[str]):
+        """Restituisce uno shard preso con `acquire`"""
+        if not tenant:
+            return
+        with self._lock:
+            # Uno shard in uso non viene chiuso: è ancora quello restituito da acquire
+            self._shards[tenant][2] -= 1
+
+    def _evict_over_capacity(self, limit: int) -> list:
+        evicted = []
+        for tenant in list(self._shards):
+            if len(self._shards) <= limit:
+                break
+            if self._evictable(self._shards[tenant]):
+                evicted.append(self._shards.pop(tenant)[0])
+        self.evicted += len(evicted)
+        return evicted
+
+    def _evict_idle(self, now: float) -> list:
+        evicted = []
+        for tenant, shard in list(self._shards.items()):
+            if now - shard[1] < self.idle_seconds:
+                # Ordine di ultimo accesso: i successivi sono più recenti
+                break
+            if self._evictable(shard):
+                evicted.append(self._shards.pop(tenant)[0])
+        self.evicted += len(evicted)
+        return evicted
+
+    @staticmethod
+    def _evictable(shard: list) -> bool:
+        """
+        Si chiudono solo shard persistenti (in memoria i todo andrebbero persi)
+        senza richieste in corso né client SSE collegati.
+        """
+        manager, _, leases = shard
+        return manager.persistent and leases == 0 and manager.changes.stats()["subscribers"] == 0
+
+    def close(self):
+        """Chiude tutti gli shard (il gestore globale resta a carico del chiamante)"""
+        with self._lock:
+            managers = [shard[0] for shard in self._shards.values()]
+            self._shards.clear()
+        for manager in managers:
+            manager.close()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "tenants": len(self._shards),
+                "max_tenants": self.max_tenants,
+                "idle_seconds": self.idle_seconds,
+                "created": self.created,
+                "evicted": self.evicted,
+            }
+
+
+# Registro globale degli shard per tenant
+todo_registry = TodoTenantRegistry(
+    default=todo_manager,
+    max_tenants=int(os.getenv("TODO_MAX_TENANTS", "1000")),
+    idle_seconds=float(os.getenv("TODO_TENANT_IDLE_SECONDS", "1800")),
+)
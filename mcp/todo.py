@@ -2,10 +2,49 @@
 Modulo MCP per gestire una todo list
 """
 
+import asyncio
+import base64
+import binascii
 import json
-from datetime import datetime
-from typing import Dict, List, Optional
-from pydantic import BaseModel
+import os
+import secrets
+import threading
+from bisect import bisect_right, insort
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+from pydantic import BaseModel, Field
+
+from .delta import ChangeLog, parse_sync_token
+from .events import CREATED, DELETED, UPDATED, ChangeFeed, Subscription
+from .idempotency import IdempotencyCache
+from .records import TodoRecord, now_micros, parse_micros
+from .search import TodoSearchIndex
+from .storage import TodoStorage, create_storage
+
+# Dati di esempio inseriti in uno store nuovo
+SAMPLE_TODOS = (
+    ("Studiare FastMCP", "Imparare come funziona il Model Context Protocol"),
+    ("Creare un progetto di test", "Sviluppare un server MCP funzionante"),
+    ("Scrivere documentazione", "Documentare il progetto per riferimento futuro"),
+)
+
+# Limiti della paginazione
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Numero massimo di elementi in una singola operazione bulk
+MAX_BULK_ITEMS = 10000
+
+# Limiti della ricerca
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+
+# Limiti della sincronizzazione incrementale (todo per risposta)
+DEFAULT_CHANGES_LIMIT = 1000
+MAX_CHANGES_LIMIT = 10000
+
+# Numero di lock per le scritture sui singoli todo
+LOCK_STRIPES = 64
 
 # Modelli Pydantic per la validazione
 class TodoCreate(BaseModel):
@@ -26,100 +65,568 @@ class Todo(BaseModel):
     updated_at: Optional[str] = None
     completed_at: Optional[str] = None
 
+class TodoBulkUpdateItem(TodoUpdate):
+    id: str
+
+class TodoBulkCreate(BaseModel):
+    items: List[TodoCreate] = Field(..., max_length=MAX_BULK_ITEMS)
+
+class TodoBulkUpdate(BaseModel):
+    items: List[TodoBulkUpdateItem] = Field(..., max_length=MAX_BULK_ITEMS)
+
+class TodoBulkDelete(BaseModel):
+    ids: List[str] = Field(..., max_length=MAX_BULK_ITEMS)
+
 class TodoStats(BaseModel):
     total_todos: int
     completed_todos: int
     pending_todos: int
     completion_rate: str
 
+class TodoPage(BaseModel):
+    items: List[Dict]
+    next_cursor: Optional[str] = None
+
+class TodoSearchHit(BaseModel):
+    score: float
+    todo: Todo
+
+class TodoSearchResult(BaseModel):
+    query: str
+    total_matches: int
+    items: List[TodoSearchHit]
+
+class TodoChanges(BaseModel):
+    reset: bool
+    sync_token: str
+    todos: List[Todo]
+    deleted: List[str]
+    has_more: bool
+
+# Campi ammessi nella proiezione `fields=`
+TODO_FIELDS = tuple(Todo.model_fields)
+
+def encode_cursor(todo_id: str) -> str:
+    """Cursore opaco che punta subito dopo il todo indicato"""
+    payload = json.dumps({"after": int(todo_id)}).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> int:
+    """Decodifica un cursore prodotto da `encode_cursor`"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        after = json.loads(base64.urlsafe_b64decode(padded))["after"]
+    except (binascii.Error, ValueError, TypeError, KeyError) as e:
+        raise ValueError(f"Cursore non valido: {cursor}") from e
+    if not isinstance(after, int):
+        raise ValueError(f"Cursore non valido: {cursor}")
+    return after
+
 class MCPTodoManager:
-    """Gestore MCP per la todo list"""
-    
-    def __init__(self):
-        self.todos: Dict[str, Dict] = {}
+    """
+    Gestore MCP per la todo list.
+
+    Oltre al dizionario principale mantiene due indici secondari (todo
+    completati e in sospeso) aggiornati a ogni scrittura: le statistiche
+    costano O(1) e le liste filtrate O(k) invece di una scansione completa.
+    Un elenco ordinato degli id permette la paginazione a cursore. I todo
+    sono TodoRecord compatti; i metodi pubblici restituiscono dizionari.
+
+    Ogni mutazione viene passata allo storage (log append-only con snapshot
+    se configurato); all'avvio lo stato salvato sostituisce i dati di esempio.
+
+    Concorrenza: gli id sono assegnati sotto un lock dedicato; ogni scrittura
+    su un todo prende il lock della sua stripe (hash dell'id), quindi
+    scritture su todo diversi procedono in parallelo e quelle sullo stesso
+    todo arrivano allo storage nell'ordine in cui sono applicate. Bulk,
+    clear_completed e snapshot prendono tutte le stripe. Le letture non usano
+    lock: i record sono sostituiti (copy-on-write), mai modificati sul posto,
+    e i contenitori vengono copiati con un'unica operazione atomica prima di
+    essere scorsi.
+
+    Una versione crescente, incrementata dopo ogni mutazione, identifica lo
+    stato dello store: insieme a un'epoca casuale del processo forma l'ETag
+    delle risorse (una versione uguale dopo un riavvio non collide). Ogni
+    incremento pubblica anche un evento nel feed delle modifiche (SSE) e
+    finisce nel registro ordinato usato dalla sincronizzazione incrementale.
+    """
+
+    # Le operazioni lavorano in memoria: spostarle in un thread costa più di eseguirle
+    blocking_io = False
+
+    def __init__(self, storage: Optional[TodoStorage] = None, sample_data: bool = True):
+        self.todos: Dict[str, TodoRecord] = {}
+        # Indici secondari id -> todo (stessi oggetti del dizionario principale)
+        self._completed_index: Dict[str, TodoRecord] = {}
+        self._pending_index: Dict[str, TodoRecord] = {}
+        # Id in ordine crescente; le cancellazioni sono lazy e compattate a soglia
+        self._order: List[str] = []
+        # Stessa cosa per stato (True completati, False in sospeso): le pagine
+        # filtrate scorrono solo gli id dello stato richiesto
+        self._status_order: Dict[bool, List[str]] = {True: [], False: []}
+        self._dead_in_status_order = {True: 0, False: 0}
+        # Indice full-text su titolo e descrizione
+        self._search_index = TodoSearchIndex()
+        self._dead_in_order = 0
         self.next_id = 1
-        self._initialize_sample_data()
+        self._version = 0
+        self._epoch = secrets.token_hex(4)
+        self.changes = ChangeFeed(self._epoch)
+        # Registro ordinato per versione delle mutazioni, con i tombstone
+        self._change_log = ChangeLog()
+        self._compact_lock = threading.Lock()
+        # Protegge next_id, versione, registro ed elenco ordinato degli id
+        self._order_lock = threading.Lock()
+        self._stripes = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        # Risposte delle creazioni e dei bulk già eseguiti, per i retry con Idempotency-Key
+        self.idempotency = IdempotencyCache()
+        self._storage = storage or TodoStorage()
+        
+        saved = self._storage.load()
+        if saved is None:
+            if sample_data:
+                self._initialize_sample_data()
+        else:
+            self._load_state(*saved)
+    
+    def _load_state(self, todos: Dict[str, Dict], next_id: int):
+        """Ricostruisce dizionario e indici dallo stato salvato"""
+        self.next_id = next_id
+        # Lo stato caricato è la versione 0: un istante precedente richiede un reset
+        self._change_log.started = now_micros()
+        self._order = sorted(todos, key=int)
+        for todo_id in self._order:
+            todo = self.todos[todo_id] = TodoRecord.from_dict(todos.pop(todo_id))
+            self._index_for(todo.completed)[todo_id] = todo
+            self._status_order[bool(todo.completed)].append(todo_id)
+            self._search_index.add(todo_id, todo.title, todo.description)
+    
+    def _stripe(self, todo_id: str) -> threading.Lock:
+        """Lock delle scritture sul todo indicato"""
+        return self._stripes[hash(todo_id) % LOCK_STRIPES]
+    
+    @contextmanager
+    def _exclusive(self) -> Iterator[None]:
+        """Prende tutte le stripe (sempre nello stesso ordine): nessuna scrittura in corso"""
+        for lock in self._stripes:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(self._stripes):
+                lock.release()
+    
+    def _allocate_id(self) -> str:
+        """Assegna il prossimo id in modo atomico"""
+        with self._order_lock:
+            todo_id = self.next_id
+            self.next_id += 1
+        return str(todo_id)
+    
+    def _bump_version(self, event_type: str, todo_id: str, todo: Optional[TodoRecord] = None):
+        """
+        Incrementa la versione e pubblica l'evento della mutazione.
+
+        Da chiamare dopo che la mutazione è visibile ai lettori; il lock
+        garantisce che gli eventi escano in ordine di versione. I record non
+        vengono mai modificati sul posto, quindi l'evento può tenerne il riferimento.
+        La voce del registro è aggiunta prima di rendere visibile la versione:
+        chi legge la versione N trova nel registro tutte le voci fino a N.
+        """
+        with self._order_lock:
+            version = self._version + 1
+            self._change_log.append(version, now_micros(), todo_id)
+            self._version = version
+            self.changes.publish(version, event_type, todo_id, todo)
+        if self._change_log.needs_compaction(len(self.todos)) and self._compact_lock.acquire(blocking=False):
+            try:
+                self._change_log.compact(self.todos.__contains__, self._order_lock)
+            finally:
+                self._compact_lock.release()
+    
+    def subscribe_changes(self, last_event_id: Optional[str] = None,
+                          loop: Optional[asyncio.AbstractEventLoop] = None) -> Subscription:
+        """Iscrive un client al feed delle modifiche (dal loop asyncio, o da un thread indicando `loop`)"""
+        return self.changes.subscribe(last_event_id, loop)
+    
+    def current_version(self) -> int:
+        """Versione dello store, incrementata a ogni mutazione"""
+        return self._version
+    
+    def etag(self) -> str:
+        """ETag dello stato corrente (epoca del processo + versione)"""
+        return f'"{self._epoch}-{self.current_version()}"'
+    
+    def mcp_get_changes_since(self, since: Optional[str] = None, since_time: Optional[str] = None,
+                              limit: int = DEFAULT_CHANGES_LIMIT) -> Dict:
+        """
+        Todo creati, modificati o eliminati dopo un sync_token o un istante (MCP Tool).
+
+        Il costo è proporzionale alle modifiche successive, non allo store.
+        Senza punto di partenza, con un token di un'altra epoca o più vecchio
+        dei tombstone conservati la risposta ha `reset`: il client rilegge la
+        lista completa e riparte dal `sync_token` restituito.
+        """
+        limit = max(1, min(limit, MAX_CHANGES_LIMIT))
+        current = self._version
+        after = self._sync_start(since, since_time)
+        if after is None or after > current or after < self._change_log.horizon:
+            return self._changes_result(current, reset=True)
+
+        changed, last, has_more = self._change_log.since(after, limit)
+        todos, deleted = [], []
+        for todo_id, _ in changed:
+            todo = self.todos.get(todo_id)
+            if todo is None:
+                deleted.append(todo_id)
+            else:
+                todos.append(todo.to_dict())
+        return self._changes_result(last if has_more else max(current, last), todos=todos,
+                                    deleted=deleted, has_more=has_more)
+
+    def _sync_start(self, since: Optional[str], since_time: Optional[str]) -> Optional[int]:
+        """Versione da cui partire; None se serve una risincronizzazione completa"""
+        if since is not None:
+            return parse_sync_token(since, self._epoch)
+        if since_time is not None:
+            return self._change_log.version_at(self._parse_since_time(since_time))
+        return None
+
+    @staticmethod
+    def _parse_since_time(since_time: str) -> int:
+        try:
+            return parse_micros(since_time)
+        except ValueError as e:
+            raise ValueError(f"Istante non valido: {since_time}") from e
+
+    def _changes_result(self, version: int, reset: bool = False, todos: Optional[List[Dict]] = None,
+                        deleted: Optional[List[str]] = None, has_more: bool = False) -> Dict:
+        return {
+            "reset": reset,
+            "sync_token": f"{self._epoch}-{version}",
+            "todos": todos or [],
+            "deleted": deleted or [],
+            "has_more": has_more
+        }
+    
+    def _persist(self, record: Dict) -> bool:
+        """Scrive una mutazione nello storage; True se è il momento di uno snapshot"""
+        return self._storage.append(record)
+    
+    def _persist_batch(self, records: List[Dict]) -> bool:
+        """Scrive più mutazioni come un unico record (applicato per intero al recupero)"""
+        return bool(records) and self._persist({"op": "batch", "records": records})
+    
+    def _snapshot_if_due(self, due: bool):
+        """
+        Avvia lo snapshot dello storage.
+
+        Va chiamato dopo aver rilasciato le stripe: con tutte le stripe prese
+        nessuna mutazione è scritta nel log ma non ancora applicata in memoria.
+        """
+        if not due:
+            return
+        with self._exclusive():
+            states = [todo.state() for todo in self.todos.values()]
+            self._storage.snapshot(self.next_id, map(TodoRecord.dict_from_state, states))
+    
+    @property
+    def persistent(self) -> bool:
+        """True se i todo sopravvivono alla chiusura del gestore"""
+        return self._storage.persistent
+    
+    def close(self):
+        """Chiude lo storage rendendo durevoli le scritture pendenti"""
+        self._storage.close()
     
     def _initialize_sample_data(self):
         """Inizializza con dati di esempio"""
-        self.mcp_create_todo("Studiare FastMCP", "Imparare come funziona il Model Context Protocol")
-        self.mcp_create_todo("Creare un progetto di test", "Sviluppare un server MCP funzionante")
-        self.mcp_create_todo("Scrivere documentazione", "Documentare il progetto per riferimento futuro")
+        for title, description in SAMPLE_TODOS:
+            self.mcp_create_todo(title, description)
     
     def mcp_create_todo(self, title: str, description: str = "") -> Dict:
         """Crea un nuovo todo item (MCP Tool)"""
-        todo_id = str(self.next_id)
-        self.next_id += 1
-        
-        todo = {
-            "id": todo_id,
-            "title": title,
-            "description": description,
-            "completed": False,
-            "created_at": datetime.now().isoformat()
-        }
+        todo_id = self._allocate_id()
+        with self._stripe(todo_id):
+            todo = TodoRecord(todo_id, title, description)
+            due = self._persist({"op": "create", "todo": todo.to_dict()})
+            self._insert(todo)
+        self._snapshot_if_due(due)
+        return todo.to_dict()
+    
+    def _insert(self, todo: TodoRecord):
+        """Inserisce un todo nuovo in dizionario e indici (già persistito)"""
+        todo_id = todo.id
+        title, description = todo.title, todo.description
         
         self.todos[todo_id] = todo
-        return todo
+        self._pending_index[todo_id] = todo
+        with self._order_lock:
+            # Di solito è un append; creazioni concorrenti possono arrivare fuori ordine
+            insort(self._order, todo_id, key=int)
+            insort(self._status_order[False], todo_id, key=int)
+        self._search_index.add(todo_id, title, description)
+        self._bump_version(CREATED, todo_id, todo)
     
     def mcp_get_all_todos(self) -> List[Dict]:
         """Ottiene tutti i todo items (MCP Tool)"""
-        return list(self.todos.values())
+        return [todo.to_dict() for todo in list(self.todos.values())]
+    
+    def mcp_list_todos(self, cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE,
+                       completed: Optional[bool] = None, fields: Optional[List[str]] = None) -> Dict:
+        """
+        Ottiene una pagina di todo ordinata per id (MCP Tool).
+
+        Il cursore codifica l'ultimo id restituito: gli id sono crescenti e mai
+        riutilizzati, quindi inserimenti e cancellazioni non spostano le pagine.
+        Con il filtro si scorre l'elenco dello stato richiesto, quindi il
+        costo resta proporzionale alla pagina anche per lo stato più raro.
+        """
+        after = decode_cursor(cursor) if cursor else 0
+        projection = self._parse_fields(fields)
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        
+        items = []
+        order = self._order if completed is None else self._status_order[bool(completed)]
+        position = bisect_right(order, after, key=int)
+        last_id = None
+        last = after
+        while position < len(order) and len(items) < limit:
+            todo_id = order[position]
+            position += 1
+            # Un inserimento concorrente (o un id tornato allo stesso stato)
+            # può far rivedere un id già restituito
+            if int(todo_id) <= last:
+                continue
+            todo = self.todos.get(todo_id)
+            if todo is None or (completed is not None and todo.completed != completed):
+                continue
+            items.append({field: todo.get(field) for field in projection})
+            last_id = todo.id
+            last = int(todo_id)
+        
+        has_more = len(items) == limit and position < len(order)
+        return {
+            "items": items,
+            "next_cursor": encode_cursor(last_id) if has_more else None
+        }
+    
+    def iter_todo_pages(self, completed: Optional[bool] = None, fields: Optional[List[str]] = None,
+                        page_size: int = MAX_PAGE_SIZE) -> Iterator[List[Dict]]:
+        """
+        Scorre tutti i todo a pagine senza copiare l'intero store (export).
+
+        La proiezione viene validata subito, prima di produrre la prima pagina;
+        ogni pagina riparte dal cursore della precedente, quindi le scritture
+        concorrenti non invalidano l'iterazione.
+        """
+        self._parse_fields(fields)
+        
+        def pages() -> Iterator[List[Dict]]:
+            cursor = None
+            while True:
+                page = self.mcp_list_todos(cursor=cursor, limit=page_size, completed=completed, fields=fields)
+                if page["items"]:
+                    yield page["items"]
+                cursor = page["next_cursor"]
+                if cursor is None:
+                    return
+        
+        return pages()
     
     def mcp_get_todo_by_id(self, todo_id: str) -> Optional[Dict]:
         """Ottiene un todo specifico per ID (MCP Tool)"""
-        return self.todos.get(todo_id)
+        todo = self.todos.get(todo_id)
+        return todo.to_dict() if todo is not None else None
     
     def mcp_update_todo(self, todo_id: str, updates: Dict) -> Optional[Dict]:
         """Aggiorna un todo esistente (MCP Tool)"""
-        if todo_id not in self.todos:
-            return None
-        
-        todo = self.todos[todo_id]
+        with self._stripe(todo_id):
+            current = self.todos.get(todo_id)
+            if current is None:
+                return None
+            todo = self._updated(current, updates)
+            due = self._persist({"op": "update", "todo": todo.to_dict()})
+            self._replace(current, todo)
+        self._snapshot_if_due(due)
+        return todo.to_dict()
+    
+    @staticmethod
+    def _updated(current: TodoRecord, updates: Dict) -> TodoRecord:
+        """
+        Copia del todo con le modifiche applicate (senza toccare lo store).
+
+        Il record viene copiato e poi sostituito da `_replace`: chi lo sta
+        leggendo vede la versione precedente o quella nuova, mai una via di mezzo.
+        """
+        todo = current.copy()
         
         if "title" in updates and updates["title"] is not None:
-            todo["title"] = updates["title"]
+            todo.title = updates["title"]
         if "description" in updates and updates["description"] is not None:
-            todo["description"] = updates["description"]
+            todo.description = updates["description"]
         if "completed" in updates and updates["completed"] is not None:
-            todo["completed"] = updates["completed"]
+            todo.completed = updates["completed"]
             if updates["completed"]:
-                todo["completed_at"] = datetime.now().isoformat()
-        
-        todo["updated_at"] = datetime.now().isoformat()
+                todo.completed_at = now_micros()
+        todo.updated_at = now_micros()
         return todo
     
+    def _replace(self, current: TodoRecord, todo: TodoRecord):
+        """Sostituisce `current` con la sua versione modificata in dizionario e indici (già persistita)"""
+        todo_id = todo.id
+        self.todos[todo_id] = todo
+        self._index_for(todo.completed)[todo_id] = todo
+        if bool(todo.completed) != bool(current.completed):
+            self._index_for(current.completed).pop(todo_id, None)
+            with self._order_lock:
+                insort(self._status_order[bool(todo.completed)], todo_id, key=int)
+                self._forget_status_order(current.completed, 1)
+        
+        if todo.title != current.title or todo.description != current.description:
+            self._search_index.add(todo_id, todo.title, todo.description)
+        self._bump_version(UPDATED, todo_id, todo)
+    
     def mcp_delete_todo(self, todo_id: str) -> Optional[Dict]:
         """Elimina un todo (MCP Tool)"""
-        if todo_id not in self.todos:
+        with self._stripe(todo_id):
+            if todo_id not in self.todos:
+                return None
+            due = self._persist({"op": "delete", "ids": [todo_id]})
+            todo = self._delete(todo_id)
+        self._snapshot_if_due(due)
+        return todo.to_dict()
+    
+    def _delete(self, todo_id: str) -> Optional[TodoRecord]:
+        """Rimuove un todo da dizionario e indici (già persistito)"""
+        todo = self.todos.pop(todo_id, None)
+        if todo is None:
             return None
-        return self.todos.pop(todo_id)
+        self._index_for(todo.completed).pop(todo_id, None)
+        self._search_index.remove(todo_id)
+        self._forget_order(1, todo.completed)
+        self._bump_version(DELETED, todo_id)
+        return todo
+    
+    # Le operazioni bulk preparano tutti i record, li scrivono nel log come un
+    # unico record e solo dopo li applicano in memoria: se la scrittura fallisce
+    # lo store resta com'era, senza operazioni applicate a metà.
+    
+    def mcp_bulk_create_todos(self, items: List[Dict]) -> Dict:
+        """Crea più todo in un'unica operazione atomica (MCP Tool)"""
+        with self._exclusive():
+            todos = [
+                TodoRecord(self._allocate_id(), item["title"], item.get("description", ""))
+                for item in items
+            ]
+            due = self._persist_batch([{"op": "create", "todo": todo.to_dict()} for todo in todos])
+            for todo in todos:
+                self._insert(todo)
+        self._snapshot_if_due(due)
+        return self._bulk_result([{"id": todo.id, "ok": True, "todo": todo.to_dict()} for todo in todos])
+    
+    def mcp_bulk_update_todos(self, items: List[Dict]) -> Dict:
+        """Aggiorna più todo in un'unica operazione atomica (MCP Tool)"""
+        results = []
+        steps = []
+        with self._exclusive():
+            # Stato dopo le modifiche già preparate: più voci sullo stesso id si sommano
+            planned: Dict[str, TodoRecord] = {}
+            for item in items:
+                current = planned.get(item["id"]) or self.todos.get(item["id"])
+                if current is None:
+                    results.append({"id": item["id"], "ok": False, "error": "Todo non trovato"})
+                    continue
+                updates = {key: value for key, value in item.items() if key != "id"}
+                todo = planned[item["id"]] = self._updated(current, updates)
+                steps.append((current, todo))
+                results.append({"id": item["id"], "ok": True, "todo": todo.to_dict()})
+            due = self._persist_batch([{"op": "update", "todo": todo.to_dict()} for _, todo in steps])
+            for current, todo in steps:
+                self._replace(current, todo)
+        self._snapshot_if_due(due)
+        return self._bulk_result(results)
+    
+    def mcp_bulk_delete_todos(self, todo_ids: List[str]) -> Dict:
+        """Elimina più todo in un'unica operazione atomica (MCP Tool)"""
+        results = []
+        # Insieme ordinato degli id da eliminare
+        deleted_ids: Dict[str, None] = {}
+        due = False
+        with self._exclusive():
+            for todo_id in todo_ids:
+                todo = self.todos.get(todo_id)
+                if todo is None or todo_id in deleted_ids:
+                    results.append({"id": todo_id, "ok": False, "error": "Todo non trovato"})
+                else:
+                    results.append({"id": todo_id, "ok": True, "todo": todo.to_dict()})
+                    deleted_ids[todo_id] = None
+            if deleted_ids:
+                due = self._persist({"op": "delete", "ids": list(deleted_ids)})
+            for todo_id in deleted_ids:
+                self._delete(todo_id)
+        self._snapshot_if_due(due)
+        return self._bulk_result(results)
+    
+    def _bulk_result(self, results: List[Dict]) -> Dict:
+        """Esito di un'operazione bulk con i risultati per elemento"""
+        succeeded = sum(1 for result in results if result["ok"])
+        return {"results": results, "succeeded": succeeded, "failed": len(results) - succeeded}
+    
+    def mcp_search_todos(self, query: str, limit: int = DEFAULT_SEARCH_LIMIT,
+                         completed: Optional[bool] = None, prefix: bool = True) -> Dict:
+        """
+        Cerca i todo per titolo e descrizione (MCP Tool).
+
+        Tutti i termini devono comparire (come prefisso se `prefix`); i
+        risultati sono ordinati per rilevanza, i termini del titolo pesano di più.
+        """
+        limit = max(1, min(limit, MAX_SEARCH_LIMIT))
+        candidates = None if completed is None else self._index_for(completed)
+        best, total = self._search_index.search(query, limit=limit, prefix=prefix, candidates=candidates)
+        return {
+            "query": query,
+            "total_matches": total,
+            "items": [
+                {"score": round(score, 4), "todo": todo.to_dict()}
+                for todo_id, score in best
+                # Un todo eliminato durante la ricerca viene saltato
+                if (todo := self.todos.get(todo_id)) is not None
+            ]
+        }
     
     def mcp_get_completed_todos(self) -> List[Dict]:
         """Ottiene tutti i todo completati (MCP Tool)"""
-        return [todo for todo in self.todos.values() if todo["completed"]]
+        return [todo.to_dict() for todo in list(self._completed_index.values())]
     
     def mcp_get_pending_todos(self) -> List[Dict]:
         """Ottiene tutti i todo in sospeso (MCP Tool)"""
-        return [todo for todo in self.todos.values() if not todo["completed"]]
+        return [todo.to_dict() for todo in list(self._pending_index.values())]
     
     def mcp_clear_completed_todos(self) -> Dict:
         """Elimina tutti i todo completati (MCP Tool)"""
-        completed_ids = [todo_id for todo_id, todo in self.todos.items() if todo["completed"]]
-        
-        if not completed_ids:
-            return {"message": "Nessun todo completato da eliminare", "deleted_count": 0}
-        
-        for todo_id in completed_ids:
-            self.todos.pop(todo_id)
+        with self._exclusive():
+            completed_ids = list(self._completed_index)
+            
+            if not completed_ids:
+                return {"message": "Nessun todo completato da eliminare", "deleted_count": 0}
+            
+            due = self._persist({"op": "delete", "ids": completed_ids})
+            for todo_id in completed_ids:
+                self.todos.pop(todo_id)
+                self._completed_index.pop(todo_id)
+                self._search_index.remove(todo_id)
+                self._bump_version(DELETED, todo_id)
+            self._forget_order(len(completed_ids), True)
+        self._snapshot_if_due(due)
         
         return {"message": f"Eliminati {len(completed_ids)} todo completati", "deleted_count": len(completed_ids)}
     
     def mcp_get_stats(self) -> Dict:
-        """Calcola statistiche sui todo (MCP Resource)"""
+        """Calcola statistiche sui todo (MCP Resource), in O(1) grazie agli indici"""
         total = len(self.todos)
-        completed = sum(1 for todo in self.todos.values() if todo["completed"])
-        pending = total - completed
+        completed = len(self._completed_index)
+        pending = len(self._pending_index)
         
         return {
             "total_todos": total,
@@ -128,81 +635,74 @@ class MCPTodoManager:
             "completion_rate": f"{(completed / total * 100):.1f}%" if total > 0 else "0%"
         }
     
-    def get_mcp_tools(self) -> Dict:
-        """Restituisce la lista degli strumenti MCP disponibili"""
-        return {
-            "tools": [
-                {
-                    "name": "create_todo",
-                    "description": "Crea un nuovo todo item",
-                    "parameters": {
-                        "title": {"type": "string", "description": "Titolo del todo"},
-                        "description": {"type": "string", "description": "Descrizione del todo", "optional": True}
-                    }
-                },
-                {
-                    "name": "get_all_todos",
-                    "description": "Ottiene tutti i todo items",
-                    "parameters": {}
-                },
-                {
-                    "name": "get_todo_by_id",
-                    "description": "Ottiene un todo specifico",
-                    "parameters": {
-                        "todo_id": {"type": "string", "description": "ID del todo"}
-                    }
-                },
-                {
-                    "name": "update_todo",
-                    "description": "Aggiorna un todo esistente",
-                    "parameters": {
-                        "todo_id": {"type": "string", "description": "ID del todo"},
-                        "title": {"type": "string", "description": "Nuovo titolo", "optional": True},
-                        "description": {"type": "string", "description": "Nuova descrizione", "optional": True},
-                        "completed": {"type": "boolean", "description": "Stato completamento", "optional": True}
-                    }
-                },
-                {
-                    "name": "delete_todo",
-                    "description": "Elimina un todo",
-                    "parameters": {
-                        "todo_id": {"type": "string", "description": "ID del todo"}
-                    }
-                },
-                {
-                    "name": "get_completed_todos",
-                    "description": "Ottiene i todo completati",
-                    "parameters": {}
-                },
-                {
-                    "name": "get_pending_todos",
-                    "description": "Ottiene i todo in sospeso",
-                    "parameters": {}
-                },
-                {
-                    "name": "clear_completed_todos",
-                    "description": "Elimina tutti i todo completati",
-                    "parameters": {}
-                }
-            ]
-        }
+    def _parse_fields(self, fields: Optional[List[str]]) -> List[str]:
+        """Valida la proiezione richiesta (nessun campo = tutti i campi di Todo)"""
+        if not fields:
+            return list(TODO_FIELDS)
+        unknown = [field for field in fields if field not in TODO_FIELDS]
+        if unknown:
+            raise ValueError(f"Campi non validi: {', '.join(unknown)}")
+        return list(dict.fromkeys(fields))
     
-    def get_mcp_resources(self) -> Dict:
-        """Restituisce la lista delle risorse MCP disponibili"""
-        return {
-            "resources": [
-                {
-                    "uri": "todo://stats",
-                    "description": "Statistiche sui todo",
-                    "mimeType": "application/json"
-                },
-                {
-                    "uri": "todo://list",
-                    "description": "Lista completa dei todo",
-                    "mimeType": "application/json"
-                }
+    def _forget_order(self, count: int, completed: bool):
+        """Conta gli id cancellati e compatta l'elenco ordinato quando sono troppi"""
+        with self._order_lock:
+            self._dead_in_order += count
+            if self._dead_in_order > 1024 and self._dead_in_order * 2 > len(self._order):
+                # Nuova lista: le letture in corso continuano su quella vecchia
+                self._order = [todo_id for todo_id in self._order if todo_id in self.todos]
+                self._dead_in_order = 0
+            self._forget_status_order(completed, count)
+    
+    def _forget_status_order(self, completed: bool, count: int):
+        """Come _forget_order per l'elenco di uno stato (con _order_lock già preso)"""
+        completed = bool(completed)
+        self._dead_in_status_order[completed] += count
+        dead = self._dead_in_status_order[completed]
+        order = self._status_order[completed]
+        if dead > 1024 and dead * 2 > len(order):
+            # Toglie anche i duplicati lasciati dagli id tornati allo stesso stato
+            self._status_order[completed] = [
+                todo_id for todo_id in dict.fromkeys(order)
+                if todo_id in self.todos and bool(self.todos[todo_id].completed) == completed
             ]
-        }
+            self._dead_in_status_order[completed] = 0
+    
+    def _index_for(self, completed: bool) -> Dict[str, TodoRecord]:
+        """Indice secondario corrispondente allo stato di completamento"""
+        return self._completed_index if completed else self._pending_index
+
+def create_todo_manager(tenant: Optional[str] = None) -> MCPTodoManager:
+    """
+    Costruisce il gestore indicato da TODO_STORAGE:
+    "memory" (default), "log" (log append-only, un processo) oppure
+    "sqlite" (database condiviso da tutti i worker).
+
+    Con `tenant` i dati stanno in un file o una directory separati sotto
+    tenants/ e lo store parte vuoto, senza dati di esempio.
+    """
+    backend = os.getenv("TODO_STORAGE", "memory")
+    data_dir = os.getenv("TODO_DATA_DIR", "data")
+    if backend == "sqlite":
+        from .sqlite_store import SQLiteTodoManager
+        path = os.getenv("TODO_SQLITE_PATH", os.path.join(data_dir, "todos.db"))
+        if tenant is not None:
+            path = os.path.join(os.path.dirname(path), "tenants", f"{tenant}.db")
+        return SQLiteTodoManager(
+            path=path,
+            pool_size=int(os.getenv("TODO_SQLITE_POOL_SIZE", "4")),
+            sample_data=tenant is None,
+        )
+    if tenant is not None:
+        data_dir = os.path.join(data_dir, "tenants", tenant)
+    storage = create_storage(
+        backend=backend,
+        directory=data_dir,
+        fsync_policy=os.getenv("TODO_FSYNC", "batch"),
+        fsync_interval=float(os.getenv("TODO_FSYNC_INTERVAL_MS", "50")) / 1000,
+        snapshot_every=int(os.getenv("TODO_SNAPSHOT_EVERY", "10000")),
+    )
+    return MCPTodoManager(storage=storage, sample_data=tenant is None)
 
-# Istanza globale del gestore
-todo_manager = MCPTodoManager()
+# Istanza globale del gestore (backend scelto da variabili d'ambiente)
+todo_manager = create_todo_manager()
@@ -5,6 +5,8 @@ Modulo per la gestione del sampling MCP
 from typing import List, Dict
 from pydantic import BaseModel
 
+from mcp.registry import capabilities
+
 class CodeReviewRequest(BaseModel):
     """Modello per la richiesta di revisione del codice"""
     code: str
@@ -31,3 +33,15 @@ async def request_sampling(request: SamplingRequest) -> Dict:
         "role": "assistant",
         "content": "Analisi dei dati forniti completata. Ecco i risultati..."
     }
+
+# === CAPACITÀ MCP ===
+# Le route REST /mcp/prompts/code_review e /mcp/sampling/request_sampling sono collegate in main.py
+
+async def _code_review_prompt(code: str, language: str) -> List[Dict]:
+    return await code_review(CodeReviewRequest(code=code, language=language))
+
+capabilities.prompt("code_review", "Revisione del codice sorgente", [
+    {"name": "code", "description": "Codice da revisionare", "required": True},
+    {"name": "language", "description": "Linguaggio del codice", "required": True}
+], handler=_code_review_prompt)
+capabilities.sampling("request_sampling", "Richiesta di sampling al modello del client")
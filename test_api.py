@@ -120,8 +120,39 @@ def test_api():
     
     print()
     
-    # Test 8: Elimina il todo di test
-    print("8. Test eliminazione todo...")
+    # Test 8: Paginazione a cursore con proiezione dei campi
+    print("8. Test paginazione todo...")
+    params = {"limit": 2, "fields": "id,title"}
+    seen = 0
+    while True:
+        response = requests.get(f"{BASE_URL}/mcp/tools/get_all_todos", params=params)
+        if response.status_code != 200:
+            print(f"❌ Errore: {response.status_code}")
+            break
+        page = response.json()
+        seen += len(page["items"])
+        if not page["next_cursor"]:
+            print(f"✅ Letti {seen} todo a pagine da {params['limit']}")
+            break
+        params["cursor"] = page["next_cursor"]
+    
+    print()
+    
+    # Test 9: GET condizionale con ETag
+    print("9. Test ETag su todo_list...")
+    response = requests.get(f"{BASE_URL}/mcp/resources/todo_list")
+    etag = response.headers.get("ETag")
+    response = requests.get(f"{BASE_URL}/mcp/resources/todo_list", headers={"If-None-Match": etag or ""})
+    if response.status_code == 304:
+        print(f"✅ Nessuna modifica dalla versione {etag}: 304 Not Modified")
+    else:
+        print(f"❌ Atteso 304, ricevuto {response.status_code}")
+    
+    print()
+    
+    # Test 10: Elimina il todo di test
+    print("10. Test eliminazione todo...")
+    sync_token = requests.get(f"{BASE_URL}/mcp/tools/get_changes_since").json()["sync_token"]
     response = requests.post(f"{BASE_URL}/mcp/tools/delete_todo?todo_id={todo_id}")
     if response.status_code == 200:
         result = response.json()
@@ -129,6 +160,16 @@ def test_api():
     else:
         print(f"❌ Errore nell'eliminazione: {response.status_code}")
     
+    print()
+    
+    # Test 11: Sincronizzazione incrementale
+    print("11. Test modifiche dalla versione precedente...")
+    response = requests.get(f"{BASE_URL}/mcp/tools/get_changes_since", params={"since": sync_token})
+    if response.status_code == 200 and todo_id in response.json()["deleted"]:
+        print(f"✅ Eliminazione del todo {todo_id} ricevuta come tombstone")
+    else:
+        print(f"❌ Errore: {response.status_code}")
+    
     print()
     print("=== TEST COMPLETATO ===")
 
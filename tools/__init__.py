@@ -2,4 +2,9 @@
 Modulo per i tool MCP
 """
 
-from .weather import get_weather, get_weather_dynamic
+from .weather import (
+    get_weather, get_weather_dynamic, get_weather_batch, WeatherBatchRequest,
+    weather_client, WeatherClient,
+    weather_cache, get_weather_cache_stats, get_weather_flight_stats,
+    get_weather_upstream_stats, normalize_location
+)
@@ -0,0 +1,106 @@
+"""
+Cache in memoria con TTL, limite LRU e stale-while-revalidate
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+# Stati restituiti da TTLCache.lookup
+FRESH = "fresh"
+STALE = "stale"
+MISS = "miss"
+
+
+class TTLCache:
+    """
+    Cache LRU limitata con scadenza per voce.
+
+    Dopo il TTL una voce resta servibile come "stale" per altri
+    `max_stale` secondi, durante i quali un solo chiamante alla volta
+    può ottenere il permesso di aggiornarla (vedi `begin_refresh`).
+    """
+
+    def __init__(self, ttl: float, max_entries: int, max_stale: float = 0.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._refreshing = set()
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, key: Hashable) -> Tuple[Optional[Any], str]:
+        """Restituisce (valore, stato) aggiornando i contatori"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None, MISS
+
+        value, stored_at = entry
+        age = self._clock() - stored_at
+        if age <= self.ttl:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value, FRESH
+        if age <= self.ttl + self.max_stale:
+            self._entries.move_to_end(key)
+            self.stale_hits += 1
+            return value, STALE
+
+        # Troppo vecchia anche per lo stale-while-revalidate: resta solo
+        # come ultimo valore noto (vedi `peek`) finché non viene espulsa
+        self.misses += 1
+        return None, MISS
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """Restituisce l'ultimo valore noto, anche scaduto, senza toccare i contatori"""
+        entry = self._entries.get(key)
+        return entry[0] if entry is not None else None
+
+    def set(self, key: Hashable, value: Any):
+        """Inserisce o aggiorna una voce, espellendo le meno recenti oltre il limite"""
+        self._entries[key] = (value, self._clock())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def begin_refresh(self, key: Hashable) -> bool:
+        """True se il chiamante deve eseguire l'aggiornamento in background"""
+        if key in self._refreshing:
+            return False
+        self._refreshing.add(key)
+        return True
+
+    def end_refresh(self, key: Hashable):
+        """Segna come concluso l'aggiornamento di una voce"""
+        self._refreshing.discard(key)
+
+    def clear(self):
+        """Svuota la cache senza azzerare i contatori"""
+        self._entries.clear()
+        self._refreshing.clear()
+
+    def stats(self) -> Dict:
+        """Contatori per la diagnostica"""
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "max_stale_seconds": self.max_stale,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "refreshing": len(self._refreshing),
+            "hit_rate": f"{((self.hits + self.stale_hits) / lookups * 100):.1f}%" if lookups > 0 else "0%"
+        }
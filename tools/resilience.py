@@ -0,0 +1,167 @@
+"""
+Circuit breaker e token bucket per le chiamate upstream
+"""
+
+import time
+from typing import Callable, Dict, Optional
+
+# Stati del circuit breaker
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class UpstreamUnavailableError(Exception):
+    """Chiamata upstream rifiutata localmente (circuito aperto o budget esaurito)"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker a conteggio di fallimenti consecutivi.
+
+    Una chiamata conta come fallita se solleva un errore o se supera
+    `slow_call_threshold` secondi. Raggiunta la soglia il circuito si apre
+    per `reset_timeout` secondi; poi lascia passare una sola chiamata di prova
+    (half-open) che decide se richiuderlo o riaprirlo.
+
+    Ogni cambio di stato incrementa `generation`: `allow_request` restituisce
+    la generazione della chiamata autorizzata e l'esito va registrato con
+    quella. Gli esiti di chiamate partite in una generazione precedente (es.
+    un successo lento iniziato prima dell'apertura) contano nelle statistiche
+    ma non cambiano lo stato: solo la chiamata di prova chiude il circuito.
+    """
+
+    def __init__(self, failure_threshold: int, slow_call_threshold: float, reset_timeout: float,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.slow_call_threshold = slow_call_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.generation = 0
+        self._probe_in_flight = False
+        self.total_failures = 0
+        self.slow_calls = 0
+        self.rejected_calls = 0
+        self.times_opened = 0
+
+    def retry_after(self) -> float:
+        """Secondi mancanti alla prossima chiamata di prova"""
+        if self.state != OPEN or self.opened_at is None:
+            return 0.0
+        return max(0.0, self.opened_at + self.reset_timeout - self._clock())
+
+    def _transition(self, state: str):
+        self.state = state
+        self.generation += 1
+        self._probe_in_flight = False
+
+    def allow_request(self) -> Optional[int]:
+        """Generazione della chiamata se può andare upstream, altrimenti None"""
+        if self.state == OPEN:
+            if self.retry_after() > 0:
+                self.rejected_calls += 1
+                return None
+            self._transition(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            if self._probe_in_flight:
+                self.rejected_calls += 1
+                return None
+            self._probe_in_flight = True
+        return self.generation
+
+    def release_probe(self, generation: int):
+        """Libera lo slot di prova se la chiamata autorizzata non è partita o non ha un esito"""
+        if generation == self.generation:
+            self._probe_in_flight = False
+
+    def record_success(self, duration: float, generation: int):
+        """Registra l'esito di una chiamata completata"""
+        if duration > self.slow_call_threshold:
+            self.slow_calls += 1
+            self.record_failure(generation)
+            return
+        if generation != self.generation:
+            return
+        self.consecutive_failures = 0
+        if self.state != CLOSED:
+            self._transition(CLOSED)
+            self.opened_at = None
+
+    def record_failure(self, generation: int):
+        """Registra una chiamata fallita o troppo lenta"""
+        self.total_failures += 1
+        if generation != self.generation:
+            return
+        self._probe_in_flight = False
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self.times_opened += 1
+            self._transition(OPEN)
+            self.opened_at = self._clock()
+
+    def stats(self) -> Dict:
+        """Stato del circuito per la diagnostica"""
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "slow_call_threshold_seconds": self.slow_call_threshold,
+            "reset_timeout_seconds": self.reset_timeout,
+            "retry_after_seconds": round(self.retry_after(), 3),
+            "total_failures": self.total_failures,
+            "slow_calls": self.slow_calls,
+            "rejected_calls": self.rejected_calls,
+            "times_opened": self.times_opened
+        }
+
+
+class TokenBucket:
+    """Limite di chiamate al minuto con burst pari alla capacità"""
+
+    def __init__(self, per_minute: int, clock: Callable[[], float] = time.monotonic):
+        self.capacity = float(per_minute)
+        self.refill_rate = per_minute / 60.0
+        self._clock = clock
+        self.tokens = self.capacity
+        self._updated_at = clock()
+        self.granted = 0
+        self.throttled = 0
+
+    def _refill(self):
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated_at) * self.refill_rate)
+        self._updated_at = now
+
+    def try_acquire(self) -> bool:
+        """Consuma un token se disponibile, senza attendere"""
+        self._refill()
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            self.granted += 1
+            return True
+        self.throttled += 1
+        return False
+
+    def retry_after(self) -> float:
+        """Secondi mancanti al prossimo token"""
+        self._refill()
+        if self.tokens >= 1.0 or self.refill_rate <= 0:
+            return 0.0
+        return (1.0 - self.tokens) / self.refill_rate
+
+    def stats(self) -> Dict:
+        """Stato del budget per la diagnostica"""
+        self._refill()
+        return {
+            "per_minute": int(self.capacity),
+            "available_tokens": round(self.tokens, 2),
+            "granted": self.granted,
+            "throttled": self.throttled
+        }
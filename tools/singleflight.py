@@ -0,0 +1,50 @@
+"""
+Coalescenza delle richieste concorrenti identiche (single-flight)
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    Esegue al massimo una chiamata in volo per chiave.
+
+    Il primo chiamante avvia la chiamata in un task; i chiamanti concorrenti
+    con la stessa chiave attendono lo stesso task. Il risultato, o l'errore,
+    arriva a tutti e la chiave viene liberata appena il task termina, quindi
+    gli errori non restano memorizzati.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Esegue `fn` oppure si aggancia alla chiamata già in corso per `key`"""
+        task = self._inflight.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._forget(key, task))
+        else:
+            self.coalesced += 1
+        # shield: la cancellazione di un chiamante non interrompe gli altri
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Segna l'eccezione come letta anche se tutti i chiamanti sono stati cancellati
+            task.exception()
+
+    def stats(self) -> Dict:
+        """Contatori per la diagnostica"""
+        return {
+            "in_flight": len(self._inflight),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced
+        }
@@ -2,9 +2,244 @@
 Modulo per i tool meteo MCP
 """
 
-import requests
+import asyncio
+import functools
+import logging
+import os
+import re
+import time
+from typing import Callable, Dict, List, Optional
+
+import httpx
 from fastapi import HTTPException
-from typing import Dict
+from pydantic import BaseModel
+
+from mcp.registry import capabilities
+from mcp.server import ToolError
+from .cache import TTLCache, FRESH, STALE
+from .resilience import CircuitBreaker, TokenBucket, UpstreamUnavailableError
+from .singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Configurazione del client OpenWeatherMap (sovrascrivibile da variabili d'ambiente)
+OPENWEATHER_URL = os.getenv("OPENWEATHER_URL", "http://api.openweathermap.org/data/2.5/weather")
+OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY", "065b58bec3b0400f679e81d85fe35378")
+WEATHER_HTTP_TIMEOUT = float(os.getenv("WEATHER_HTTP_TIMEOUT", "5.0"))
+WEATHER_HTTP_CONNECT_TIMEOUT = float(os.getenv("WEATHER_HTTP_CONNECT_TIMEOUT", "2.0"))
+WEATHER_HTTP_MAX_CONNECTIONS = int(os.getenv("WEATHER_HTTP_MAX_CONNECTIONS", "100"))
+WEATHER_HTTP_MAX_KEEPALIVE = int(os.getenv("WEATHER_HTTP_MAX_KEEPALIVE", "20"))
+WEATHER_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("WEATHER_HTTP_KEEPALIVE_EXPIRY", "30.0"))
+
+# Configurazione della cache meteo
+WEATHER_CACHE_TTL = float(os.getenv("WEATHER_CACHE_TTL", "300"))
+WEATHER_CACHE_MAX_STALE = float(os.getenv("WEATHER_CACHE_MAX_STALE", "600"))
+WEATHER_CACHE_MAX_ENTRIES = int(os.getenv("WEATHER_CACHE_MAX_ENTRIES", "1024"))
+
+# Circuit breaker e budget di chiamate upstream
+WEATHER_BREAKER_FAILURE_THRESHOLD = int(os.getenv("WEATHER_BREAKER_FAILURE_THRESHOLD", "5"))
+WEATHER_BREAKER_SLOW_CALL_SECONDS = float(os.getenv("WEATHER_BREAKER_SLOW_CALL_SECONDS", "2.0"))
+WEATHER_BREAKER_RESET_TIMEOUT = float(os.getenv("WEATHER_BREAKER_RESET_TIMEOUT", "30"))
+WEATHER_RATE_LIMIT_PER_MINUTE = int(os.getenv("WEATHER_RATE_LIMIT_PER_MINUTE", "60"))
+
+# Limiti del tool batch
+WEATHER_BATCH_MAX_LOCATIONS = int(os.getenv("WEATHER_BATCH_MAX_LOCATIONS", "100"))
+WEATHER_BATCH_CONCURRENCY = int(os.getenv("WEATHER_BATCH_CONCURRENCY", "10"))
+
+
+class WeatherBatchRequest(BaseModel):
+    """Modello per la richiesta meteo su più località"""
+    locations: List[str]
+
+
+class WeatherClient:
+    """
+    Client HTTP asincrono condiviso per OpenWeatherMap.
+
+    Mantiene un pool di connessioni keep-alive riutilizzate da tutte le
+    richieste del processo; viene aperto e chiuso dal lifespan dell'app.
+    """
+
+    def __init__(
+        self,
+        url: str = OPENWEATHER_URL,
+        api_key: str = OPENWEATHER_API_KEY,
+        timeout: float = WEATHER_HTTP_TIMEOUT,
+        connect_timeout: float = WEATHER_HTTP_CONNECT_TIMEOUT,
+        max_connections: int = WEATHER_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections: int = WEATHER_HTTP_MAX_KEEPALIVE,
+        keepalive_expiry: float = WEATHER_HTTP_KEEPALIVE_EXPIRY,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.url = url
+        self.api_key = api_key
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def start(self):
+        """Apre il pool di connessioni (idempotente)"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=self.limits,
+                transport=self.transport,
+            )
+
+    async def close(self):
+        """Chiude il pool di connessioni"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def fetch(self, location: str) -> Dict:
+        """Esegue la chiamata upstream e normalizza la risposta"""
+        if self._client is None:
+            # Uso fuori dal lifespan dell'app (script, benchmark)
+            await self.start()
+
+        response = await self._client.get(
+            self.url,
+            params={"q": location, "appid": self.api_key, "units": "metric"},
+        )
+        response.raise_for_status()
+
+        data = response.json()
+        return {
+            "temperature": data["main"]["temp"],
+            "conditions": data["weather"][0]["description"],
+            "humidity": data["main"]["humidity"],
+            "location": location
+        }
+
+
+def normalize_location(location: str) -> str:
+    """
+    Chiave di cache per una località: minuscolo, spazi compattati e
+    suffisso del paese uniformato ("  Rome , IT" -> "rome,it").
+    """
+    parts = [re.sub(r"\s+", " ", part).strip().lower() for part in location.split(",")]
+    return ",".join(part for part in parts if part)
+
+
+def _is_upstream_failure(error: httpx.HTTPError) -> bool:
+    """Errori che indicano un upstream in difficoltà (non una località sbagliata)"""
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status >= 500 or status == 429
+    return True
+
+
+# Istanze globali del client, della cache e delle protezioni upstream
+weather_client = WeatherClient()
+weather_cache = TTLCache(
+    ttl=WEATHER_CACHE_TTL,
+    max_entries=WEATHER_CACHE_MAX_ENTRIES,
+    max_stale=WEATHER_CACHE_MAX_STALE,
+)
+weather_flights = SingleFlight()
+weather_breaker = CircuitBreaker(
+    failure_threshold=WEATHER_BREAKER_FAILURE_THRESHOLD,
+    slow_call_threshold=WEATHER_BREAKER_SLOW_CALL_SECONDS,
+    reset_timeout=WEATHER_BREAKER_RESET_TIMEOUT,
+)
+weather_rate_limiter = TokenBucket(per_minute=WEATHER_RATE_LIMIT_PER_MINUTE)
+
+# Riferimenti ai refresh in background (evita che vengano raccolti dal GC)
+_background_refreshes = set()
+
+
+async def _fetch_and_store(key: str, location: str) -> Dict:
+    """
+    Recupera il meteo da upstream e aggiorna la cache.
+
+    Le chiamate concorrenti per la stessa chiave condividono un'unica
+    richiesta upstream; gli errori arrivano a tutti e non vengono messi in cache.
+    Con il circuito aperto o il budget esaurito solleva UpstreamUnavailableError
+    senza contattare OpenWeatherMap.
+    """
+    async def fetch() -> Dict:
+        generation = weather_breaker.allow_request()
+        if generation is None:
+            raise UpstreamUnavailableError("Circuito meteo aperto", weather_breaker.retry_after())
+        if not weather_rate_limiter.try_acquire():
+            # La chiamata non parte: libera l'eventuale slot di prova half-open
+            weather_breaker.release_probe(generation)
+            raise UpstreamUnavailableError("Budget di chiamate meteo esaurito", weather_rate_limiter.retry_after())
+
+        started = time.monotonic()
+        try:
+            data = await weather_client.fetch(location)
+        except httpx.HTTPError as e:
+            if _is_upstream_failure(e):
+                weather_breaker.record_failure(generation)
+            else:
+                weather_breaker.record_success(time.monotonic() - started, generation)
+            raise
+        except Exception:
+            # Risposta malformata (KeyError/ValueError): l'upstream non funziona
+            weather_breaker.record_failure(generation)
+            raise
+        except BaseException:
+            # Cancellazione: nessun esito, ma lo slot di prova va liberato
+            weather_breaker.release_probe(generation)
+            raise
+        weather_breaker.record_success(time.monotonic() - started, generation)
+        weather_cache.set(key, data)
+        return data
+
+    return await weather_flights.do(key, fetch)
+
+
+async def _refresh_in_background(key: str, location: str):
+    """Aggiorna una voce stale senza bloccare il chiamante"""
+    try:
+        await _fetch_and_store(key, location)
+    except Exception as e:
+        logger.warning("Refresh meteo fallito per %s: %s", key, e)
+    finally:
+        weather_cache.end_refresh(key)
+
+
+def _schedule_refresh(key: str, location: str):
+    """Avvia al massimo un refresh in background per chiave"""
+    if not weather_cache.begin_refresh(key):
+        return
+    task = asyncio.create_task(_refresh_in_background(key, location))
+    _background_refreshes.add(task)
+    task.add_done_callback(_background_refreshes.discard)
+
+
+def get_weather_cache_stats() -> Dict:
+    """Contatori della cache meteo (hit, miss, stale)"""
+    return weather_cache.stats()
+
+
+def get_weather_flight_stats() -> Dict:
+    """Contatori delle richieste upstream coalescenti"""
+    return weather_flights.stats()
+
+
+def get_weather_upstream_stats() -> Dict:
+    """Stato del circuit breaker e del budget di chiamate upstream"""
+    return {
+        "circuit_breaker": weather_breaker.stats(),
+        "rate_limiter": weather_rate_limiter.stats()
+    }
+
+
+def _last_known(key: str, location: str) -> Optional[Dict]:
+    """Ultimo valore in cache, anche scaduto, marcato come stale"""
+    last = weather_cache.peek(key)
+    if last is None:
+        return None
+    return {**last, "location": location, "stale": True}
+
 
 async def get_weather(location: str) -> Dict:
     """
@@ -17,26 +252,136 @@ async def get_weather(location: str) -> Dict:
         "location": location
     }
 
+def _lookup_cached(key: str, location: str) -> Optional[Dict]:
+    """Risposta dalla cache (fresca o stale) oppure None se manca"""
+    cached, state = weather_cache.lookup(key)
+    if state == STALE:
+        _schedule_refresh(key, location)
+    if state in (FRESH, STALE):
+        return {**cached, "location": location}
+    return None
+
+
 async def get_weather_dynamic(location: str) -> Dict:
     """
     Recupera dati meteo reali da OpenWeatherMap.
+
+    Le risposte sono in cache per località normalizzata; dopo il TTL la
+    voce scaduta viene servita mentre un refresh in background la aggiorna.
+    Se l'upstream è protetto dal circuit breaker o dal budget, risponde subito
+    con l'ultimo valore noto (marcato stale) oppure con HTTP 503.
     """
-    API_KEY = "065b58bec3b0400f679e81d85fe35378"  # Sarebbe meglio usare una variabile d'ambiente
-    url = f"http://api.openweathermap.org/data/2.5/weather?q={location}&appid={API_KEY}&units=metric"
-    
+    key = normalize_location(location)
+    cached = _lookup_cached(key, location)
+    if cached is not None:
+        return cached
+
     try:
-        response = requests.get(url, timeout=5)
-        response.raise_for_status()
-        
-        data = response.json()
-        return {
-            "temperature": data["main"]["temp"],
-            "conditions": data["weather"][0]["description"],
-            "humidity": data["main"]["humidity"],
-            "location": location
-        }
-    except requests.exceptions.RequestException as e:
+        data = await _fetch_and_store(key, location)
+        return {**data, "location": location}
+    except UpstreamUnavailableError as e:
+        last = _last_known(key, location)
+        if last is not None:
+            return last
+        raise HTTPException(
+            status_code=503,
+            detail=f"Servizio meteo temporaneamente non disponibile: {str(e)}",
+            headers={"Retry-After": str(max(1, int(e.retry_after + 0.999)))}
+        )
+    except httpx.HTTPError as e:
         raise HTTPException(
             status_code=400,
             detail=f"Errore durante il recupero dei dati meteo: {str(e)}"
         )
+    except (KeyError, ValueError) as e:
+        raise HTTPException(
+            status_code=502,
+            detail=f"Risposta meteo non valida dall'upstream: {str(e)}"
+        )
+
+
+async def get_weather_batch(request: WeatherBatchRequest) -> Dict:
+    """
+    Recupera il meteo per più località in una sola chiamata.
+
+    Le località in cache rispondono subito; le mancanti vanno upstream con
+    concorrenza limitata. Ogni località ha il proprio risultato o errore.
+    """
+    if len(request.locations) > WEATHER_BATCH_MAX_LOCATIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Troppe località: massimo {WEATHER_BATCH_MAX_LOCATIONS} per richiesta"
+        )
+
+    results: List[Optional[Dict]] = [None] * len(request.locations)
+    misses = []
+
+    for index, location in enumerate(request.locations):
+        key = normalize_location(location)
+        cached = _lookup_cached(key, location)
+        if cached is not None:
+            results[index] = {"location": location, "weather": cached}
+        else:
+            misses.append((index, key, location))
+
+    semaphore = asyncio.Semaphore(WEATHER_BATCH_CONCURRENCY)
+
+    async def fetch_miss(index: int, key: str, location: str):
+        async with semaphore:
+            try:
+                data = await _fetch_and_store(key, location)
+                results[index] = {"location": location, "weather": {**data, "location": location}}
+            except UpstreamUnavailableError as e:
+                last = _last_known(key, location)
+                if last is not None:
+                    results[index] = {"location": location, "weather": last}
+                else:
+                    results[index] = {
+                        "location": location,
+                        "error": f"Servizio meteo temporaneamente non disponibile: {str(e)}"
+                    }
+            except (httpx.HTTPError, KeyError, ValueError) as e:
+                results[index] = {
+                    "location": location,
+                    "error": f"Errore durante il recupero dei dati meteo: {str(e)}"
+                }
+
+    await asyncio.gather(*(fetch_miss(*miss) for miss in misses))
+
+    errors = sum(1 for result in results if "error" in result)
+    return {
+        "results": results,
+        "total": len(results),
+        "succeeded": len(results) - errors,
+        "failed": errors
+    }
+
+
+# === TOOL MCP ===
+# Le route REST /mcp/tools/get_weather* sono collegate in main.py
+
+def _tool_errors(function: Callable) -> Callable:
+    """Gli errori HTTP dei tool diventano risultati MCP con isError"""
+    @functools.wraps(function)
+    async def wrapper(*args, **kwargs):
+        try:
+            return await function(*args, **kwargs)
+        except HTTPException as e:
+            raise ToolError(str(e.detail))
+    return wrapper
+
+
+@_tool_errors
+async def _weather_batch_tool(locations: List[str]) -> Dict:
+    return await get_weather_batch(WeatherBatchRequest(locations=locations))
+
+
+capabilities.tool("get_weather", "Ottiene il meteo simulato per una posizione", {
+    "location": {"type": "string", "description": "Nome della città"}
+}, handler=_tool_errors(get_weather))
+capabilities.tool("get_weather_dynamic", "Ottiene dati meteo reali da OpenWeatherMap", {
+    "location": {"type": "string", "description": "Nome della città"}
+}, handler=_tool_errors(get_weather_dynamic))
+capabilities.tool("get_weather_batch", "Ottiene dati meteo reali per più località in una chiamata", {
+    "locations": {"type": "array", "items": {"type": "string"}, "description": "Nomi delle città"}
+}, handler=_weather_batch_tool)